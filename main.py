@@ -9,11 +9,18 @@ import webbrowser
 import time
 import subprocess
 import socket
+import urllib.request
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / 'src' / 'python'))
 
+# Server output goes here instead of a pipe nobody reads (a full pipe blocks the server)
+SERVER_LOG = Path('data') / 'server.log'
+
+# Seconds to wait for the server to answer its readiness probe
+STARTUP_TIMEOUT = 30
+
 
 def print_banner():
     """Print welcome banner"""
@@ -31,6 +38,25 @@ def check_port_available(port=5000):
     return result != 0
 
 
+def wait_until_ready(process, port=5000, timeout=STARTUP_TIMEOUT):
+    """Poll /api/health until the server answers, returns False if it exits or times out"""
+    url = f'http://localhost:{port}/api/health'
+    deadline = time.monotonic() + timeout
+    
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    
+    return False
+
+
 def check_database():
     """Quick database check and initialization if needed"""
     try:
@@ -49,6 +75,7 @@ def check_database():
                 db.create_schema()
                 print("✅ Database initialized!")
             else:
+                db.upgrade_schema()
                 print(f"✅ Database ready ({len(tables)} tables)")
         
         return True
@@ -87,17 +114,18 @@ def launch_web_app():
     
     try:
         # Start server in background
+        SERVER_LOG.parent.mkdir(parents=True, exist_ok=True)
+        log = open(SERVER_LOG, 'wb')
         process = subprocess.Popen(
             [sys.executable, 'website_server.py'],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stdout=log,
+            stderr=subprocess.STDOUT
         )
         
         print("⏳ Waiting for server to start...")
-        time.sleep(2)
         
         # Check if server started successfully
-        if process.poll() is None:
+        if wait_until_ready(process):
             print("✅ Server started!")
             print("🌐 Opening browser at http://localhost:5000")
             print()
@@ -111,14 +139,18 @@ def launch_web_app():
             try:
                 process.wait()
             except KeyboardInterrupt:
+                # The server finishes requests in flight before exiting
                 print("\n\n👋 Shutting down server...")
                 process.terminate()
                 process.wait()
         else:
             print("❌ Server failed to start")
-            stdout, stderr = process.communicate()
-            if stderr:
-                print(f"Error: {stderr.decode()}")
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+            print(f"See {SERVER_LOG} for details")
+        
+        log.close()
             
     except Exception as e:
         print(f"❌ Error starting server: {e}")
@@ -153,6 +185,24 @@ def init_database():
         print("\n❌ Cancelled")
 
 
+def import_wca_export(path):
+    """Load the WCA results export for exact ranks"""
+    print_banner()
+    try:
+        from wca_export import WCAExportIngester
+        
+        if not check_database():
+            return
+        
+        print(f"\n🔄 Loading WCA export from {path}...")
+        counts = WCAExportIngester().ingest(path)
+        for table, count in counts.items():
+            print(f"  {table:<15} {count:>10,} rows")
+        print("\n✅ WCA export loaded!")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+
 def show_help():
     """Show help information"""
     print_banner()
@@ -166,6 +216,9 @@ def show_help():
     print("Initialize/reset database:")
     print("  python main.py --init-db")
     print()
+    print("Load the WCA results export (exact world/continent/country ranks):")
+    print("  python main.py --import-wca WCA_export.tsv.zip")
+    print()
     print("Show this help:")
     print("  python main.py --help")
     print()
@@ -193,6 +246,8 @@ def main():
             init_database()
         elif arg in ['--web', 'web']:
             launch_web_app()
+        elif arg in ['--import-wca', 'import-wca'] and len(sys.argv) > 2:
+            import_wca_export(sys.argv[2])
         else:
             print(f"Unknown argument: {sys.argv[1]}")
             print("Use --help for usage information")
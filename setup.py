@@ -37,7 +37,10 @@ setup(
     python_requires=">=3.8",
     install_requires=[
         "Flask>=3.1.2",
+        # website_server.py drains connections through waitress internals
+        "waitress>=3.0.2,<3.1",
         "pandas>=2.3.3",
+        "numpy>=1.23",
         "requests>=2.32.5",
         "PyYAML>=6.0.3",
     ],
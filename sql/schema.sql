@@ -57,6 +57,7 @@ CREATE TABLE IF NOT EXISTS personal_solves (
     plus_two BOOLEAN DEFAULT 0,
     notes TEXT,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    import_hash TEXT,  -- Fingerprint of the source solve for imported rows
     FOREIGN KEY (session_id) REFERENCES training_sessions(id) ON DELETE CASCADE
 );
 
@@ -83,6 +84,107 @@ CREATE TABLE IF NOT EXISTS user_profile (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- WCA ID linked from the settings page
+CREATE TABLE IF NOT EXISTS user_settings (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    wca_id TEXT,
+    wca_name TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- PERSONAL RECORDS
+-- ============================================
+
+-- Best single/aoN per event (maintained by personal_records.py)
+CREATE TABLE IF NOT EXISTS personal_records (
+    event_id TEXT NOT NULL,
+    record_type TEXT NOT NULL,  -- 'single', 'ao5', 'ao12', 'ao50', 'ao100'
+    time_ms INTEGER,            -- NULL until the event has a valid result
+    session_id INTEGER,
+    solve_id INTEGER,           -- The single, or the last solve of the window
+    achieved_at DATETIME,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, record_type)
+);
+
+-- PB progression
+CREATE TABLE IF NOT EXISTS personal_record_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT NOT NULL,
+    record_type TEXT NOT NULL,
+    time_ms INTEGER NOT NULL,
+    session_id INTEGER,
+    solve_id INTEGER,
+    achieved_at DATETIME,
+    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- EVENT SUMMARY
+-- ============================================
+
+-- Dashboard totals per event (kept current by the triggers at the end of this file)
+CREATE TABLE IF NOT EXISTS event_summary (
+    event_id TEXT PRIMARY KEY,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    solve_count INTEGER NOT NULL DEFAULT 0,
+    dnf_count INTEGER NOT NULL DEFAULT 0,
+    valid_sum_ms INTEGER NOT NULL DEFAULT 0,  -- Sum of non-DNF results with +2 applied
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- WCA RESULTS EXPORT (loaded by wca_export.py)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS wca_countries (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    continent_id TEXT,
+    iso2 TEXT
+);
+
+-- Current name and country of every competitor
+CREATE TABLE IF NOT EXISTS wca_persons (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    country_id TEXT
+);
+
+-- Personal bests per competitor, event and type ('single' or 'average')
+-- best is the raw WCA value (centiseconds for timed events)
+-- Keyed by rank order; the regional rank indexes are UNIQUE constraints rather
+-- than named indexes so they follow the table when wca_export.py renames a
+-- freshly loaded copy into place
+CREATE TABLE IF NOT EXISTS wca_ranks (
+    event_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    person_id TEXT NOT NULL,
+    best INTEGER NOT NULL,
+    country_id TEXT,
+    continent_id TEXT,
+    PRIMARY KEY (event_id, type, best, person_id),
+    UNIQUE (event_id, type, continent_id, best, person_id),
+    UNIQUE (event_id, type, country_id, best, person_id)
+) WITHOUT ROWID;
+
+-- Ranked competitors per event, type and region ('world', continent or country id)
+CREATE TABLE IF NOT EXISTS wca_rank_totals (
+    event_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    region TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    PRIMARY KEY (event_id, type, region)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS wca_export_info (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    export_date TEXT,
+    source TEXT,
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ============================================
 -- INDEXES FOR PERFORMANCE
 -- ============================================
@@ -92,23 +194,31 @@ CREATE INDEX IF NOT EXISTS idx_training_date ON training_sessions(date);
 CREATE INDEX IF NOT EXISTS idx_training_event ON training_sessions(event_id);
 CREATE INDEX IF NOT EXISTS idx_training_cube ON training_sessions(cube_id);
 CREATE INDEX IF NOT EXISTS idx_solves_session ON personal_solves(session_id);
+CREATE INDEX IF NOT EXISTS idx_solves_session_number ON personal_solves(session_id, solve_number);
 CREATE INDEX IF NOT EXISTS idx_solves_time ON personal_solves(time_ms);
 CREATE INDEX IF NOT EXISTS idx_solves_timestamp ON personal_solves(timestamp);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_solves_import_hash ON personal_solves(import_hash);
 CREATE INDEX IF NOT EXISTS idx_goals_event ON training_goals(event_id);
 CREATE INDEX IF NOT EXISTS idx_goals_achieved ON training_goals(achieved);
 CREATE INDEX IF NOT EXISTS idx_cubes_active ON cubes(is_active);
+CREATE INDEX IF NOT EXISTS idx_records_session ON personal_records(session_id);
+CREATE INDEX IF NOT EXISTS idx_record_history_event ON personal_record_history(event_id, record_type);
 
 -- ============================================
 -- VIEWS FOR COMMON QUERIES
 -- ============================================
 
 -- View: Personal best times
-CREATE VIEW IF NOT EXISTS view_personal_bests AS
+DROP VIEW IF EXISTS view_personal_bests;
+CREATE VIEW view_personal_bests AS
 SELECT 
     event_id,
-    MIN(CASE WHEN dnf = 0 THEN time_ms END) as best_single,
-    COUNT(*) as total_solves
-FROM personal_solves
+    MAX(CASE WHEN record_type = 'single' THEN time_ms END) as best_single,
+    MAX(CASE WHEN record_type = 'ao5' THEN time_ms END) as best_ao5,
+    MAX(CASE WHEN record_type = 'ao12' THEN time_ms END) as best_ao12,
+    MAX(CASE WHEN record_type = 'ao50' THEN time_ms END) as best_ao50,
+    MAX(CASE WHEN record_type = 'ao100' THEN time_ms END) as best_ao100
+FROM personal_records
 GROUP BY event_id;
 
 -- View: Session statistics
@@ -155,4 +265,150 @@ SELECT
 FROM cubes c
 LEFT JOIN training_sessions ts ON c.id = ts.cube_id
 WHERE c.is_active = 1
-GROUP BY c.id;
\ No newline at end of file
+GROUP BY c.id;
+
+-- ============================================
+-- EVENT SUMMARY MAINTENANCE
+-- ============================================
+
+-- Backfill events that have no summary yet (databases created before the table)
+INSERT OR IGNORE INTO event_summary (event_id, session_count, solve_count, dnf_count, valid_sum_ms)
+SELECT
+    ts.event_id,
+    COUNT(DISTINCT ts.id),
+    COUNT(ps.id),
+    COALESCE(SUM(CASE WHEN ps.dnf = 1 OR ps.penalty = 'DNF' THEN 1 ELSE 0 END), 0),
+    COALESCE(SUM(CASE
+        WHEN ps.dnf = 1 OR ps.penalty = 'DNF' THEN 0
+        WHEN ps.penalty = '+2' THEN ps.time_ms + 2000
+        ELSE ps.time_ms
+    END), 0)
+FROM training_sessions ts
+LEFT JOIN personal_solves ps ON ps.session_id = ts.id
+GROUP BY ts.event_id;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_session_insert
+AFTER INSERT ON training_sessions
+BEGIN
+    INSERT INTO event_summary (event_id, session_count) VALUES (NEW.event_id, 1)
+    ON CONFLICT(event_id) DO UPDATE SET
+        session_count = session_count + 1,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+
+-- BEFORE so the session's solves can still be counted; solve triggers that
+-- fire afterwards no longer find the session and leave the summary alone
+CREATE TRIGGER IF NOT EXISTS trg_summary_session_delete
+BEFORE DELETE ON training_sessions
+BEGIN
+    UPDATE event_summary SET
+        session_count = session_count - 1,
+        solve_count = solve_count - (SELECT COUNT(*) FROM personal_solves WHERE session_id = OLD.id),
+        dnf_count = dnf_count - (
+            SELECT COUNT(*) FROM personal_solves
+            WHERE session_id = OLD.id AND (dnf = 1 OR penalty = 'DNF')
+        ),
+        valid_sum_ms = valid_sum_ms - (
+            SELECT COALESCE(SUM(CASE WHEN penalty = '+2' THEN time_ms + 2000 ELSE time_ms END), 0)
+            FROM personal_solves
+            WHERE session_id = OLD.id AND NOT (dnf = 1 OR penalty = 'DNF')
+        ),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE event_id = OLD.event_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_session_event
+AFTER UPDATE OF event_id ON training_sessions
+WHEN OLD.event_id IS NOT NEW.event_id
+BEGIN
+    UPDATE event_summary SET
+        session_count = session_count - 1,
+        solve_count = solve_count - (SELECT COUNT(*) FROM personal_solves WHERE session_id = NEW.id),
+        dnf_count = dnf_count - (
+            SELECT COUNT(*) FROM personal_solves
+            WHERE session_id = NEW.id AND (dnf = 1 OR penalty = 'DNF')
+        ),
+        valid_sum_ms = valid_sum_ms - (
+            SELECT COALESCE(SUM(CASE WHEN penalty = '+2' THEN time_ms + 2000 ELSE time_ms END), 0)
+            FROM personal_solves
+            WHERE session_id = NEW.id AND NOT (dnf = 1 OR penalty = 'DNF')
+        ),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE event_id = OLD.event_id;
+
+    INSERT INTO event_summary (event_id, session_count, solve_count, dnf_count, valid_sum_ms)
+    SELECT
+        NEW.event_id,
+        1,
+        COUNT(*),
+        COALESCE(SUM(CASE WHEN dnf = 1 OR penalty = 'DNF' THEN 1 ELSE 0 END), 0),
+        COALESCE(SUM(CASE
+            WHEN dnf = 1 OR penalty = 'DNF' THEN 0
+            WHEN penalty = '+2' THEN time_ms + 2000
+            ELSE time_ms
+        END), 0)
+    FROM personal_solves
+    WHERE session_id = NEW.id
+    ON CONFLICT(event_id) DO UPDATE SET
+        session_count = session_count + 1,
+        solve_count = solve_count + excluded.solve_count,
+        dnf_count = dnf_count + excluded.dnf_count,
+        valid_sum_ms = valid_sum_ms + excluded.valid_sum_ms,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_solve_insert
+AFTER INSERT ON personal_solves
+BEGIN
+    UPDATE event_summary SET
+        solve_count = solve_count + 1,
+        dnf_count = dnf_count + CASE WHEN NEW.dnf = 1 OR NEW.penalty = 'DNF' THEN 1 ELSE 0 END,
+        valid_sum_ms = valid_sum_ms + CASE
+            WHEN NEW.dnf = 1 OR NEW.penalty = 'DNF' THEN 0
+            WHEN NEW.penalty = '+2' THEN NEW.time_ms + 2000
+            ELSE NEW.time_ms
+        END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE event_id = (SELECT event_id FROM training_sessions WHERE id = NEW.session_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_solve_delete
+AFTER DELETE ON personal_solves
+BEGIN
+    UPDATE event_summary SET
+        solve_count = solve_count - 1,
+        dnf_count = dnf_count - CASE WHEN OLD.dnf = 1 OR OLD.penalty = 'DNF' THEN 1 ELSE 0 END,
+        valid_sum_ms = valid_sum_ms - CASE
+            WHEN OLD.dnf = 1 OR OLD.penalty = 'DNF' THEN 0
+            WHEN OLD.penalty = '+2' THEN OLD.time_ms + 2000
+            ELSE OLD.time_ms
+        END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE event_id = (SELECT event_id FROM training_sessions WHERE id = OLD.session_id);
+END;
+
+-- Penalty/time edits and solves moved between sessions
+CREATE TRIGGER IF NOT EXISTS trg_summary_solve_update
+AFTER UPDATE OF session_id, time_ms, penalty, dnf ON personal_solves
+BEGIN
+    UPDATE event_summary SET
+        solve_count = solve_count - 1,
+        dnf_count = dnf_count - CASE WHEN OLD.dnf = 1 OR OLD.penalty = 'DNF' THEN 1 ELSE 0 END,
+        valid_sum_ms = valid_sum_ms - CASE
+            WHEN OLD.dnf = 1 OR OLD.penalty = 'DNF' THEN 0
+            WHEN OLD.penalty = '+2' THEN OLD.time_ms + 2000
+            ELSE OLD.time_ms
+        END
+    WHERE event_id = (SELECT event_id FROM training_sessions WHERE id = OLD.session_id);
+
+    UPDATE event_summary SET
+        solve_count = solve_count + 1,
+        dnf_count = dnf_count + CASE WHEN NEW.dnf = 1 OR NEW.penalty = 'DNF' THEN 1 ELSE 0 END,
+        valid_sum_ms = valid_sum_ms + CASE
+            WHEN NEW.dnf = 1 OR NEW.penalty = 'DNF' THEN 0
+            WHEN NEW.penalty = '+2' THEN NEW.time_ms + 2000
+            ELSE NEW.time_ms
+        END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE event_id = (SELECT event_id FROM training_sessions WHERE id = NEW.session_id);
+END;
@@ -0,0 +1,175 @@
+"""
+Benchmarks
+Throughput checks for the hot paths, run against a throwaway database
+
+Usage:
+    python src/python/benchmarks.py import [solves]
+    python src/python/benchmarks.py session-progress [solves]
+"""
+
+import contextlib
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+ROOT = Path(__file__).parent.parent.parent
+SCHEMA_FILE = ROOT / 'sql' / 'schema.sql'
+
+
+def _temp_logger(directory):
+    """TrainingLogger on a fresh database inside directory"""
+    from training_logger import TrainingLogger
+
+    logger = TrainingLogger(Path(directory) / 'benchmark.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        logger.db_manager.create_schema(SCHEMA_FILE)
+    return logger
+
+
+def _cstimer_export(path, solves, sessions=3):
+    """Write a synthetic CSTimer export with the given number of solves"""
+    rng = random.Random(0)
+    data = {}
+    per_session = solves // sessions
+
+    for n in range(1, sessions + 1):
+        session = []
+        for i in range(per_session):
+            penalty = rng.choices([0, 2000, -1], weights=[90, 6, 4])[0]
+            session.append([[penalty, rng.randint(7000, 25000)], "R U R' U'", "", 1600000000 + i])
+        data[f'session{n}'] = session
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+    return per_session * sessions
+
+
+def benchmark_import(solves=150000, legacy_solves=2000):
+    """Solves per second for the bulk CSTimer import vs one add_solve per solve"""
+    from import_cstimer import CSTimerImporter
+
+    with tempfile.TemporaryDirectory() as directory:
+        export = Path(directory) / 'export.txt'
+        total = _cstimer_export(export, solves)
+
+        logger = _temp_logger(directory)
+        importer = CSTimerImporter(logger)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            importer.import_from_json(export)
+        bulk_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            session_id = logger.create_session('333', 'legacy benchmark')
+            for i in range(legacy_solves):
+                logger.add_solve(session_id, 10 + (i % 700) / 100)
+            logger.update_session_stats(session_id)
+        legacy_seconds = time.perf_counter() - start
+
+        logger.disconnect()
+
+    print(f"Bulk import:    {total:>8,} solves in {bulk_seconds:6.2f}s  "
+          f"({total / bulk_seconds:>10,.0f} solves/s)")
+    print(f"Per-solve path: {legacy_solves:>8,} solves in {legacy_seconds:6.2f}s  "
+          f"({legacy_solves / legacy_seconds:>10,.0f} solves/s)")
+
+    return total / bulk_seconds
+
+
+def _session_with_solves(logger, solves):
+    """One session of random solves (about 6% +2, 4% DNF), inserted in bulk"""
+    rng = random.Random(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        session_id = logger.create_session('333', 'progress benchmark')
+
+    rows = []
+    for i in range(solves):
+        penalty = rng.choices(['', '+2', 'DNF'], weights=[90, 6, 4])[0]
+        rows.append((session_id, i + 1, rng.randint(7000, 25000), penalty, int(penalty == 'DNF')))
+
+    with logger.db_manager.get_connection() as conn:
+        conn.executemany("""
+            INSERT INTO personal_solves (session_id, solve_number, time_ms, penalty, dnf)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+
+    return session_id
+
+
+def _legacy_session_progress(times):
+    """The per-row loop the endpoint used to run: mean of every prefix, ao5 by sorting"""
+    data = []
+    for i in range(len(times)):
+        ao5 = None
+        if i >= 4:
+            ao5 = sum(sorted(times[i - 4:i + 1])[1:-1]) / 3
+        data.append({'mean': sum(times[:i + 1]) / (i + 1), 'ao5': ao5})
+    return data
+
+
+def benchmark_session_progress(solves=50000, legacy_solves=5000, repeat=5):
+    """Latency of /api/charts/session-progress on one long session vs the per-row loop"""
+    sys.path.insert(0, str(ROOT))
+    from src.web.api import create_app
+
+    with tempfile.TemporaryDirectory() as directory:
+        logger = _temp_logger(directory)
+        session_id = _session_with_solves(logger, solves)
+        client = create_app().test_client()
+
+        timings = {}
+        for label, query in (('full', ''), ('ao5/12/100', '&windows=5,12,100'),
+                             ('2000 points', '&windows=5,12,100&max_points=2000')):
+            url = f'/api/charts/session-progress?session_id={session_id}{query}'
+            response = client.get(url)
+            assert response.status_code == 200, response.get_json()
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                client.get(url)
+            timings[label] = (time.perf_counter() - start) / repeat
+
+        logger.disconnect()
+
+    rng = random.Random(0)
+    times = [rng.uniform(7, 25) for _ in range(legacy_solves)]
+    start = time.perf_counter()
+    _legacy_session_progress(times)
+    legacy_seconds = time.perf_counter() - start
+
+    for label, seconds in timings.items():
+        print(f"Session progress ({label:>11}): {solves:>8,} solves in {seconds * 1000:8.1f}ms")
+    print(f"Per-row loop:                  {legacy_solves:>8,} solves in {legacy_seconds * 1000:8.1f}ms")
+
+    return solves / timings['full']
+
+
+BENCHMARKS = {
+    'import': benchmark_import,
+    'session-progress': benchmark_session_progress,
+}
+
+
+def main():
+    """Run a benchmark by name"""
+    name = sys.argv[1] if len(sys.argv) > 1 else None
+    if name not in BENCHMARKS:
+        print(__doc__)
+        return
+
+    args = [int(arg) for arg in sys.argv[2:]]
+    BENCHMARKS[name](*args)
+
+
+if __name__ == "__main__":
+    main()
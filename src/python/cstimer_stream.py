@@ -0,0 +1,176 @@
+"""
+CSTimer Stream Parser
+Walk a CSTimer export one solve at a time
+
+CSTimer exports look like:
+{"session1": [[[penalty, time], "scramble", "comment", timestamp], ...],
+ "session2": [...], "properties": {...}}
+
+json.load needs the whole document (and several times its size) in memory.
+This parser reads the file in chunks and only ever decodes one solve (or
+one non-session value such as "properties") at a time.
+"""
+
+import json
+
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = ' \t\n\r'
+
+
+class CSTimerStream:
+    """Incremental reader over a text file object holding a CSTimer export"""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def sessions(self):
+        """
+        Yield (session_key, solves) for every session in the export
+
+        solves is an iterator over the raw solve lists of that session and has
+        to be used before moving on to the next session; anything left
+        unread is skipped. Keys whose value is not a list are skipped.
+        """
+        self._expect('{')
+
+        if self._peek() == '}':
+            self._pos += 1
+            self._expect_end()
+            return
+
+        while True:
+            key = self._decode()
+            if not isinstance(key, str):
+                self._fail('Expected session key')
+            self._expect(':')
+
+            if self._peek() == '[':
+                self._pos += 1
+                solves = self._solves()
+                yield key, solves
+                for _ in solves:
+                    pass
+            else:
+                self._decode()
+
+            separator = self._next_char()
+            if separator == '}':
+                self._expect_end()
+                return
+            if separator != ',':
+                self._fail("Expected ',' or '}'")
+
+    def solves(self):
+        """Yield (session_key, solve) for every solve in the export"""
+        for key, solves in self.sessions():
+            for solve in solves:
+                yield key, solve
+
+    def validate(self):
+        """Read the whole export, raising JSONDecodeError if it is cut off or malformed"""
+        for _ in self.solves():
+            pass
+
+    def _solves(self):
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield self._decode()
+
+            separator = self._next_char()
+            if separator == ']':
+                return
+            if separator != ',':
+                self._fail("Expected ',' or ']'")
+
+    def _decode(self):
+        """Decode the next complete JSON value, reading more input as needed"""
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A value touching the end of the buffer (e.g. a number) may continue
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+
+            self._read()
+
+    def _peek(self):
+        self._skip_whitespace()
+        if self._pos >= len(self._buffer):
+            self._fail('Unexpected end of file')
+        return self._buffer[self._pos]
+
+    def _next_char(self):
+        char = self._peek()
+        self._pos += 1
+        return char
+
+    def _expect(self, char):
+        if self._next_char() != char:
+            self._fail(f"Expected '{char}'")
+
+    def _expect_end(self):
+        self._skip_whitespace()
+        if self._pos < len(self._buffer):
+            self._fail('Extra data')
+
+    def _skip_whitespace(self):
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._read():
+                return
+
+    def _read(self):
+        """Append the next chunk to the buffer, returns False at end of file"""
+        if self._eof:
+            return False
+
+        # Drop what has already been parsed
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        # Grow reads for values bigger than a chunk so retries stay linear
+        chunk = self._fp.read(max(self._chunk_size, len(self._buffer)))
+        if not chunk:
+            self._eof = True
+            return True
+
+        self._buffer += chunk
+        return True
+
+    def _fail(self, message):
+        raise json.JSONDecodeError(message, self._buffer, self._pos)
+
+
+def parse_solve(solve):
+    """
+    Convert one CSTimer solve to (time_seconds, scramble, penalty)
+
+    Format: [[penalty_code, time_cs], "scramble", "", timestamp]
+    Penalty codes: 0 = OK, 2000 = +2, -1 = DNF
+    """
+    penalty_code, time_cs = solve[0][0], solve[0][1]
+    scramble = solve[1] if len(solve) > 1 else ''
+
+    if penalty_code == -1:
+        return 0, scramble, 'DNF'  # DNF stored as 0
+    elif penalty_code == 2000:
+        return time_cs / 1000, scramble, '+2'
+    else:
+        return time_cs / 1000, scramble, None
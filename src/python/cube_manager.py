@@ -3,7 +3,6 @@ Cube Manager
 """
 
 from pathlib import Path
-import pandas as pd
 from datetime import datetime
 import sys
 
@@ -50,6 +49,8 @@ class CubeManager:
     
     def list_cubes(self, active_only=True):
         """List all cubes"""
+        import pandas as pd
+        
         query = """
         SELECT id, cube_type, brand, model, purchase_date, is_active, notes
         FROM cubes
@@ -60,14 +61,14 @@ class CubeManager:
         
         query += " ORDER BY cube_type"
         
-        with self.db_manager.get_connection() as conn:
+        with self.db_manager.read_connection() as conn:
             df = pd.read_sql_query(query, conn)
         return df
     
     def get_cube(self, cube_id):
         """Get cube details"""
         query = "SELECT * FROM cubes WHERE id = ?"
-        with self.db_manager.get_connection() as conn:
+        with self.db_manager.read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (cube_id,))
             return cursor.fetchone()
@@ -108,6 +109,8 @@ class CubeManager:
     
     def get_cube_stats(self, cube_id):
         """Get performance stats for a cube"""
+        import pandas as pd
+        
         query = """
         SELECT 
             COUNT(*) as sessions,
@@ -118,12 +121,14 @@ class CubeManager:
         WHERE cube_id = ? AND solve_count > 0
         """
         
-        with self.db_manager.get_connection() as conn:
+        with self.db_manager.read_connection() as conn:
             df = pd.read_sql_query(query, conn, params=(cube_id,))
         return df
     
     def compare_cubes(self):
         """Compare performance across all cubes"""
+        import pandas as pd
+        
         query = """
         SELECT 
             c.cube_type,
@@ -140,6 +145,6 @@ class CubeManager:
         ORDER BY pb
         """
         
-        with self.db_manager.get_connection() as conn:
+        with self.db_manager.read_connection() as conn:
             df = pd.read_sql_query(query, conn)
         return df
\ No newline at end of file
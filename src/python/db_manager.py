@@ -1,19 +1,66 @@
 """
 Database Manager with connection pooling and WAL mode
+
+Writes go through one dedicated writer connection that threads take turns
+on, so they queue in Python instead of spinning on SQLite's busy timeout.
+Reads use a bounded pool of query_only connections, which under WAL never
+wait for the writer, so chart and dashboard reads do not contend with
+timer saves.
 """
 
+import queue
 import sqlite3
+import time
 from pathlib import Path
 from contextlib import contextmanager
 import threading
 
+
+class _WaitStats:
+    """Checkout count and wait times for one kind of connection"""
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+    
+    def record(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+    
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'total_wait_ms': round(self.total_wait * 1000, 3)
+            }
+
+
 class DatabaseManager:
     """Manage SQLite database with proper locking"""
     
+    # Columns added to existing tables since the first schema (table, column, type)
+    ADDED_COLUMNS = [
+        ('personal_solves', 'import_hash', 'TEXT'),
+    ]
+    
+    # Read connections kept open at most
+    READ_POOL_SIZE = 4
+    
+    # Seconds to wait for a connection before giving up
+    CHECKOUT_TIMEOUT = 30.0
+    
     _instance = None
     _lock = threading.Lock()
     
-    def __new__(cls, db_path="data/speedcube.db"):
+    def __new__(cls, db_path="data/speedcube.db", read_pool_size=None):
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
@@ -21,13 +68,31 @@ class DatabaseManager:
                     cls._instance._initialized = False
         return cls._instance
     
-    def __init__(self, db_path="data/speedcube.db"):
+    def __init__(self, db_path="data/speedcube.db", read_pool_size=None):
         if self._initialized:
             return
             
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._local = threading.local()
+        
+        # Single writer, taken by one thread at a time (re-entrant for nested helpers)
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        self._writer_stats = _WaitStats()
+        
+        # Bounded pool of read-only connections, opened on demand
+        self.read_pool_size = read_pool_size or self.READ_POOL_SIZE
+        self._readers = queue.LifoQueue()
+        self._readers_open = 0
+        self._readers_lock = threading.Lock()
+        self._reader_stats = _WaitStats()
+        
+        # Connection kept only to read PRAGMA data_version
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        
         self._initialized = True
         
         # Initialize WAL mode
@@ -41,34 +106,138 @@ class DatabaseManager:
         conn.execute('PRAGMA synchronous=NORMAL')
         conn.close()
     
+    def _open(self, read_only=False):
+        """New connection with its PRAGMAs applied once"""
+        conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+        if read_only:
+            conn.execute('PRAGMA query_only=ON')
+            conn.execute('PRAGMA cache_size=-32768')  # 32 MB page cache per reader
+            conn.execute('PRAGMA temp_store=MEMORY')
+        else:
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
     @contextmanager
     def get_connection(self):
-        """Get a thread-local connection"""
-        if not hasattr(self._local, 'conn') or self._local.conn is None:
-            self._local.conn = sqlite3.connect(
-                self.db_path,
-                timeout=30.0,
-                check_same_thread=False
-            )
-            self._local.conn.execute('PRAGMA journal_mode=WAL')
-            self._local.conn.execute('PRAGMA busy_timeout=30000')
+        """
+        Check out the writer connection
+        
+        Blocks while another thread holds it. Nested use on the same thread
+        gets the same connection; when the outermost block exits anything
+        left uncommitted is committed (or rolled back on an exception).
+        """
+        start = time.perf_counter()
+        if not self._writer_lock.acquire(timeout=self.CHECKOUT_TIMEOUT):
+            self._writer_stats.timeouts += 1
+            raise sqlite3.OperationalError("Timed out waiting for the database writer")
+        
+        try:
+            if self._writer_depth == 0:
+                self._writer_stats.record(time.perf_counter() - start)
+            if self._writer is None:
+                self._writer = self._open()
+            
+            self._writer_depth += 1
+            try:
+                yield self._writer
+            except Exception as e:
+                self._writer.rollback()
+                raise e
+            finally:
+                self._writer_depth -= 1
+            
+            if self._writer_depth == 0 and self._writer.in_transaction:
+                self._writer.commit()
+        finally:
+            self._writer_lock.release()
+    
+    @contextmanager
+    def read_connection(self):
+        """
+        Check out a read-only connection from the pool
         
+        Writes through it fail (query_only). At most read_pool_size are
+        open; callers beyond that wait for one to be returned.
+        """
+        start = time.perf_counter()
+        conn = self._checkout_reader()
+        self._reader_stats.record(time.perf_counter() - start)
+        
+        healthy = True
+        try:
+            yield conn
+        except sqlite3.Error:
+            healthy = False
+            raise
+        finally:
+            self._checkin_reader(conn, healthy)
+    
+    def _checkout_reader(self):
         try:
-            yield self._local.conn
-        except Exception as e:
-            self._local.conn.rollback()
-            raise e
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._readers_lock:
+            if self._readers_open < self.read_pool_size:
+                self._readers_open += 1
+                try:
+                    return self._open(read_only=True)
+                except Exception:
+                    self._readers_open -= 1
+                    raise
+        
+        try:
+            return self._readers.get(timeout=self.CHECKOUT_TIMEOUT)
+        except queue.Empty:
+            self._reader_stats.timeouts += 1
+            raise sqlite3.OperationalError("Timed out waiting for a database read connection")
+    
+    def _checkin_reader(self, conn, healthy=True):
+        if conn.in_transaction:
+            conn.rollback()
+        
+        if healthy:
+            self._readers.put(conn)
+            return
+        
+        # Replace connections that hit an error rather than reuse them
+        conn.close()
+        with self._readers_lock:
+            self._readers_open -= 1
+    
+    def data_version(self):
+        """
+        Number that changes whenever any connection commits a write
+        
+        PRAGMA data_version only counts commits made by other connections,
+        so it is read on a connection of its own that never writes; the
+        app's writer and other processes (CLI imports) both move it. The
+        value is only comparable within this process.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = self._open(read_only=True)
+            return self._version_conn.execute('PRAGMA data_version').fetchone()[0]
+    
+    def pool_stats(self):
+        """Checkout counts and wait times for the writer and the read pool"""
+        return {
+            'writer': dict(self._writer_stats.as_dict(), busy=self._writer_depth > 0),
+            'readers': dict(
+                self._reader_stats.as_dict(),
+                size=self.read_pool_size,
+                open=self._readers_open,
+                idle=self._readers.qsize()
+            )
+        }
     
     def connect(self):
-        """Legacy connect method for backward compatibility"""
+        """Legacy per-thread connection for scripts (the web app uses the pool)"""
         if not hasattr(self._local, 'conn') or self._local.conn is None:
-            self._local.conn = sqlite3.connect(
-                self.db_path,
-                timeout=30.0,
-                check_same_thread=False
-            )
-            self._local.conn.execute('PRAGMA journal_mode=WAL')
-            self._local.conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = self._open()
             self._local.conn.row_factory = sqlite3.Row
         return self._local.conn
     
@@ -78,7 +247,7 @@ class DatabaseManager:
         return self.connect()
     
     def disconnect(self):
-        """Close connection"""
+        """Close the legacy per-thread connection"""
         if hasattr(self._local, 'conn') and self._local.conn:
             self._local.conn.close()
             self._local.conn = None
@@ -102,6 +271,24 @@ class DatabaseManager:
         print("✓ Schema created")
         return True
     
+    def upgrade_schema(self, schema_file="sql/schema.sql"):
+        """Add tables, indexes and views introduced since the database was created"""
+        schema_path = Path(schema_file)
+        if not schema_path.exists():
+            return False
+        
+        with self.get_connection() as conn:
+            # CREATE TABLE IF NOT EXISTS leaves old tables alone, so add new columns first
+            for table, column, column_type in self.ADDED_COLUMNS:
+                columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                if columns and column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            
+            conn.executescript(schema_path.read_text())
+            conn.commit()
+        
+        return True
+    
     def get_table_info(self):
         """Show all tables and row counts"""
         with self.get_connection() as conn:
@@ -0,0 +1,135 @@
+"""
+Disk Cache
+Persistent JSON cache with per-entry expiry and a byte budget
+
+Entries live in one SQLite file under data/cache, so they survive restarts
+and are shared by every process and thread that opens the same directory.
+Large payloads (the ranking files) are stored zlib-compressed. When the
+stored bytes exceed the budget, expired entries go first and then the
+least recently read ones.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Payloads at least this large are compressed
+COMPRESS_MIN_BYTES = 16 * 1024
+
+
+class DiskCache:
+    """Key -> JSON value store backed by data/cache/<name>.db"""
+
+    def __init__(self, directory="data/cache", name="cache", max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(directory) / f"{name}.db"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    compressed INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+
+    def get(self, key):
+        """Cached value, or None if missing or expired"""
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT value, compressed, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, compressed, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                return None
+
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+
+        if compressed:
+            value = zlib.decompress(value)
+        return json.loads(value)
+
+    def stored_at(self, key):
+        """When a live entry was written (epoch seconds), None if there is none"""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT stored_at FROM entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        """Store a JSON-serialisable value, optionally expiring after ttl seconds"""
+        data = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        compressed = len(data) >= COMPRESS_MIN_BYTES
+        if compressed:
+            data = zlib.compress(data, 6)
+
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO entries
+                (key, value, compressed, size, stored_at, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (key, data, int(compressed), len(data), now,
+                  now + ttl if ttl is not None else None, now))
+            self._evict(conn, now)
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self):
+        """Entry count and stored bytes"""
+        with self._connection() as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': count, 'bytes': size, 'max_bytes': self.max_bytes}
+
+    def _evict(self, conn, now):
+        """Drop expired entries, then least recently read ones, until within budget"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def _connection(self):
+        """Per-thread connection; used as a context manager it commits or rolls back"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
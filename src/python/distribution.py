@@ -0,0 +1,300 @@
+"""
+Distribution
+Histogram binning and quantile sketches for solve time distributions
+
+Results are in milliseconds with +2 applied; DNFs are left out.
+
+An event's distribution is kept as a t-digest: a few hundred weighted
+centroids that answer quantile and rank queries to within a fraction of
+a percent, densest at the tails. Digests merge, so new solves are folded
+in as they arrive and the distribution view costs the same for a
+hundred solves as for a million. EventDistributions checks each digest
+against the event_summary totals (maintained by triggers) and rebuilds
+it only after deletes or edits, which a digest cannot undo.
+
+A single session is small enough to bin exactly (SortedSample); both
+kinds give the same interface to histogram().
+"""
+
+import math
+import threading
+
+import numpy as np
+
+from rolling_averages import result_column
+
+
+# Centroid budget of a digest: more is more accurate and larger
+COMPRESSION = 500
+
+# Results of one solve are recorded to the millisecond, shown to the centisecond
+MIN_BIN_WIDTH_MS = 10
+
+MAX_BINS = 200
+
+# Quantiles returned with every histogram
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class TDigest:
+    """
+    Merging t-digest over a stream of numbers
+
+    Centroids are kept sorted by mean. Adding values sorts them in with
+    the centroids and merges neighbours so that no centroid spans more
+    than one unit of the k1 scale (compression / 2π · asin(2q - 1)), which
+    leaves single values at the extremes and larger centroids in the middle.
+    """
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self):
+        return int(self.weights.sum())
+
+    def update(self, values):
+        """Add a batch of values"""
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate((self.means, values)),
+                       np.concatenate((self.weights, np.ones(len(values)))))
+
+    def merge(self, other):
+        """Add everything another digest has seen"""
+        if not len(other.weights):
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate((self.means, other.means)),
+                       np.concatenate((self.weights, other.weights)))
+
+    def quantile(self, q):
+        """Value at quantile(s) q in [0, 1]"""
+        positions, values = self._curve()
+        return np.interp(np.asarray(q, dtype=float) * positions[-1], positions, values)
+
+    def rank(self, x):
+        """Estimated number of values below x (array-friendly)"""
+        positions, values = self._curve()
+        return np.interp(x, values, positions)
+
+    def _curve(self):
+        """Piecewise-linear cumulative count through min, each centroid's middle and max"""
+        cumulative = np.cumsum(self.weights)
+        middles = cumulative - self.weights / 2
+        return (np.concatenate(([0], middles, [cumulative[-1]])),
+                np.concatenate(([self.min], self.means, [self.max])))
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+
+        total = weights.sum()
+        middles = (np.cumsum(weights) - weights / 2) / total
+        scale = self.compression / (2 * math.pi) * np.arcsin(2 * middles - 1)
+        groups = np.floor(scale)
+
+        starts = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+        merged = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged
+        self.weights = merged
+
+
+class SortedSample:
+    """Exact counterpart of TDigest for a sample small enough to keep"""
+
+    def __init__(self, values):
+        self.values = np.sort(np.asarray(values, dtype=float))
+        self.min = float(self.values[0]) if len(self.values) else math.inf
+        self.max = float(self.values[-1]) if len(self.values) else -math.inf
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    def quantile(self, q):
+        return np.quantile(self.values, q)
+
+    def rank(self, x):
+        return np.searchsorted(self.values, x, side='left')
+
+
+class _Summary:
+    """Quantile source plus exact moments for a set of results"""
+
+    def __init__(self, source, total=0.0, total_sq=0.0):
+        self.source = source
+        self.total = total
+        self.total_sq = total_sq
+
+    @property
+    def count(self):
+        return self.source.count
+
+    def mean(self):
+        return self.total / self.count
+
+    def std(self):
+        mean = self.mean()
+        return math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+
+def sample_summary(values):
+    """Exact summary of a list of results"""
+    values = np.asarray(values, dtype=float)
+    return _Summary(SortedSample(values), float(values.sum()), float((values ** 2).sum()))
+
+
+def parse_bins(bins=None, bin_width=None):
+    """bins / bin_width query parameters: (count or None, width in ms or None)"""
+    count = width = None
+    if bins not in (None, '', 'auto'):
+        count = int(bins)
+        if not 1 <= count <= MAX_BINS:
+            raise ValueError(f"bins must be between 1 and {MAX_BINS}")
+    if bin_width not in (None, ''):
+        width = float(bin_width) * 1000
+        if width < MIN_BIN_WIDTH_MS:
+            raise ValueError(f"bin_width must be at least {MIN_BIN_WIDTH_MS / 1000} seconds")
+    return count, width
+
+
+def histogram(summary, bins=None, bin_width=None, sigmas=3):
+    """
+    Binned distribution of a summary, everything in ms
+
+    The range covers mean ± sigmas standard deviations (within the data);
+    if that leaves out more than 10% of the results, the 1st to 99th
+    percentile is used instead. The bin width is bin_width, else the range
+    split in bins, else the Freedman-Diaconis width 2·IQR/n^(1/3); it is
+    rounded to whole centiseconds and at most MAX_BINS bins are made.
+    """
+    source = summary.source
+    n = summary.count
+    mean, std = summary.mean(), summary.std()
+
+    low = max(source.min, mean - sigmas * std)
+    high = min(source.max, mean + sigmas * std)
+    inside = source.rank(high) - source.rank(low)
+    if inside < n * 0.9 or high <= low:
+        low, high = (float(value) for value in source.quantile([0.01, 0.99]))
+
+    span = max(high - low, MIN_BIN_WIDTH_MS)
+    if bin_width is None:
+        if bins is None:
+            q1, q3 = source.quantile([0.25, 0.75])
+            bin_width = 2 * (q3 - q1) / n ** (1 / 3)
+        else:
+            bin_width = span / bins
+    bin_width = max(round(bin_width / MIN_BIN_WIDTH_MS), 1) * MIN_BIN_WIDTH_MS
+    if span / bin_width > MAX_BINS:
+        bin_width = math.ceil(span / MAX_BINS / MIN_BIN_WIDTH_MS) * MIN_BIN_WIDTH_MS
+
+    start = math.floor(low / MIN_BIN_WIDTH_MS) * MIN_BIN_WIDTH_MS
+    edges = start + bin_width * np.arange(math.ceil((high - start) / bin_width) + 1)
+    if edges[-1] <= high:
+        edges = np.append(edges, edges[-1] + bin_width)
+
+    counts = np.diff(np.rint(source.rank(edges))).astype(np.int64)
+    quantiles = source.quantile(QUANTILES)
+
+    return {
+        'count': n,
+        'mean': mean,
+        'std_dev': std,
+        'min': source.min,
+        'max': source.max,
+        'bin_width': bin_width,
+        'edges': edges,
+        'counts': counts,
+        'outside': n - int(counts.sum()),
+        'quantiles': dict(zip(QUANTILES, quantiles.tolist()))
+    }
+
+
+class _EventDigest:
+    """Digest of an event plus what it was built from"""
+
+    def __init__(self, compression):
+        self.summary = _Summary(TDigest(compression))
+        self.last_solve_id = 0
+
+
+class EventDistributions:
+    """Per-event digests, kept in step with the database"""
+
+    NEW_RESULTS_SQL = f"""
+        SELECT ps.id, {result_column('ps')}
+        FROM personal_solves ps
+        CROSS JOIN training_sessions ts
+        WHERE ts.id = ps.session_id AND ts.event_id = ? AND ps.id > ?
+    """
+
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def get(self, cursor, event_id):
+        """
+        Summary of an event's results, None if it has none
+
+        Solves added since the last call are folded into the digest. When
+        its count or sum no longer matches event_summary (solves deleted,
+        penalties changed) it is rebuilt from scratch.
+        """
+        cursor.execute(
+            "SELECT solve_count - dnf_count, valid_sum_ms FROM event_summary WHERE event_id = ?",
+            (event_id,)
+        )
+        row = cursor.fetchone()
+        count, total = row if row else (0, 0)
+        if not count:
+            return None
+
+        with self._lock:
+            entry = self._events.get(event_id)
+            if entry is None or not self._matches(entry, count, total):
+                if entry is not None:
+                    self._add_new(cursor, event_id, entry)
+                if entry is None or not self._matches(entry, count, total):
+                    entry = _EventDigest(self.compression)
+                    self._add_new(cursor, event_id, entry)
+                self._events[event_id] = entry
+            return entry.summary
+
+    def invalidate(self, event_id=None):
+        with self._lock:
+            if event_id is None:
+                self._events.clear()
+            else:
+                self._events.pop(event_id, None)
+
+    @staticmethod
+    def _matches(entry, count, total):
+        return entry.summary.count == count and entry.summary.total == total
+
+    def _add_new(self, cursor, event_id, entry):
+        cursor.execute(self.NEW_RESULTS_SQL, (event_id, entry.last_solve_id))
+        rows = np.array(cursor.fetchall(), dtype=float).reshape(-1, 2)
+        if not len(rows):
+            return
+
+        results = rows[:, 1]
+        results = results[~np.isnan(results)]
+        entry.summary.source.update(results)
+        entry.summary.total += float(results.sum())
+        entry.summary.total_sq += float((results ** 2).sum())
+        entry.last_solve_id = int(rows[:, 0].max())
+
+
+# Shared by the API routes
+event_distributions = EventDistributions()
@@ -0,0 +1,149 @@
+"""
+Downsampling
+Reduce long chart series to a point budget while keeping their shape
+
+A chart a thousand pixels wide cannot show more points than that, so the
+chart routes accept max_points and return a subset of their rows:
+
+- Lines (averages, means, progress) use Largest-Triangle-Three-Buckets:
+  the points are split into equal buckets and from each the one forming
+  the largest triangle with its neighbours is kept, which follows the
+  visual shape of the line.
+- Raw solve times use min/max buckets, so every bucket's fastest solve
+  (PB spikes) and slowest solve (outliers) survive.
+
+Several series sharing an x axis split the budget and the union of the
+points they keep is returned, so the rows stay aligned. Non-finite
+values (DNFs, averages not yet defined) are never chosen.
+"""
+
+import numpy as np
+
+
+# Fewer points than this would not show a shape at all
+MIN_POINTS = 10
+
+
+def parse_max_points(value):
+    """max_points query parameter as an int, None when absent"""
+    if value in (None, ''):
+        return None
+    try:
+        max_points = int(value)
+    except ValueError:
+        raise ValueError(f"max_points must be a number, got {value!r}")
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    return max_points
+
+
+def _buckets(start, stop, count):
+    """
+    Split positions start..stop-1 into count contiguous buckets
+
+    Returns (matrix, valid): one row of positions per bucket, padded to the
+    longest bucket, and a mask of the real entries.
+    """
+    edges = np.linspace(start, stop, count + 1).astype(np.int64)
+    sizes = np.diff(edges)
+    width = max(int(sizes.max()), 1)
+    offsets = np.arange(width)
+    matrix = np.minimum(edges[:-1, None] + offsets, stop - 1)
+    valid = offsets < sizes[:, None]
+    return matrix, valid
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions of the n_out points LTTB keeps from (x, y), first and last included
+
+    Classic LTTB anchors each bucket's triangle on the point chosen in the
+    bucket before, which makes it a sequential loop. Here every bucket is
+    scored at once: the first pass anchors on the previous bucket's
+    average, each following pass on the points the pass before picked.
+    Pass k gets at least the first k buckets right, and when the picks
+    stop changing they are exactly the points sequential LTTB chooses.
+    Only buckets whose anchor moved in the pass before are scored again,
+    so the later passes cost next to nothing.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:n_out]
+
+    matrix, valid = _buckets(1, n - 1, n_out - 2)
+    bx, by = x[matrix], y[matrix]
+    counts = valid.sum(axis=1)
+    mean_x = np.where(valid, bx, 0).sum(axis=1) / counts
+    mean_y = np.where(valid, by, 0).sum(axis=1) / counts
+
+    # Third corner: the next bucket's average, the last point for the last bucket
+    next_x = np.append(mean_x[1:], x[-1])[:, None]
+    next_y = np.append(mean_y[1:], y[-1])[:, None]
+
+    def pick(rows, anchor_x, anchor_y):
+        area = np.abs(
+            (anchor_x[:, None] - next_x[rows]) * (by[rows] - anchor_y[:, None])
+            - (anchor_x[:, None] - bx[rows]) * (next_y[rows] - anchor_y[:, None])
+        )
+        area[~valid[rows]] = -1
+        return matrix[rows, area.argmax(axis=1)]
+
+    rows = np.arange(len(matrix))
+    chosen = pick(rows, np.insert(mean_x[:-1], 0, x[0]), np.insert(mean_y[:-1], 0, y[0]))
+    anchors = np.insert(chosen[:-1], 0, 0)
+    while len(rows):
+        repicked = pick(rows, x[anchors[rows]], y[anchors[rows]])
+        moved = rows[repicked != chosen[rows]]
+        chosen[rows] = repicked
+        # A bucket's pick is the next bucket's anchor
+        rows = moved[moved < len(matrix) - 1] + 1
+        anchors[rows] = chosen[rows - 1]
+
+    return np.concatenate(([0], chosen, [n - 1]))
+
+
+def minmax_indices(y, n_out):
+    """Positions of each bucket's minimum and maximum (about n_out points), first and last included"""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+
+    matrix, valid = _buckets(0, n, max((n_out - 2) // 2, 1))
+    values = y[matrix]
+    rows = np.arange(len(matrix))
+    lows = matrix[rows, np.where(valid, values, np.inf).argmin(axis=1)]
+    highs = matrix[rows, np.where(valid, values, -np.inf).argmax(axis=1)]
+
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+
+def downsample(x, series, max_points, spiky=()):
+    """
+    Sorted positions of the rows to keep so the chart has about max_points points
+
+    series maps names to y arrays sharing x; the ones named in spiky use
+    min/max buckets, the others LTTB. Returns None when nothing needs to
+    be dropped.
+    """
+    x = np.asarray(x, dtype=float)
+    if max_points is None or len(x) <= max_points:
+        return None
+
+    budget = max(max_points // len(series), 3)
+    keep = []
+    for name, y in series.items():
+        y = np.asarray(y, dtype=float)
+        finite = np.flatnonzero(np.isfinite(y))
+        if len(finite) <= budget:
+            keep.append(finite)
+        elif name in spiky:
+            keep.append(finite[minmax_indices(y[finite], budget)])
+        else:
+            keep.append(finite[lttb_indices(x[finite], y[finite], budget)])
+
+    return np.unique(np.concatenate(keep))
@@ -4,21 +4,62 @@ Import solve times from CSTimer export files
 FIXED: Proper DNF handling (DNF = 0ms in database, not 999999ms)
 """
 
-import json
 import csv
+import hashlib
 from datetime import datetime
 from pathlib import Path
-import pandas as pd
 from training_logger import TrainingLogger
+from cstimer_stream import CSTimerStream, parse_solve
+
+
+class _NewSolves:
+    """
+    Solves whose hash is not stored yet, looked up one batch at a time
+    
+    Iterating yields the new solves; existing counts the ones skipped
+    because they were imported before.
+    """
+    
+    def __init__(self, logger, first, known, batches, progress=None):
+        self.logger = logger
+        self.existing = 0
+        self._first = first
+        self._known = known
+        self._batches = batches
+        self._progress = progress
+    
+    def __iter__(self):
+        batch, known = self._first, self._known
+        while batch:
+            duplicates = 0
+            for solve in batch:
+                if solve[4] in known:
+                    duplicates += 1
+                else:
+                    yield solve
+            
+            self.existing += duplicates
+            if self._progress and duplicates:
+                self._progress.solves_existing(duplicates)
+            
+            batch = next(self._batches, None)
+            if batch:
+                known = self.logger.find_imported(solve[4] for solve in batch)
 
 
 class CSTimerImporter:
     """Import data from CSTimer exports"""
     
-    def __init__(self, logger):
+    # Solves per import hash lookup when no batch size is set
+    LOOKUP_BATCH = 5000
+    
+    def __init__(self, logger, batch_size=5000):
         self.logger = logger
+        # Rows per transaction for bulk inserts (None = one per session)
+        self.batch_size = batch_size
     
-    def import_from_json(self, json_file, event_id='333', session_name=''):
+    def import_from_json(self, json_file, event_id='333', session_name='',
+                         session_keys=None, progress=None, validate=True):
         """
         Import from CSTimer JSON export
         
@@ -29,68 +70,75 @@ class CSTimerImporter:
         - 0 = OK
         - 2000 = +2
         - -1 = DNF
+        
+        Every solve is fingerprinted (see solve_hash). Importing the same
+        export again skips the solves that are already stored, and a session
+        that was imported before only gets its new solves appended.
+        
+        session_keys limits the import to those sessions. progress is an
+        optional reporter (see import_jobs.ImportJob) told about created
+        sessions, parsed, skipped and already imported solves and how many
+        new solves each session received; it may raise to stop the import.
+        
+        Sessions are committed as they are read, so the whole file is read
+        once first: a cut-off or malformed export raises JSONDecodeError
+        before anything is written. Pass validate=False when the caller
+        already read the whole file (e.g. through preview).
         """
         print(f"Reading CSTimer file: {json_file}")
         
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if validate:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                CSTimerStream(f).validate()
         
         # CSTimer exports have session keys like "session1", "session2", etc.
         sessions_imported = 0
         total_solves = 0
         
-        for session_key, session_data in data.items():
-            if not isinstance(session_data, list):
-                continue
-            
-            print(f"\n--- Importing {session_key} ---")
-            print(f"Found {len(session_data)} solves")
-            
-            # Create session name
-            if not session_name:
-                current_session_name = f"CSTimer {session_key} - {datetime.now().strftime('%Y-%m-%d')}"
-            else:
-                current_session_name = f"{session_name} ({session_key})"
-            
-            session_id = self.logger.create_session(event_id, current_session_name)
-            
-            # Import each solve
-            imported = 0
-            for solve_data in session_data:
-                try:
-                    # Format: [[penalty_code, time_cs], "scramble", "", timestamp]
-                    solve_info = solve_data[0]  # [penalty, time]
-                    scramble = solve_data[1] if len(solve_data) > 1 else ''
-                    
-                    penalty_code = solve_info[0]
-                    time_cs = solve_info[1]
+        with open(json_file, 'r', encoding='utf-8') as f:
+            for session_key, session_solves in CSTimerStream(f).sessions():
+                if session_keys is not None and session_key not in session_keys:
+                    continue
+                
+                print(f"\n--- Importing {session_key} ---")
+                
+                batches = self._batches(
+                    self._parse_solves(session_solves, progress, session_key),
+                    self.batch_size or self.LOOKUP_BATCH
+                )
+                first = next(batches, [])
+                known = self.logger.find_imported(solve[4] for solve in first)
+                
+                # Solves of this session were imported before: append to that session
+                session_id = next(iter(known.values()), None)
+                if session_id is None:
+                    if not first:
+                        print(f"  {session_key} is empty")
+                        continue
                     
-                    # Convert penalty code
-                    # 0 = OK, 2000 = +2, -1 = DNF
-                    if penalty_code == -1:
-                        penalty = 'DNF'
-                        time_seconds = 0  # DNF stored as 0
-                    elif penalty_code == 2000:
-                        penalty = '+2'
-                        time_seconds = time_cs / 1000
+                    # Create session name
+                    if not session_name:
+                        current_session_name = f"CSTimer {session_key} - {datetime.now().strftime('%Y-%m-%d')}"
                     else:
-                        penalty = None
-                        time_seconds = time_cs / 1000
-                    
-                    self.logger.add_solve(session_id, time_seconds, scramble, penalty)
-                    imported += 1
+                        current_session_name = f"{session_name} ({session_key})"
                     
-                except Exception as e:
-                    print(f"⚠️  Skipped solve: {e}")
-                    continue
-            
-            print(f"✓ Imported {imported} solves from {session_key}")
-            
-            # Calculate stats for this session
-            self.logger.update_session_stats(session_id)
-            
-            sessions_imported += 1
-            total_solves += imported
+                    session_id = self.logger.create_session(event_id, current_session_name)
+                    if progress:
+                        progress.session_created(session_key, session_id)
+                
+                # Solves are parsed as they stream in and only new ones are bulk inserted
+                new_solves = _NewSolves(self.logger, first, known, batches, progress)
+                imported = self.logger.add_solves(session_id, new_solves, self.batch_size)
+                
+                print(f"✓ Imported {imported} solves from {session_key}"
+                      + (f" ({new_solves.existing} already imported)" if new_solves.existing else ""))
+                
+                if progress:
+                    progress.solves_imported(session_key, session_id, imported)
+                
+                if imported:
+                    sessions_imported += 1
+                total_solves += imported
         
         print(f"\n{'='*60}")
         print(f"IMPORT COMPLETE")
@@ -100,6 +148,111 @@ class CSTimerImporter:
         
         return sessions_imported
     
+    @staticmethod
+    def preview(json_file):
+        """Per-session solve count, best, worst and mean without importing"""
+        sessions = []
+        
+        with open(json_file, 'r', encoding='utf-8') as f:
+            for session_key, session_solves in CSTimerStream(f).sessions():
+                solve_count = 0
+                valid = 0
+                total = 0
+                best = None
+                worst = None
+                
+                for solve in session_solves:
+                    solve_count += 1
+                    try:
+                        penalty = solve[0][0]
+                        time_s = solve[0][1] / 1000
+                    except (IndexError, KeyError, TypeError):
+                        continue
+                    if penalty == -1:
+                        continue
+                    
+                    valid += 1
+                    total += time_s
+                    best = time_s if best is None else min(best, time_s)
+                    worst = time_s if worst is None else max(worst, time_s)
+                
+                sessions.append({
+                    'key': session_key,
+                    'solve_count': solve_count,
+                    'best': best,
+                    'worst': worst,
+                    'mean': total / valid if valid else None
+                })
+        
+        return sessions
+    
+    @staticmethod
+    def _starts_with_object(path):
+        """Whether the first non-whitespace character of a file is '{'"""
+        with open(path, 'r', encoding='utf-8') as f:
+            while True:
+                chunk = f.read(4096)
+                if not chunk:
+                    return False
+                chunk = chunk.lstrip()
+                if chunk:
+                    return chunk[0] == '{'
+    
+    @staticmethod
+    def _batches(solves, size):
+        """Group an iterable into lists of up to size items"""
+        batch = []
+        for solve in solves:
+            batch.append(solve)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    @staticmethod
+    def solve_hash(session_key, solve_data):
+        """Fingerprint of a raw CSTimer solve: session key, timestamp, time and scramble"""
+        time_cs = solve_data[0][1]
+        scramble = solve_data[1] if len(solve_data) > 1 else ''
+        timestamp = solve_data[3] if len(solve_data) > 3 else ''
+        
+        key = '\x1f'.join(str(part) for part in ('cstimer', session_key, timestamp, time_cs, scramble))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def _parse_solves(cls, session_solves, progress=None, session_key=None):
+        """
+        Parse raw CSTimer solves lazily, skipping malformed ones
+        
+        With a session_key each solve also carries its import hash:
+        (time_seconds, scramble, penalty, notes, import_hash)
+        """
+        for solve_data in session_solves:
+            try:
+                solve = parse_solve(solve_data)
+                if session_key is not None:
+                    solve += ('', cls.solve_hash(session_key, solve_data))
+            except Exception as e:
+                print(f"⚠️  Skipped solve: {e}")
+                if progress:
+                    progress.solve_skipped(str(e))
+                continue
+            
+            if progress:
+                progress.solve_parsed()
+            yield solve
+    
+    @staticmethod
+    def _parse_time_text(time_str):
+        """Parse '18.50', '18.50+2' or 'DNF(18.50)' to (time_seconds, penalty)"""
+        if 'DNF' in time_str.upper():
+            return 0, 'DNF'  # DNF stored as 0
+        elif '+2' in time_str:
+            return float(time_str.replace('+2', '').strip()), '+2'
+        else:
+            return float(time_str), None
+    
     def import_from_csv(self, csv_file, event_id='333', session_name=''):
         """
         Import from CSV export
@@ -108,6 +261,8 @@ class CSTimerImporter:
         No., Time(s), Scramble, Date
         1, 18.50, D2 R' F2..., 2024-12-08
         """
+        import pandas as pd
+        
         print(f"Reading CSV: {csv_file}")
         
         df = pd.read_csv(csv_file)
@@ -134,47 +289,31 @@ class CSTimerImporter:
         
         session_id = self.logger.create_session(event_id, session_name)
         
-        # Import solves
-        imported = 0
+        # Parse solves
+        solves = []
         for _, row in df.iterrows():
             try:
-                time_str = str(row[time_col]).strip()
-                
-                # Handle penalties
-                if 'DNF' in time_str.upper():
-                    penalty = 'DNF'
-                    time_seconds = 0  # DNF stored as 0
-                elif '+2' in time_str:
-                    penalty = '+2'
-                    time_seconds = float(time_str.replace('+2', '').strip())
-                else:
-                    penalty = None
-                    time_seconds = float(time_str)
-                
+                time_seconds, penalty = self._parse_time_text(str(row[time_col]).strip())
                 scramble = row[scramble_col] if scramble_col else ''
-                
-                self.logger.add_solve(session_id, time_seconds, scramble, penalty)
-                imported += 1
-                
+                solves.append((time_seconds, scramble, penalty))
             except Exception as e:
                 print(f"⚠️  Skipped row: {e}")
                 continue
         
+        imported = self.logger.add_solves(session_id, solves, self.batch_size)
         print(f"\n✓ Imported {imported} solves")
-        self.logger.update_session_stats(session_id)
         
         return session_id
     
     def import_from_txt(self, txt_file, event_id='333', session_name=''):
         """
         Import from CSTimer TXT export (which is usually JSON inside)
-        First try JSON, then fall back to plain text parsing
+        Files starting with '{' are imported as JSON (and fail if they are
+        not valid JSON), anything else is parsed as plain text
         """
-        # Try JSON first (CSTimer .txt files are usually JSON)
-        try:
+        # CSTimer .txt files are usually JSON
+        if self._starts_with_object(txt_file):
             return self.import_from_json(txt_file, event_id, session_name)
-        except json.JSONDecodeError:
-            pass
         
         # Fall back to text parsing
         print(f"Reading as plain text: {txt_file}")
@@ -187,7 +326,7 @@ class CSTimerImporter:
         
         session_id = self.logger.create_session(event_id, session_name)
         
-        imported = 0
+        solves = []
         for line in lines:
             line = line.strip()
             if not line:
@@ -199,26 +338,14 @@ class CSTimerImporter:
                 time_str = parts[1] if len(parts) > 1 else parts[0]
                 scramble = parts[2] if len(parts) > 2 else ''
                 
-                # Handle penalties
-                if 'DNF' in time_str.upper():
-                    penalty = 'DNF'
-                    time_seconds = 0  # DNF stored as 0
-                elif '+2' in time_str:
-                    penalty = '+2'
-                    time_seconds = float(time_str.replace('+2', ''))
-                else:
-                    penalty = None
-                    time_seconds = float(time_str)
-                
-                self.logger.add_solve(session_id, time_seconds, scramble, penalty)
-                imported += 1
+                time_seconds, penalty = self._parse_time_text(time_str)
+                solves.append((time_seconds, scramble, penalty))
                 
             except:
                 continue
         
+        imported = self.logger.add_solves(session_id, solves, self.batch_size)
         print(f"\n✓ Imported {imported} solves")
-        if imported > 0:
-            self.logger.update_session_stats(session_id)
         
         return session_id
 
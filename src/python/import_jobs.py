@@ -0,0 +1,222 @@
+"""
+Import Jobs
+Run CSTimer imports on a background worker and report their progress
+
+Submitting a job returns straight away with its id. A single worker thread
+(SQLite has one writer anyway) counts the selected solves, then streams
+them into the database through CSTimerImporter while the job records how
+far it got. Cancelling stops the worker at the next solve and removes the
+sessions the job had created. Solves it already appended to sessions from
+an earlier import are kept; imports skip known solves, so running the
+same import again picks up where it stopped.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from training_logger import TrainingLogger
+from import_cstimer import CSTimerImporter
+
+
+# Finished jobs kept around for polling
+MAX_FINISHED_JOBS = 50
+
+# Skipped-solve messages kept per job
+MAX_ERRORS = 100
+
+FINISHED_STATES = ('completed', 'failed', 'cancelled')
+
+
+class ImportCancelled(Exception):
+    """Raised inside the worker when a job was cancelled"""
+
+
+class ImportJob:
+    """State of one import, updated by the worker and read by the API"""
+
+    def __init__(self, file_path, event_id='333', session_keys=None):
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.event_id = event_id
+        self.session_keys = list(session_keys) if session_keys is not None else None
+
+        self.status = 'queued'
+        self.total_solves = None
+        self.solves_processed = 0
+        self.solves_skipped = 0
+        self.solves_already_imported = 0
+        self.session_ids = {}
+        self.sessions_with_solves = {}
+        self.errors = []
+
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def cancel(self):
+        """Ask the worker to stop; returns False if the job already finished"""
+        if self.finished:
+            return False
+        self._cancel.set()
+        if self.status == 'queued':
+            self._finish('cancelled')
+        return True
+
+    # Progress reporter interface used by CSTimerImporter
+
+    def session_created(self, session_key, session_id):
+        self.session_ids[session_key] = session_id
+
+    def solve_parsed(self):
+        self.solves_processed += 1
+        if self._cancel.is_set():
+            raise ImportCancelled()
+
+    def solves_existing(self, count):
+        self.solves_already_imported += count
+
+    def solves_imported(self, session_key, session_id, count):
+        if count:
+            self.sessions_with_solves[session_key] = session_id
+
+    def solve_skipped(self, message):
+        self.solves_skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(message)
+        if self._cancel.is_set():
+            raise ImportCancelled()
+
+    def to_dict(self):
+        """JSON-ready job status with throughput and ETA"""
+        elapsed = None
+        throughput = None
+        eta = None
+
+        # Sessions from an earlier import that received new solves
+        appended = [key for key in self.sessions_with_solves if key not in self.session_ids]
+
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if elapsed > 0 and self.solves_processed:
+                throughput = self.solves_processed / elapsed
+            if throughput and self.total_solves is not None and not self.finished:
+                eta = max(0, self.total_solves - self.solves_processed) / throughput
+
+        return {
+            'id': self.id,
+            'status': self.status,
+            'filename': self.file_path.name,
+            'event_id': self.event_id,
+            'session_keys': self.session_keys,
+            'total_solves': self.total_solves,
+            'solves_processed': self.solves_processed,
+            'solves_skipped': self.solves_skipped,
+            'solves_already_imported': self.solves_already_imported,
+            'sessions_imported': len(self.sessions_with_solves) if self.status == 'completed' else 0,
+            'sessions_created': len(self.session_ids) if self.status == 'completed' else 0,
+            'sessions_appended': len(appended) if self.status == 'completed' else 0,
+            'session_ids': list(self.session_ids.values()),
+            'elapsed_seconds': round(elapsed, 2) if elapsed is not None else None,
+            'solves_per_second': round(throughput, 1) if throughput else None,
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'errors': self.errors
+        }
+
+    def _finish(self, status, error=None):
+        if error:
+            self.errors.append(error)
+        self.status = status
+        self.finished_at = time.time()
+
+
+class ImportJobManager:
+    """Queue of import jobs served by one background worker"""
+
+    def __init__(self, workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='import')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, file_path, event_id='333', session_keys=None):
+        """Queue an import and return its job"""
+        job = ImportJob(file_path, event_id, session_keys)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def all(self):
+        """Jobs, newest first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """Cancel a job, returns None if it does not exist"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel()
+        return job
+
+    def _run(self, job):
+        if job.finished:
+            return
+
+        logger = TrainingLogger()
+        job.status = 'running'
+        job.started_at = time.time()
+
+        try:
+            keys = set(job.session_keys) if job.session_keys is not None else None
+            job.total_solves = sum(
+                session['solve_count'] for session in CSTimerImporter.preview(job.file_path)
+                if keys is None or session['key'] in keys
+            )
+            if job._cancel.is_set():
+                raise ImportCancelled()
+
+            # The preview above read the whole file, so a broken export has already failed
+            importer = CSTimerImporter(logger)
+            importer.import_from_json(job.file_path, job.event_id,
+                                      session_keys=keys, progress=job, validate=False)
+            job._finish('completed')
+        except ImportCancelled:
+            self._discard_sessions(logger, job)
+            job._finish('cancelled')
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job._finish('failed', str(e))
+        finally:
+            logger.disconnect()
+
+    @staticmethod
+    def _discard_sessions(logger, job):
+        """Remove what a cancelled job had already written"""
+        for session_id in job.session_ids.values():
+            logger.delete_session(session_id)
+        job.session_ids.clear()
+        job.sessions_with_solves.clear()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+# Shared by the API routes
+import_jobs = ImportJobManager()
@@ -0,0 +1,238 @@
+"""
+Personal Records
+Best-ever single and aoN per event, maintained on every solve write
+
+Records live in personal_records (one row per event and record type) with
+their progression in personal_record_history. A new solve can only set a
+record with itself or with the averages ending at it, so inserts are a
+couple of indexed lookups. Deletes and penalty edits recompute the affected
+session; the event is only rebuilt from scratch when a record that came
+from that session may no longer stand.
+"""
+
+import numpy as np
+
+from session_stats import AVERAGE_WINDOWS, effective_time_ms
+from rolling_averages import result_column, results_array, rolling_average
+
+
+RECORD_TYPES = ('single',) + tuple(f'ao{size}' for size in AVERAGE_WINDOWS)
+
+
+class PersonalRecords:
+    """Keep personal_records and personal_record_history up to date"""
+
+    def get(self, cursor, event_id, build=True):
+        """
+        Records for an event as {record_type: row dict}, building them if needed
+
+        With build=False nothing is written (for read connections) and {}
+        means the records of the event have not been built yet.
+        """
+        records = self._load(cursor, event_id)
+        if not records and build:
+            self.rebuild(cursor, event_id)
+            records = self._load(cursor, event_id)
+        return records
+
+    def history(self, cursor, event_id, record_type='single'):
+        """PB progression for one record type, oldest first"""
+        cursor.execute("""
+            SELECT time_ms, session_id, solve_id, achieved_at
+            FROM personal_record_history
+            WHERE event_id = ? AND record_type = ?
+            ORDER BY id
+        """, (event_id, record_type))
+
+        return [
+            {'time_ms': row[0], 'session_id': row[1], 'solve_id': row[2], 'achieved_at': row[3]}
+            for row in cursor.fetchall()
+        ]
+
+    def solve_added(self, cursor, session_id, solve_id, time_ms, penalty=None, dnf=False, session_stats=None):
+        """Check a newly appended solve (and the averages ending at it) for records"""
+        event_id = self._event_of(cursor, session_id)
+        if event_id is None:
+            return
+
+        records = self._load(cursor, event_id)
+        if not records:
+            self.rebuild(cursor, event_id)
+            return
+
+        candidates = {'single': effective_time_ms(time_ms, penalty, dnf)}
+        for size in AVERAGE_WINDOWS:
+            candidates[f'ao{size}'] = (session_stats or {}).get(f'ao{size}')
+
+        for record_type, value in candidates.items():
+            if value is None:
+                continue
+            current = records.get(record_type, {}).get('time_ms')
+            if current is None or value < current:
+                self._set(cursor, event_id, record_type, value, session_id, solve_id)
+
+    def solve_removed(self, cursor, session_id):
+        """Re-check records after a solve was deleted from a session"""
+        self.session_changed(cursor, session_id)
+
+    def solve_changed(self, cursor, session_id):
+        """Re-check records after a penalty or time edit"""
+        self.session_changed(cursor, session_id)
+
+    def session_deleted(self, cursor, session_id):
+        """Rebuild any event whose records came from a deleted session"""
+        cursor.execute(
+            "SELECT DISTINCT event_id FROM personal_records WHERE session_id = ?",
+            (session_id,)
+        )
+        for (event_id,) in cursor.fetchall():
+            self.rebuild(cursor, event_id)
+
+    def rebuild(self, cursor, event_id):
+        """Recompute all records and their progression for an event"""
+        cursor.execute(f"""
+            SELECT ps.session_id, ps.id, {result_column('ps')}, datetime(ps.timestamp)
+            FROM personal_solves ps
+            JOIN training_sessions ts ON ps.session_id = ts.id
+            WHERE ts.event_id = ?
+            ORDER BY ps.session_id, ps.solve_number, ps.id
+        """, (event_id,))
+        rows = cursor.fetchall()
+
+        cursor.execute("DELETE FROM personal_records WHERE event_id = ?", (event_id,))
+        cursor.execute("DELETE FROM personal_record_history WHERE event_id = ?", (event_id,))
+
+        series = _record_series(rows)
+        sessions = np.array([row[0] for row in rows], dtype=np.int64)
+        solves = np.array([row[1] for row in rows], dtype=np.int64)
+        timestamps = np.array([row[3] or '' for row in rows], dtype=object)
+        chronological = np.lexsort((solves, timestamps.astype(str))) if rows else np.array([], dtype=np.int64)
+
+        for record_type in RECORD_TYPES:
+            values = series[record_type][chronological]
+            previous = np.concatenate(([np.inf], np.minimum.accumulate(values)[:-1]))
+            improved = chronological[values < previous]
+
+            history = [
+                (event_id, record_type, int(round(series[record_type][i])), int(sessions[i]),
+                 int(solves[i]), timestamps[i])
+                for i in improved
+            ]
+            cursor.executemany("""
+                INSERT INTO personal_record_history
+                (event_id, record_type, time_ms, session_id, solve_id, achieved_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, history)
+
+            record = history[-1][2:] if history else (None, None, None, None)
+            cursor.execute("""
+                INSERT INTO personal_records
+                (event_id, record_type, time_ms, session_id, solve_id, achieved_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (event_id, record_type) + tuple(record))
+
+    def session_changed(self, cursor, session_id):
+        """Re-check records against everything currently in a session"""
+        event_id = self._event_of(cursor, session_id)
+        if event_id is None:
+            return
+
+        records = self._load(cursor, event_id)
+        if not records:
+            self.rebuild(cursor, event_id)
+            return
+
+        cursor.execute(f"""
+            SELECT session_id, id, {result_column()}, datetime(timestamp)
+            FROM personal_solves
+            WHERE session_id = ?
+            ORDER BY solve_number, id
+        """, (session_id,))
+        rows = cursor.fetchall()
+        series = _record_series(rows)
+
+        improvements = []
+        for record_type in RECORD_TYPES:
+            values = series[record_type]
+            best_index = int(np.argmin(values)) if len(values) else None
+            best = values[best_index] if best_index is not None else np.inf
+            current = records.get(record_type, {})
+            current_time = current.get('time_ms')
+
+            if current.get('session_id') == session_id and (current_time is None or best > current_time):
+                # The record came from this session and may be gone
+                self.rebuild(cursor, event_id)
+                return
+
+            if np.isfinite(best) and (current_time is None or best < current_time):
+                improvements.append((record_type, int(round(best)), rows[best_index][1]))
+
+        for record_type, value, solve_id in improvements:
+            self._set(cursor, event_id, record_type, value, session_id, solve_id)
+
+    @staticmethod
+    def _event_of(cursor, session_id):
+        cursor.execute("SELECT event_id FROM training_sessions WHERE id = ?", (session_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _load(cursor, event_id):
+        cursor.execute("""
+            SELECT record_type, time_ms, session_id, solve_id, achieved_at
+            FROM personal_records
+            WHERE event_id = ?
+        """, (event_id,))
+
+        return {
+            row[0]: {'time_ms': row[1], 'session_id': row[2], 'solve_id': row[3], 'achieved_at': row[4]}
+            for row in cursor.fetchall()
+        }
+
+    @staticmethod
+    def _set(cursor, event_id, record_type, time_ms, session_id, solve_id):
+        cursor.execute("""
+            INSERT INTO personal_records
+            (event_id, record_type, time_ms, session_id, solve_id, achieved_at)
+            VALUES (?, ?, ?, ?, ?, (SELECT datetime(timestamp) FROM personal_solves WHERE id = ?))
+            ON CONFLICT(event_id, record_type) DO UPDATE SET
+                time_ms = excluded.time_ms,
+                session_id = excluded.session_id,
+                solve_id = excluded.solve_id,
+                achieved_at = excluded.achieved_at,
+                updated_at = CURRENT_TIMESTAMP
+        """, (event_id, record_type, time_ms, session_id, solve_id, solve_id))
+
+        cursor.execute("""
+            INSERT INTO personal_record_history
+            (event_id, record_type, time_ms, session_id, solve_id, achieved_at)
+            SELECT event_id, record_type, time_ms, session_id, solve_id, achieved_at
+            FROM personal_records
+            WHERE event_id = ? AND record_type = ?
+        """, (event_id, record_type))
+
+
+def _record_series(rows):
+    """
+    Candidate value per solve for every record type (inf where there is none)
+
+    rows are (session_id, solve_id, result, timestamp) ordered by session and
+    solve number. Averages are computed over the whole sequence and windows
+    that cross a session boundary are discarded.
+    """
+    results = results_array([row[2] for row in rows])
+    sessions = np.array([row[0] for row in rows], dtype=np.int64)
+
+    series = {'single': results}
+    for size in AVERAGE_WINDOWS:
+        averages = rolling_average(results, size)
+        if len(rows) >= size:
+            crosses = sessions[size - 1:] != sessions[:len(sessions) - size + 1]
+            averages[size - 1:][crosses] = np.nan
+        series[f'ao{size}'] = np.where(np.isnan(averages), np.inf, np.round(averages))
+
+    return series
+
+
+# Shared by the logger and the API routes
+personal_records = PersonalRecords()
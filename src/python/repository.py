@@ -0,0 +1,462 @@
+"""
+Repository
+Read queries behind the API routes, without pandas
+
+Every query is a module-level constant and results come back as
+namedtuples: plain tuples with field names, built straight from the
+cursor rows and turned into JSON with _asdict(). Going through a
+DataFrame for a handful of rows (and importing pandas at all) cost more
+than the queries themselves.
+"""
+
+import math
+from collections import namedtuple
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent))
+from db_manager import DatabaseManager
+from session_stats import AVERAGE_WINDOWS
+from rolling_averages import result_column
+from distribution import event_distributions
+
+
+Session = namedtuple('Session', [
+    'id', 'date', 'event_id', 'solve_count',
+    'best_single', 'session_mean', 'ao5', 'ao12', 'ao50', 'ao100', 'notes'
+])
+
+Solve = namedtuple('Solve', [
+    'id', 'solve_number', 'time_seconds', 'scramble', 'penalty', 'notes', 'timestamp'
+])
+
+SolveDetails = namedtuple('SolveDetails', ['id', 'session_id', 'scramble', 'date', 'event_id', 'time_ms'])
+
+Cube = namedtuple('Cube', ['id', 'cube_type', 'brand', 'model', 'purchase_date', 'is_active', 'notes'])
+
+ProgressPoint = namedtuple('ProgressPoint', ['date', 'best', 'mean', 'ao5'])
+
+SessionSpread = namedtuple('SessionSpread', [
+    'session_id', 'date', 'count', 'dnf_count',
+    'min', 'q1', 'median', 'q3', 'max', 'mean', 'std_dev', 'cv'
+])
+
+# A listing read page by page: columns maps each field to its SQL
+# expression, rows are ordered by key (unique, backed by an index) and a
+# page starts after the key of the previous page's last row. The numbered
+# field, if any, is the 1-based position of the row in the listing.
+Listing = namedtuple('Listing', ['source', 'where', 'columns', 'key', 'descending', 'rounded', 'numbered'])
+
+DashboardSummary = namedtuple('DashboardSummary', [
+    'session_count', 'solve_count', 'dnf_count', 'valid_sum_ms',
+    'total_cubes', 'active_cubes', 'record_count', 'single'
+] + [f'ao{size}' for size in AVERAGE_WINDOWS])
+
+
+SESSIONS_SQL = """
+    SELECT
+        id, date, event_id, solve_count,
+        best_single / 1000.0, session_mean / 1000.0,
+        ao5 / 1000.0, ao12 / 1000.0, ao50 / 1000.0, ao100 / 1000.0, notes
+    FROM training_sessions
+    ORDER BY date DESC
+"""
+
+# Same rows with the times left in milliseconds, for the columnar format
+SESSIONS_MS_SQL = """
+    SELECT
+        id, date, event_id, solve_count,
+        best_single, session_mean, ao5, ao12, ao50, ao100, notes
+    FROM training_sessions
+    ORDER BY date DESC
+"""
+
+# solve_number is only an ordering key with gaps where solves were
+# deleted; the number shown is the solve's position in the session
+SESSION_SOLVES_SQL = """
+    SELECT id, ROW_NUMBER() OVER (ORDER BY solve_number, id),
+           CASE WHEN dnf = 1 THEN NULL ELSE time_ms / 1000.0 END,
+           scramble, penalty, notes, timestamp
+    FROM personal_solves
+    WHERE session_id = ?
+    ORDER BY solve_number, id
+"""
+
+SESSION_LISTING = Listing(
+    source='training_sessions',
+    where=None,
+    columns={
+        'id': 'id', 'date': 'date', 'event_id': 'event_id', 'solve_count': 'solve_count',
+        'best_single': 'best_single / 1000.0', 'session_mean': 'session_mean / 1000.0',
+        'ao5': 'ao5 / 1000.0', 'ao12': 'ao12 / 1000.0', 'ao50': 'ao50 / 1000.0', 'ao100': 'ao100 / 1000.0',
+        'notes': 'notes'
+    },
+    key=('date', 'id'),
+    descending=True,
+    rounded=('best_single', 'session_mean', 'ao5', 'ao12', 'ao50', 'ao100'),
+    numbered=None
+)
+
+SOLVE_LISTING = Listing(
+    source='personal_solves',
+    where='session_id = :session_id',
+    columns={
+        'id': 'id', 'solve_number': None,
+        'time_seconds': 'CASE WHEN dnf = 1 THEN NULL ELSE time_ms / 1000.0 END',
+        'scramble': 'scramble', 'penalty': 'penalty', 'notes': 'notes', 'timestamp': 'timestamp'
+    },
+    key=('solve_number', 'id'),
+    descending=False,
+    rounded=('time_seconds',),
+    numbered='solve_number'
+)
+
+# Newest first, as the timer shows them: time in seconds with +2 applied
+TIMER_LISTING = Listing(
+    source='personal_solves',
+    where='session_id = :session_id',
+    columns={
+        'id': 'id',
+        'time': "(time_ms + CASE WHEN penalty = '+2' AND dnf = 0 THEN 2000 ELSE 0 END) / 1000.0",
+        'penalty': "COALESCE(NULLIF(penalty, ''), 'OK')",
+        'dnf': 'dnf',
+        'scramble': "COALESCE(scramble, '')"
+    },
+    key=('solve_number', 'id'),
+    descending=True,
+    rounded=(),
+    numbered=None
+)
+
+SESSION_STATS_FIELDS = ('solve_count', 'best_single', 'session_mean', 'ao5', 'ao12', 'ao50', 'ao100')
+
+SESSION_STATS_SQL = """
+    SELECT solve_count, best_single / 1000.0, session_mean / 1000.0,
+           ao5 / 1000.0, ao12 / 1000.0, ao50 / 1000.0, ao100 / 1000.0
+    FROM training_sessions
+    WHERE id = ?
+"""
+
+SOLVE_DETAILS_SQL = """
+    SELECT ps.id, ps.session_id, ps.scramble, ts.date, ts.event_id, ps.time_ms
+    FROM personal_solves ps
+    JOIN training_sessions ts ON ps.session_id = ts.id
+    WHERE ps.id = ?
+"""
+
+CUBES_SQL = """
+    SELECT id, cube_type, brand, model, purchase_date, is_active, notes
+    FROM cubes
+"""
+
+EVENTS_SQL = "SELECT DISTINCT event_id FROM training_sessions ORDER BY event_id"
+
+PROGRESS_SQL = """
+    SELECT date, best_single / 1000.0, session_mean / 1000.0, ao5 / 1000.0
+    FROM training_sessions
+    WHERE solve_count >= 5 AND event_id = ?
+    ORDER BY date
+"""
+
+SESSION_SERIES_SQL = f"""
+    SELECT {result_column()}
+    FROM personal_solves
+    WHERE session_id = ?
+    ORDER BY solve_number, id
+"""
+
+EVENT_SERIES_SQL = f"""
+    SELECT {result_column('ps')}
+    FROM personal_solves ps
+    JOIN training_sessions ts ON ps.session_id = ts.id
+    WHERE ts.event_id = ?
+    ORDER BY ps.timestamp, ps.id
+"""
+
+SESSION_RESULTS_SQL = f"""
+    SELECT {result_column()}
+    FROM personal_solves
+    WHERE session_id = ?
+"""
+
+
+def _quantile_sql(q):
+    """Linear-interpolated quantile q of r over rows ranked i = 0..n-1 (numpy's default method)"""
+    position = f"{q} * (n - 1)"
+    below = f"CAST({position} AS INTEGER)"
+    return f"""SUM(CASE
+            WHEN i = {below} THEN r * (1 - ({position} - {below}))
+            WHEN i = {below} + 1 THEN r * ({position} - {below})
+        END)"""
+
+
+# One page of an event's sessions (by date) with the spread of their results,
+# all in one statement: solves are ranked per session by a window function
+# and the quartiles picked out of the ranks while grouping
+SESSION_SPREAD_SQL = f"""
+    WITH page AS (
+        SELECT id, date, COUNT(*) OVER () AS total
+        FROM training_sessions
+        WHERE event_id = :event AND solve_count >= 5
+          AND (:date_from IS NULL OR date >= :date_from)
+          AND (:date_to IS NULL OR date < date(:date_to, '+1 day'))
+        ORDER BY date, id
+        LIMIT :limit OFFSET :offset
+    ),
+    results AS (
+        SELECT page.id AS session_id, page.date, page.total, {result_column('ps')} AS r
+        FROM page
+        JOIN personal_solves ps ON ps.session_id = page.id
+    ),
+    ranked AS (
+        SELECT
+            session_id, date, total, r,
+            ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY r IS NULL, r) - 1 AS i,
+            COUNT(r) OVER (PARTITION BY session_id) AS n
+        FROM results
+    )
+    SELECT
+        session_id, date, total,
+        COUNT(r), SUM(r IS NULL),
+        MIN(r), {_quantile_sql(0.25)}, {_quantile_sql(0.5)}, {_quantile_sql(0.75)}, MAX(r),
+        AVG(r), AVG(r * r)
+    FROM ranked
+    GROUP BY session_id
+    ORDER BY date, session_id
+"""
+
+SESSION_COUNT_SQL = """
+    SELECT COUNT(*)
+    FROM training_sessions
+    WHERE event_id = :event AND solve_count >= 5
+      AND (:date_from IS NULL OR date >= :date_from)
+      AND (:date_to IS NULL OR date < date(:date_to, '+1 day'))
+"""
+
+_RECORD_AVERAGES = ',\n'.join(
+    f"(SELECT time_ms FROM personal_records WHERE event_id = :event AND record_type = 'ao{size}')"
+    for size in AVERAGE_WINDOWS
+)
+
+DASHBOARD_SQL = f"""
+    SELECT
+        COALESCE(SUM(session_count), 0),
+        COALESCE(SUM(solve_count), 0),
+        COALESCE(SUM(dnf_count), 0),
+        COALESCE(SUM(valid_sum_ms), 0),
+        (SELECT COUNT(*) FROM cubes),
+        (SELECT COUNT(*) FROM cubes WHERE is_active = 1),
+        (SELECT COUNT(*) FROM personal_records
+         WHERE :event = 'all' OR event_id = :event),
+        (SELECT MIN(time_ms) FROM personal_records
+         WHERE record_type = 'single' AND (:event = 'all' OR event_id = :event)),
+        {_RECORD_AVERAGES}
+    FROM event_summary
+    WHERE :event = 'all' OR event_id = :event
+"""
+
+
+# aoN records of every event, for the 'all' dashboard (averages do not mix across events)
+AVERAGE_RECORDS_SQL = f"""
+    SELECT event_id, record_type, time_ms
+    FROM personal_records
+    WHERE record_type IN ({', '.join(f"'ao{size}'" for size in AVERAGE_WINDOWS)})
+    ORDER BY event_id
+"""
+
+
+def _rounded(row, columns):
+    """Row with the given float columns rounded for display (None stays None)"""
+    return tuple(
+        round(value, 2) if i in columns and value is not None else value
+        for i, value in enumerate(row)
+    )
+
+
+def _page_sql(listing, fields, after):
+    """SELECT for one page of a listing: the key columns, then the fields (the numbered one is counted, not read)"""
+    direction = 'DESC' if listing.descending else 'ASC'
+    conditions = [listing.where] if listing.where else []
+    if after is not None:
+        operator = '<' if listing.descending else '>'
+        bounds = ', '.join(f':after_{i}' for i in range(len(listing.key)))
+        conditions.append(f"({', '.join(listing.key)}) {operator} ({bounds})")
+
+    columns = list(listing.key) + [listing.columns[name] for name in fields if name != listing.numbered]
+
+    return f"""
+        SELECT {', '.join(columns)}
+        FROM {listing.source}
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY {', '.join(f'{column} {direction}' for column in listing.key)}
+        LIMIT :limit
+    """
+
+
+def dashboard_summary(cursor, event_id):
+    """
+    Totals, cube counts and records for an event (or 'all') in one statement
+
+    With 'all' the aoN fields are None: an average is a record of one
+    event, see Repository.average_records.
+
+    Everything comes from event_summary, personal_records and cubes, which
+    stay small however many solves there are, so this costs the same for a
+    new database and one with years of history.
+    """
+    cursor.execute(DASHBOARD_SQL, {'event': event_id})
+    return DashboardSummary(*cursor.fetchone())
+
+
+class Repository:
+    """Read-only queries on the pooled read connections"""
+
+    def __init__(self, db_manager=None):
+        self.db_manager = db_manager or DatabaseManager()
+
+    def _all(self, query, params=(), row_type=None, rounded=()):
+        """Rows of a query, as row_type with the rounded columns to 2 decimals"""
+        with self.db_manager.read_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        if rounded:
+            rows = [_rounded(row, rounded) for row in rows]
+        if row_type is None:
+            return rows
+        return [row_type._make(row) for row in rows]
+
+    def sessions(self):
+        """All sessions, newest first, times in seconds"""
+        return self._all(SESSIONS_SQL, row_type=Session, rounded=range(4, 10))
+
+    def page(self, listing, fields=None, after=None, limit=None, **params):
+        """
+        (rows, next key) for one page of a listing
+
+        Rows are dicts of the requested fields (all by default); after is
+        the key the previous page ended on, limit None reads to the end, and
+        the next key is None on the last page. The key comparison is a
+        range scan on the listing's index, so a page costs the same however
+        deep into the history it is. For numbered listings the key also
+        carries the position of the row it was taken from.
+        """
+        fields = list(fields or listing.columns)
+        width = len(listing.key)
+        position = 0
+        if after is not None:
+            if len(after) != width + bool(listing.numbered):
+                raise ValueError("Invalid cursor")
+            if listing.numbered:
+                position = after[width]
+                if not isinstance(position, int):
+                    raise ValueError("Invalid cursor")
+            params.update((f'after_{i}', value) for i, value in enumerate(after[:width]))
+        params['limit'] = limit + 1 if limit is not None else -1
+
+        with self.db_manager.read_connection() as conn:
+            rows = conn.execute(_page_sql(listing, fields, after), params).fetchall()
+
+        next_key = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_key = list(rows[-1][:width])
+            if listing.numbered:
+                next_key.append(position + limit)
+
+        selected = [name for name in fields if name != listing.numbered]
+        page = []
+        for number, row in enumerate(rows, position + 1):
+            values = dict(zip(selected, row[width:]))
+            for name in listing.rounded:
+                if values.get(name) is not None:
+                    values[name] = round(values[name], 2)
+            if listing.numbered in fields:
+                values[listing.numbered] = number
+            page.append(values)
+        return page, next_key
+
+    def session_stats(self, session_id):
+        """Solve count and best / mean / averages (seconds) of a session, None if it does not exist"""
+        rows = self._all(SESSION_STATS_SQL, (session_id,), rounded=range(1, 7))
+        if not rows:
+            return None
+        return dict(zip(SESSION_STATS_FIELDS, rows[0]))
+
+    def sessions_ms(self):
+        """All sessions, newest first, as Session rows with times in milliseconds"""
+        return self._all(SESSIONS_MS_SQL, row_type=Session)
+
+    def session_solves(self, session_id):
+        """Solves of a session in order, time_seconds None for DNFs"""
+        return self._all(SESSION_SOLVES_SQL, (session_id,), Solve, rounded=(2,))
+
+    def solve_details(self, solve_id):
+        """A solve with its session's date and event, None if it does not exist"""
+        rows = self._all(SOLVE_DETAILS_SQL, (solve_id,), SolveDetails)
+        return rows[0] if rows else None
+
+    def cubes(self, active_only=False):
+        query = CUBES_SQL + (" WHERE is_active = 1" if active_only else "") + " ORDER BY cube_type"
+        return self._all(query, row_type=Cube)
+
+    def events(self):
+        """Event ids that have sessions"""
+        return [row[0] for row in self._all(EVENTS_SQL)]
+
+    def dashboard_summary(self, event_id):
+        with self.db_manager.read_connection() as conn:
+            return dashboard_summary(conn.cursor(), event_id)
+
+    def average_records(self):
+        """aoN records (ms, None when there is none) of every event with records"""
+        records = {}
+        for event_id, record_type, time_ms in self._all(AVERAGE_RECORDS_SQL):
+            records.setdefault(event_id, {f'ao{size}': None for size in AVERAGE_WINDOWS})[record_type] = time_ms
+        return records
+
+    def progress(self, event_id):
+        """Per-session best, mean and ao5 (seconds) for sessions of at least 5 solves"""
+        return self._all(PROGRESS_SQL, (event_id,), ProgressPoint, rounded=(1, 2, 3))
+
+    def session_series(self, session_id):
+        """Results of a session in solve order: ms with +2 applied, None for DNF"""
+        return [row[0] for row in self._all(SESSION_SERIES_SQL, (session_id,))]
+
+    def event_series(self, event_id):
+        """Results of all an event's solves in time order: ms with +2 applied, None for DNF"""
+        return [row[0] for row in self._all(EVENT_SERIES_SQL, (event_id,))]
+
+    def event_distribution(self, event_id):
+        """Digest summary of an event's results (see distribution.py), None without any"""
+        with self.db_manager.read_connection() as conn:
+            return event_distributions.get(conn.cursor(), event_id)
+
+    def session_results(self, session_id):
+        """Results (ms, +2 applied) of a session's non-DNF solves"""
+        return [row[0] for row in self._all(SESSION_RESULTS_SQL, (session_id,)) if row[0] is not None]
+
+    def session_spreads(self, event_id, date_from=None, date_to=None, limit=50, offset=0):
+        """
+        (SessionSpread rows, total sessions in range) for one page of an event's sessions
+        
+        Sessions of at least 5 solves between date_from and date_to
+        (inclusive, either may be None), oldest first; results in ms with
+        +2 applied, DNFs counted apart. std_dev is the population standard
+        deviation and cv is std_dev / mean.
+        """
+        params = {'event': event_id, 'date_from': date_from, 'date_to': date_to,
+                  'limit': limit, 'offset': offset}
+        with self.db_manager.read_connection() as conn:
+            rows = conn.execute(SESSION_SPREAD_SQL, params).fetchall()
+            if rows:
+                total = rows[0][2]
+            else:
+                total = conn.execute(SESSION_COUNT_SQL, params).fetchone()[0]
+        
+        spreads = []
+        for row in rows:
+            session_id, date, _, count, dnf_count, low, q1, median, q3, high, mean, mean_sq = row
+            std_dev = math.sqrt(max(mean_sq - mean * mean, 0.0)) if count else None
+            cv = std_dev / mean if count and mean else None
+            spreads.append(SessionSpread(session_id, date, count, dnf_count,
+                                         low, q1, median, q3, high, mean, std_dev, cv))
+        return spreads, total
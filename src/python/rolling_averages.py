@@ -0,0 +1,207 @@
+"""
+Rolling Averages
+Vectorized WCA aoN series over a full solve history
+
+Results are float arrays in milliseconds with +2 applied and DNFs as +inf.
+Each window drops its best and worst 5% (see session_stats.trim_count);
+windows with more DNFs than the trim are DNF averages and come back as NaN,
+as do the first N-1 positions.
+
+running_stats adds the cumulative series (best, mean and standard
+deviation of everything so far), all built from prefix sums and
+accumulates in O(n).
+"""
+
+import numpy as np
+
+from session_stats import trim_count
+
+
+DEFAULT_WINDOWS = (5, 12)
+SUPPORTED_WINDOWS = (5, 12, 50, 100, 1000)
+
+# Bounds for routes that take any window size (below 3 nothing is left after trimming)
+MIN_WINDOW = 3
+MAX_WINDOW = 1000
+
+# Upper bound on candidate values held in memory at once
+CHUNK_ELEMENTS = 1 << 22
+
+# Effective result per solve: +2 applied, NULL for DNF
+RESULT_SQL = """
+CASE
+    WHEN {p}dnf = 1 OR {p}penalty = 'DNF' THEN NULL
+    WHEN {p}penalty = '+2' THEN {p}time_ms + 2000
+    ELSE {p}time_ms
+END
+"""
+
+
+def result_column(alias=''):
+    """SQL expression for the effective result of a solve"""
+    return RESULT_SQL.format(p=f'{alias}.' if alias else '').strip()
+
+
+def results_array(values):
+    """Convert effective results (None for DNF) to a float array with +inf DNFs"""
+    results = np.array(values, dtype=float)
+    results[np.isnan(results)] = np.inf
+    return results
+
+
+def rolling_average(results, size):
+    """
+    aoN for every position of results
+
+    Window sums come from one cumulative sum. The trimmed ends come from
+    _smallest_sums, which splits the history into blocks of the window
+    size: every window is a block suffix plus the next block's prefix, so
+    its best (or worst) results are among the best of those two pieces.
+    """
+    results = np.asarray(results, dtype=float)
+    n = len(results)
+    averages = np.full(n, np.nan)
+    if n < size:
+        return averages
+
+    trim = trim_count(size)
+    dnf = np.isinf(results)
+    finite = np.where(dnf, 0.0, results)
+
+    window_sums = _window_sums(finite, size)
+    dnf_counts = _window_sums(dnf.astype(np.int64), size)
+
+    low = _smallest_sums(results, size, trim)
+    high = -_smallest_sums(-results, size, trim)
+
+    valid = (window_sums - low - high) / (size - 2 * trim)
+    valid[dnf_counts > trim] = np.nan
+    averages[size - 1:] = valid
+
+    return averages
+
+
+def _window_sums(values, size):
+    """Sum of every length-size window via one cumulative sum"""
+    totals = np.concatenate(([0], np.cumsum(values)))
+    return totals[size:] - totals[:-size]
+
+
+def _smallest_sums(values, size, count):
+    """Sum of the count smallest values of every length-size window, infinities as 0"""
+    n = len(values)
+    windows = n - size + 1
+    blocks = -(-n // size) + 1
+
+    padded = np.full(blocks * size, np.inf)
+    padded[:n] = values
+    grid = padded.reshape(blocks, size)
+
+    sums = np.empty(windows)
+    group = max(2, CHUNK_ELEMENTS // (size * count))
+
+    # Groups of blocks overlap by one so each window's next block is present
+    for first in range(0, blocks - 1, group - 1):
+        start = first * size
+        if start >= windows:
+            break
+
+        part = grid[first:first + group]
+        suffix = np.empty((len(part), size, count))
+        prefix = np.empty((len(part), size, count))
+
+        running = np.full((len(part), count), np.inf)
+        for j in range(size - 1, -1, -1):
+            running = _keep_smallest(running, part[:, j])
+            suffix[:, j] = running
+
+        running = np.full((len(part), count), np.inf)
+        for j in range(size):
+            prefix[:, j] = running
+            running = _keep_smallest(running, part[:, j])
+
+        candidates = np.concatenate([suffix[:-1], prefix[1:]], axis=2)
+        smallest = np.partition(candidates, count - 1, axis=2)[:, :, :count]
+        smallest = np.where(np.isinf(smallest), 0.0, smallest).sum(axis=2).ravel()
+
+        take = min(len(smallest), windows - start)
+        sums[start:start + take] = smallest[:take]
+
+    return sums
+
+
+def _keep_smallest(running, column):
+    """Merge one value per row into sorted per-row lists of the smallest values"""
+    merged = np.concatenate([running, column[:, None]], axis=1)
+    merged.sort(axis=1)
+    return merged[:, :-1]
+
+
+def rolling_averages(results, sizes=DEFAULT_WINDOWS):
+    """aoN series for each window size, keyed 'ao5', 'ao12', ..."""
+    results = np.asarray(results, dtype=float)
+    return {f'ao{size}': rolling_average(results, size) for size in sizes}
+
+
+def running_stats(results, sizes=DEFAULT_WINDOWS):
+    """
+    Cumulative best, mean and std_dev plus aoN series for every position
+
+    DNFs count towards the averages as usual but are left out of the
+    best, mean and standard deviation (population), which stay NaN until
+    the first non-DNF result. Squares are summed around the first result
+    so the variance does not lose precision to the size of the times.
+    """
+    results = np.asarray(results, dtype=float)
+    valid = np.isfinite(results)
+    best = np.minimum.accumulate(np.where(valid, results, np.inf))
+    stats = {
+        'best': np.where(np.isinf(best), np.nan, best),
+        'mean': np.full(len(results), np.nan),
+        'std_dev': np.full(len(results), np.nan),
+    }
+
+    if valid.any():
+        offset = results[valid][0]
+        deltas = np.where(valid, results - offset, 0.0)
+        counts = np.cumsum(valid)
+        seen = counts > 0
+        sums = np.cumsum(deltas)[seen]
+        squares = np.cumsum(deltas * deltas)[seen]
+        n = counts[seen]
+
+        means = sums / n
+        stats['mean'][seen] = offset + means
+        stats['std_dev'][seen] = np.sqrt(np.maximum(squares / n - means * means, 0.0))
+
+    stats.update(rolling_averages(results, sizes))
+    return stats
+
+
+def parse_windows(value, default=DEFAULT_WINDOWS, any_size=False):
+    """
+    Parse a 'windows=5,12,100' query argument
+
+    Only SUPPORTED_WINDOWS are accepted unless any_size, which allows
+    every size from MIN_WINDOW to MAX_WINDOW.
+    """
+    if not value:
+        return tuple(default)
+
+    sizes = []
+    for part in value.split(','):
+        size = int(part)
+        if any_size and not MIN_WINDOW <= size <= MAX_WINDOW:
+            raise ValueError(f"Unsupported window: {size} (use {MIN_WINDOW} to {MAX_WINDOW})")
+        if not any_size and size not in SUPPORTED_WINDOWS:
+            raise ValueError(f"Unsupported window: {size} (use {', '.join(map(str, SUPPORTED_WINDOWS))})")
+        if size not in sizes:
+            sizes.append(size)
+    return tuple(sizes)
+
+
+def to_seconds(series):
+    """Millisecond series to a JSON-ready list of seconds, None for DNF/empty"""
+    seconds = np.round(np.asarray(series, dtype=float) / 1000, 2)
+    seconds[~np.isfinite(seconds)] = np.nan
+    return [None if value != value else value for value in seconds.tolist()]
@@ -0,0 +1,397 @@
+"""
+Session Statistics Engine
+Incremental best/worst/mean/aoN tracking for training sessions
+
+Times are handled in milliseconds with +2 already applied; a DNF is None.
+Averages follow WCA rules: the best and worst 5% (at least one each) are
+trimmed, DNFs count as the worst results, and more DNFs than the trim
+makes the whole average a DNF (stored as NULL).
+"""
+
+import bisect
+import heapq
+import math
+import threading
+from collections import Counter, OrderedDict, deque
+
+
+AVERAGE_WINDOWS = (5, 12, 50, 100)
+
+
+def effective_time_ms(time_ms, penalty=None, dnf=False):
+    """Result of a stored solve in ms with +2 applied, or None for a DNF"""
+    if dnf or penalty == 'DNF':
+        return None
+    if penalty == '+2':
+        return time_ms + 2000
+    return time_ms
+
+
+def trim_count(size):
+    """Results trimmed from each end of an aoN"""
+    return max(1, math.ceil(size * 0.05))
+
+
+def trimmed_average(results):
+    """WCA average of a full window of results, None if it is a DNF"""
+    size = len(results)
+    trim = trim_count(size)
+    if size <= 2 * trim:
+        return None
+
+    times = sorted(r for r in results if r is not None)
+    if size - len(times) > trim:
+        return None
+
+    counted = times[trim:size - trim]
+    return sum(counted) / len(counted)
+
+
+class _RollingWindow:
+    """Last N results of a session with a sorted copy for trimming"""
+
+    def __init__(self, size):
+        self.size = size
+        self.trim = trim_count(size)
+        self._values = deque()
+        self._sorted = []
+        self._sum = 0
+        self._dnfs = 0
+
+    def push(self, result):
+        """Append the newest result, dropping the oldest if the window is full"""
+        self._values.append(result)
+        self._insert(result)
+        if len(self._values) > self.size:
+            self._discard(self._values.popleft())
+
+    def reset(self, results):
+        """Refill the window from the session tail"""
+        self._values.clear()
+        self._sorted = []
+        self._sum = 0
+        self._dnfs = 0
+        for result in results[-self.size:]:
+            self.push(result)
+
+    def average(self):
+        """Current aoN, or None while the window is short or a DNF"""
+        if len(self._values) < self.size or self._dnfs > self.trim:
+            return None
+
+        low = sum(self._sorted[:self.trim])
+        high_count = self.trim - self._dnfs
+        high = sum(self._sorted[len(self._sorted) - high_count:]) if high_count else 0
+
+        return (self._sum - low - high) / (self.size - 2 * self.trim)
+
+    def _insert(self, result):
+        if result is None:
+            self._dnfs += 1
+        else:
+            bisect.insort(self._sorted, result)
+            self._sum += result
+
+    def _discard(self, result):
+        if result is None:
+            self._dnfs -= 1
+        else:
+            del self._sorted[bisect.bisect_left(self._sorted, result)]
+            self._sum -= result
+
+
+class SessionStats:
+    """
+    Running statistics for one session
+
+    Solves are always appended at the end of a session, so each one gets an
+    increasing sequence number, and the session order is a linked list of
+    those numbers so a solve is unlinked from the middle in O(1). Mean uses
+    running sums and best/worst use heaps with lazy deletion, so insert,
+    delete and penalty changes cost O(log n). Only the last W solves (W is
+    the largest window) are ever walked, to find out whether a change
+    lands inside a window and to rebuild the windows it does.
+    """
+
+    def __init__(self, windows=AVERAGE_WINDOWS):
+        self._seq_by_id = {}
+        self._results = {}
+        self._prev = {}
+        self._next = {}
+        self._last = None
+        self._next_seq = 0
+
+        self._valid_sum = 0
+        self._valid_count = 0
+        self._min_heap = []
+        self._max_heap = []
+        self._dead_min = Counter()
+        self._dead_max = Counter()
+
+        self._windows = {size: _RollingWindow(size) for size in windows}
+
+    @property
+    def solve_count(self):
+        """Number of solves including DNFs"""
+        return len(self._results)
+
+    def add(self, solve_id, result):
+        """Append a solve to the end of the session"""
+        seq = self._next_seq
+        self._next_seq += 1
+
+        self._prev[seq] = self._last
+        if self._last is not None:
+            self._next[self._last] = seq
+        self._last = seq
+        self._seq_by_id[solve_id] = seq
+        self._results[seq] = result
+        self._include(result)
+
+        for window in self._windows.values():
+            window.push(result)
+
+    def remove(self, solve_id):
+        """Remove a solve, returns False if it is not tracked"""
+        seq = self._seq_by_id.pop(solve_id, None)
+        if seq is None:
+            return False
+
+        offset = self._offset(seq)
+        self._unlink(seq)
+        self._exclude(self._results.pop(seq))
+        self._refresh_windows(offset)
+        return True
+
+    def update(self, solve_id, result):
+        """Change the result of a solve (penalty edits)"""
+        seq = self._seq_by_id.get(solve_id)
+        if seq is None:
+            return False
+
+        self._exclude(self._results[seq])
+        self._results[seq] = result
+        self._include(result)
+
+        self._refresh_windows(self._offset(seq))
+        return True
+
+    def best(self):
+        """Best valid single in ms"""
+        return self._peek(self._min_heap, self._dead_min)
+
+    def worst(self):
+        """Worst valid single in ms"""
+        worst = self._peek(self._max_heap, self._dead_max)
+        return -worst if worst is not None else None
+
+    def mean(self):
+        """Mean of all valid singles in ms"""
+        return self._valid_sum / self._valid_count if self._valid_count else None
+
+    def average(self, size):
+        """Current aoN in ms"""
+        return self._windows[size].average()
+
+    def snapshot(self):
+        """Column values for training_sessions"""
+        mean = self.mean()
+        stats = {
+            'solve_count': self.solve_count,
+            'best_single': self.best(),
+            'worst_single': self.worst(),
+            'session_mean': int(round(mean)) if mean is not None else None,
+        }
+        for size in self._windows:
+            average = self.average(size)
+            stats[f'ao{size}'] = int(round(average)) if average is not None else None
+        return stats
+
+    def _include(self, result):
+        if result is None:
+            return
+        self._valid_sum += result
+        self._valid_count += 1
+        heapq.heappush(self._min_heap, result)
+        heapq.heappush(self._max_heap, -result)
+
+    def _exclude(self, result):
+        if result is None:
+            return
+        self._valid_sum -= result
+        self._valid_count -= 1
+        self._dead_min[result] += 1
+        self._dead_max[-result] += 1
+
+    @staticmethod
+    def _peek(heap, dead):
+        while heap and dead[heap[0]]:
+            dead[heap[0]] -= 1
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _unlink(self, seq):
+        prev = self._prev.pop(seq)
+        following = self._next.pop(seq, None)
+        if prev is not None:
+            if following is None:
+                del self._next[prev]
+            else:
+                self._next[prev] = following
+        if following is None:
+            self._last = prev
+        else:
+            self._prev[following] = prev
+
+    def _tail(self, limit):
+        """Sequence numbers of the last limit solves, oldest first"""
+        seqs = []
+        seq = self._last
+        while seq is not None and len(seqs) < limit:
+            seqs.append(seq)
+            seq = self._prev[seq]
+        seqs.reverse()
+        return seqs
+
+    def _offset(self, seq):
+        """Position of a solve counted from the end (0 = newest), None if outside every window"""
+        # Sequence numbers increase along the session, so stop once past seq
+        tail_seq = self._last
+        for offset in range(max(self._windows)):
+            if tail_seq is None or tail_seq < seq:
+                return None
+            if tail_seq == seq:
+                return offset
+            tail_seq = self._prev[tail_seq]
+        return None
+
+    def _refresh_windows(self, offset):
+        """Rebuild windows that covered the solve offset positions from the end"""
+        if offset is None:
+            return
+        tail = None
+        for size, window in self._windows.items():
+            if offset >= size:
+                continue
+            if tail is None:
+                tail = [self._results[seq] for seq in self._tail(max(self._windows))]
+            window.reset(tail)
+
+
+class SessionStatsCache:
+    """
+    SessionStats per session, kept in step with personal_solves
+
+    Callers write the solve row first and then notify the cache inside the
+    same transaction. The cached solve count is checked against
+    training_sessions before applying a change; if another connection has
+    written in the meantime the session is reloaded from the database.
+    """
+
+    def __init__(self, max_sessions=64):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+
+    def solve_added(self, cursor, session_id, solve_id, time_ms, penalty=None, dnf=False):
+        """Record a solve that was just inserted, update and return the session row"""
+        with self._lock:
+            stats = self._cached(cursor, session_id)
+            if stats is None:
+                stats = self._load(cursor, session_id)
+            else:
+                stats.add(solve_id, effective_time_ms(time_ms, penalty, dnf))
+            return self._write(cursor, session_id, stats)
+
+    def solves_added(self, cursor, session_id, solves):
+        """Record solves just inserted, (solve_id, time_ms, penalty, dnf) in order, and update the session row once"""
+        with self._lock:
+            stats = self._cached(cursor, session_id)
+            if stats is None:
+                stats = self._load(cursor, session_id)
+            else:
+                for solve_id, time_ms, penalty, dnf in solves:
+                    stats.add(solve_id, effective_time_ms(time_ms, penalty, dnf))
+            return self._write(cursor, session_id, stats)
+
+    def solve_removed(self, cursor, session_id, solve_id):
+        """Record a solve that was just deleted and update the session row"""
+        with self._lock:
+            stats = self._cached(cursor, session_id)
+            if stats is None or not stats.remove(solve_id):
+                stats = self._load(cursor, session_id)
+            return self._write(cursor, session_id, stats)
+
+    def solves_removed(self, cursor, session_id, solve_ids):
+        """Record several deleted solves and update the session row once"""
+        with self._lock:
+            stats = self._cached(cursor, session_id)
+            if stats is None or not all(stats.remove(solve_id) for solve_id in solve_ids):
+                stats = self._load(cursor, session_id)
+            return self._write(cursor, session_id, stats)
+
+    def solve_changed(self, cursor, session_id, solve_id, time_ms, penalty=None, dnf=False):
+        """Record a penalty or time edit and update the session row"""
+        with self._lock:
+            stats = self._cached(cursor, session_id)
+            if stats is None or not stats.update(solve_id, effective_time_ms(time_ms, penalty, dnf)):
+                stats = self._load(cursor, session_id)
+            return self._write(cursor, session_id, stats)
+
+    def refresh(self, cursor, session_id):
+        """Write current stats for a session, reloading it if out of date"""
+        with self._lock:
+            stats = self._cached(cursor, session_id) or self._load(cursor, session_id)
+            return self._write(cursor, session_id, stats)
+
+    def invalidate(self, session_id):
+        """Forget a session (after it was deleted or rewritten in bulk)"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _cached(self, cursor, session_id):
+        stats = self._sessions.get(session_id)
+        if stats is None:
+            return None
+
+        cursor.execute("SELECT solve_count FROM training_sessions WHERE id = ?", (session_id,))
+        row = cursor.fetchone()
+        if not row or (row[0] or 0) != stats.solve_count:
+            self._sessions.pop(session_id, None)
+            return None
+
+        self._sessions.move_to_end(session_id)
+        return stats
+
+    def _load(self, cursor, session_id):
+        cursor.execute("""
+            SELECT id, time_ms, penalty, dnf
+            FROM personal_solves
+            WHERE session_id = ?
+            ORDER BY solve_number, id
+        """, (session_id,))
+
+        stats = SessionStats()
+        for solve_id, time_ms, penalty, dnf in cursor.fetchall():
+            stats.add(solve_id, effective_time_ms(time_ms, penalty, dnf))
+
+        self._sessions[session_id] = stats
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+        return stats
+
+    @staticmethod
+    def _write(cursor, session_id, stats):
+        values = stats.snapshot()
+        columns = list(values)
+        cursor.execute(
+            f"UPDATE training_sessions SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+            [values[c] for c in columns] + [session_id]
+        )
+        return values
+
+
+# Shared by the logger and the API routes
+stats_cache = SessionStatsCache()
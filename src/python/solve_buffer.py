@@ -0,0 +1,250 @@
+"""
+Solve Buffer
+Group commit for timer solves
+
+SQLite has one writer, so with a dozen timers saving at once a
+transaction per solve makes the saves queue up behind each other. In
+group mode SolveBuffer sits in front of personal_solves: request threads
+queue their solves and a flusher thread writes everything queued in one
+transaction, interval seconds after the oldest solve arrived or as soon
+as max_rows are waiting. Session stats are written once per session per
+flush.
+
+A request only gets its answer once the transaction holding its solves
+has committed, so an acknowledged solve is exactly as durable as one
+committed on its own; it just shares the commit with the others. The
+price is up to interval of extra latency per save. Commit mode skips the
+buffer and gives every save its own transaction, as before.
+
+If a group fails to commit, its requests are retried one transaction
+each, so a bad request only fails itself.
+"""
+
+from collections import OrderedDict, deque
+from pathlib import Path
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).parent))
+from training_logger import TrainingLogger
+
+
+DURABILITY_MODES = ('group', 'commit')
+DEFAULT_DURABILITY = 'group'
+
+# Seconds a group keeps collecting after its first solve arrived
+DEFAULT_INTERVAL = 0.005
+
+# A group is flushed right away once this many solves are waiting
+DEFAULT_MAX_ROWS = 256
+
+# Seconds a request waits for its flush before giving up
+WAIT_TIMEOUT = 30.0
+
+# Recent flushes kept for the latency percentiles
+LATENCY_SAMPLES = 1024
+
+
+class _Request:
+    """Solves of one request waiting for a flush"""
+
+    def __init__(self, session_id, solves):
+        self.session_id = session_id
+        self.solves = solves
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _FlushStats:
+    """Counters and recent latencies of the flushes"""
+
+    def __init__(self):
+        self.flushes = 0
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.max_rows = 0
+        self.commit_times = deque(maxlen=LATENCY_SAMPLES)
+        self.wait_times = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, requests, commit_time, finished):
+        rows = sum(len(request.solves) for request in requests)
+        with self._lock:
+            self.flushes += 1
+            self.requests += len(requests)
+            self.rows += rows
+            self.errors += sum(request.error is not None for request in requests)
+            self.max_rows = max(self.max_rows, rows)
+            self.commit_times.append(commit_time)
+            self.wait_times.extend(finished - request.queued_at for request in requests)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'flushes': self.flushes,
+                'requests': self.requests,
+                'rows': self.rows,
+                'errors': self.errors,
+                'avg_rows_per_flush': round(self.rows / self.flushes, 2) if self.flushes else 0.0,
+                'max_rows_per_flush': self.max_rows,
+                'commit_ms': _latencies(self.commit_times),
+                'ack_ms': _latencies(self.wait_times)
+            }
+
+
+def _latencies(samples):
+    """avg / p50 / p99 / max in ms of recent samples (seconds)"""
+    if not samples:
+        return {'avg': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+    ordered = sorted(samples)
+    return {
+        'avg': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50': round(ordered[len(ordered) // 2] * 1000, 3),
+        'p99': round(ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)] * 1000, 3),
+        'max': round(ordered[-1] * 1000, 3)
+    }
+
+
+class SolveBuffer:
+    """Write-behind stage for timer solves (see the module docstring)"""
+
+    def __init__(self, durability=DEFAULT_DURABILITY, interval=DEFAULT_INTERVAL, max_rows=DEFAULT_MAX_ROWS):
+        self.durability = DEFAULT_DURABILITY
+        self.interval = DEFAULT_INTERVAL
+        self.max_rows = DEFAULT_MAX_ROWS
+        self.configure(durability, interval, max_rows)
+
+        self._queue = []
+        self._queued_rows = 0
+        self._cond = threading.Condition()
+        self._flusher = None
+        self._stats = _FlushStats()
+
+    def configure(self, durability=None, interval=None, max_rows=None):
+        """Change the mode or group limits; solves already queued are flushed as before"""
+        if durability is not None:
+            if durability not in DURABILITY_MODES:
+                raise ValueError(f"Unknown durability: {durability} (use {', '.join(DURABILITY_MODES)})")
+            self.durability = durability
+        if interval is not None:
+            if interval < 0:
+                raise ValueError("interval must not be negative")
+            self.interval = interval
+        if max_rows is not None:
+            if max_rows < 1:
+                raise ValueError("max_rows must be at least 1")
+            self.max_rows = max_rows
+
+    def submit(self, session_id, solves):
+        """
+        Save timer solves, see TrainingLogger.add_timer_solves
+
+        Returns the same ([(client_id, solve_id, created)], stats) once
+        the solves are committed.
+        """
+        request = _Request(session_id, solves)
+
+        if self.durability == 'commit':
+            self._flush_each([request])
+            self._stats.record([request], time.perf_counter() - request.queued_at, time.perf_counter())
+        else:
+            with self._cond:
+                self._queue.append(request)
+                self._queued_rows += len(solves)
+                self._start_flusher()
+                self._cond.notify()
+
+            if not request.done.wait(WAIT_TIMEOUT):
+                raise sqlite3.OperationalError("Timed out waiting for the solve buffer")
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def stats(self):
+        """Mode, group limits, queue depth and flush metrics"""
+        with self._cond:
+            queued = self._queued_rows
+        return dict(
+            self._stats.as_dict(),
+            durability=self.durability,
+            interval_ms=self.interval * 1000,
+            max_rows=self.max_rows,
+            queued=queued
+        )
+
+    def _start_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, name='solve-buffer', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+
+                # Collect until the oldest solve has waited interval or the group is full
+                while self._queued_rows < self.max_rows:
+                    remaining = self._queue[0].queued_at + self.interval - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                group, self._queue = self._queue, []
+                self._queued_rows = 0
+
+            self._flush(group)
+
+    def _flush(self, group):
+        """Write a group in one transaction, or each request on its own if that fails"""
+        start = time.perf_counter()
+        try:
+            self._flush_group(group)
+        except Exception:
+            for request in group:
+                request.result = None
+            self._flush_each(group)
+
+        finished = time.perf_counter()
+        self._stats.record(group, finished - start, finished)
+        for request in group:
+            request.done.set()
+
+    @staticmethod
+    def _flush_group(group):
+        # One insert per session, so each session's stats are written once
+        sessions = OrderedDict()
+        for request in group:
+            sessions.setdefault(request.session_id, []).append(request)
+
+        logger = TrainingLogger()
+        with logger.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            for session_id, requests in sessions.items():
+                solves = [solve for request in requests for solve in request.solves]
+                results, stats = logger.insert_timer_solves(cursor, session_id, solves)
+
+                offset = 0
+                for request in requests:
+                    request.result = (results[offset:offset + len(request.solves)], stats)
+                    offset += len(request.solves)
+            conn.commit()
+
+    @staticmethod
+    def _flush_each(requests):
+        logger = TrainingLogger()
+        for request in requests:
+            try:
+                request.result = logger.add_timer_solves(request.session_id, request.solves)
+            except Exception as e:
+                request.error = e
+
+
+# Shared by the timer routes
+solve_buffer = SolveBuffer()
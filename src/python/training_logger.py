@@ -3,17 +3,53 @@ Training Logger - Fixed to use singleton DatabaseManager
 """
 
 from pathlib import Path
-import pandas as pd
 import sys
 
 # Import the DatabaseManager
 sys.path.insert(0, str(Path(__file__).parent))
 from db_manager import DatabaseManager
+from session_stats import stats_cache
+from personal_records import personal_records
 
 
 class TrainingLogger:
     """Log personal training sessions and solves"""
     
+    INSERT_SOLVE = """
+    INSERT INTO personal_solves 
+    (session_id, solve_number, time_ms, scramble, penalty, dnf, plus_two, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # Bulk path: rows whose import_hash is already stored are skipped
+    INSERT_SOLVES = """
+    INSERT OR IGNORE INTO personal_solves 
+    (session_id, solve_number, time_ms, scramble, penalty, dnf, plus_two, notes, import_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # Timer path: DNFs keep their time so the penalty can be taken back
+    INSERT_TIMER_SOLVE = """
+    INSERT INTO personal_solves 
+    (session_id, solve_number, time_ms, scramble, penalty, dnf, timestamp, import_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # Timer uploads store the client's id for a solve as its import_hash
+    TIMER_HASH_PREFIX = 'timer:'
+    
+    # Hashes per lookup, kept under SQLite's bound parameter limit
+    HASH_LOOKUP_SIZE = 500
+    
+    # Solve ids per DELETE in delete_solves, for the same reason
+    DELETE_CHUNK_SIZE = 500
+    
+    # solve_number orders the solves of a session; deletes leave gaps in it,
+    # so the next solve is numbered after the highest one, not the count
+    NEXT_SOLVE_NUMBER = """
+    SELECT COALESCE(MAX(solve_number), 0) + 1 FROM personal_solves WHERE session_id = ?
+    """
+    
     def __init__(self, db_path="data/speedcube.db"):
         self.db_manager = DatabaseManager(db_path)
     
@@ -52,152 +88,220 @@ class TrainingLogger:
         with self.db_manager.get_connection() as conn:
             cursor = conn.cursor()
             
-            # Determine DNF/+2
-            dnf = 1 if penalty == 'DNF' else 0
-            plus_two = 1 if penalty == '+2' else 0
-            
-            # Store DNF as 0ms
-            if dnf:
-                time_ms = 0
-            else:
-                time_ms = int(time_seconds * 1000)
+            time_ms, dnf, plus_two = self._solve_values(time_seconds, penalty)
             
-            # Get current solve number
-            cursor.execute(
-                "SELECT COUNT(*) FROM personal_solves WHERE session_id = ?",
-                (session_id,)
-            )
-            solve_number = cursor.fetchone()[0] + 1
+            cursor.execute(self.NEXT_SOLVE_NUMBER, (session_id,))
+            solve_number = cursor.fetchone()[0]
             
-            query = """
-            INSERT INTO personal_solves 
-            (session_id, solve_number, time_ms, scramble, penalty, dnf, plus_two, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            cursor.execute(query, (
+            cursor.execute(self.INSERT_SOLVE, (
                 session_id, solve_number, time_ms, scramble,
                 penalty, dnf, plus_two, notes
             ))
+            solve_id = cursor.lastrowid
+            stats = stats_cache.solve_added(cursor, session_id, solve_id, time_ms, penalty, dnf)
+            personal_records.solve_added(cursor, session_id, solve_id, time_ms, penalty, dnf, stats)
             conn.commit()
             
-            print(f"  Solve #{solve_number}: {time_seconds:.2f}s" + 
+            print(f"  Solve #{stats['solve_count']}: {time_seconds:.2f}s" + 
                   (f" ({penalty})" if penalty else ""))
     
-    def update_session_stats(self, session_id):
-        """Calculate and update session statistics"""
+    def add_solves(self, session_id, solves, batch_size=None):
+        """
+        Add many solves to a session in bulk
+        
+        solves is an iterable of (time_seconds, scramble, penalty[, notes[, import_hash]]).
+        Rows go in with executemany, in one transaction or one per
+        batch_size rows. The writer connection is only held while a batch
+        is written, so timer saves get in between batches of a long import.
+        Rows with an import_hash that is already stored are ignored. Session
+        stats and records are updated once at the end, or for the committed
+        batches if the iterable raises. Returns the number of solves added.
+        """
+        added = 0
+        batch = []
+        try:
+            for solve in solves:
+                time_seconds, scramble, penalty = solve[:3]
+                notes = solve[3] if len(solve) > 3 else ''
+                import_hash = solve[4] if len(solve) > 4 else None
+                time_ms, dnf, plus_two = self._solve_values(time_seconds, penalty)
+                
+                batch.append((time_ms, scramble, penalty, dnf, plus_two, notes, import_hash))
+                
+                if batch_size and len(batch) >= batch_size:
+                    added += self._write_batch(session_id, batch)
+                    batch = []
+            
+            if batch:
+                added += self._write_batch(session_id, batch, last=True, added_before=added)
+            elif added:
+                with self.db_manager.get_connection() as conn:
+                    self._solves_added(conn.cursor(), session_id)
+                    conn.commit()
+        except BaseException:
+            # Keep stats and records right for the batches already committed
+            if added:
+                with self.db_manager.get_connection() as conn:
+                    self._solves_added(conn.cursor(), session_id)
+                    conn.commit()
+            raise
+        
+        return added
+    
+    def _write_batch(self, session_id, batch, last=False, added_before=0):
+        """
+        Number and insert one batch in its own transaction, returns rows added
+        
+        The last batch also brings stats and records up to date in the same
+        transaction if this or an earlier batch added anything.
+        """
         with self.db_manager.get_connection() as conn:
             cursor = conn.cursor()
             
-            # Get all solves for this session
-            query = """
-            SELECT time_ms, dnf FROM personal_solves
-            WHERE session_id = ?
-            ORDER BY solve_number
-            """
+            # Numbers are taken at write time; other writers may have added solves since the last batch
+            cursor.execute(self.NEXT_SOLVE_NUMBER, (session_id,))
+            next_number = cursor.fetchone()[0]
             
-            cursor.execute(query, (session_id,))
-            all_solves = cursor.fetchall()
-            
-            if not all_solves:
-                return
-            
-            # Separate valid times from DNFs
-            times = []
-            dnf_count = 0
-            
-            for time_ms, is_dnf in all_solves:
-                if is_dnf:
-                    dnf_count += 1
-                else:
-                    times.append(time_ms)
-            
-            total_solves = len(all_solves)
-            
-            # Calculate basic stats
-            if times:
-                best_single = min(times)
-                worst_single = max(times)
-                session_mean = sum(times) / len(times)
-            else:
-                best_single = None
-                worst_single = None
-                session_mean = None
-            
-            # Calculate Ao5
-            ao5 = None
-            if total_solves >= 5:
-                last_5 = all_solves[-5:]
-                last_5_times = [t for t, dnf in last_5 if not dnf]
-                
-                if len(last_5_times) >= 3:
-                    sorted_times = sorted(last_5_times)
-                    if len(sorted_times) == 3:
-                        middle = sorted_times
-                    elif len(sorted_times) == 4:
-                        middle = sorted_times[1:3]
-                    else:  # len == 5
-                        middle = sorted_times[1:4]
-                    
-                    ao5 = sum(middle) / len(middle)
-            
-            # Calculate Ao12
-            ao12 = None
-            if total_solves >= 12:
-                last_12 = all_solves[-12:]
-                last_12_times = [t for t, dnf in last_12 if not dnf]
-                
-                if len(last_12_times) >= 10:
-                    sorted_times = sorted(last_12_times)
-                    if len(sorted_times) == 10:
-                        middle = sorted_times
-                    elif len(sorted_times) == 11:
-                        middle = sorted_times[1:11]
-                    else:  # len == 12
-                        middle = sorted_times[1:11]
-                    
-                    ao12 = sum(middle) / len(middle)
-            
-            # Update session
-            query = """
-            UPDATE training_sessions
-            SET solve_count = ?,
-                best_single = ?,
-                worst_single = ?,
-                session_mean = ?,
-                ao5 = ?,
-                ao12 = ?
-            WHERE id = ?
-            """
+            added = self._insert_batch(cursor, [
+                (session_id, next_number + i) + row for i, row in enumerate(batch)
+            ])
+            if last and (added or added_before):
+                self._solves_added(cursor, session_id)
+            conn.commit()
+            return added
+    
+    def _insert_batch(self, cursor, batch):
+        """Insert rows, returns how many were not duplicates"""
+        # rowcount, unlike total_changes, leaves out rows written by triggers
+        cursor.executemany(self.INSERT_SOLVES, batch)
+        return cursor.rowcount
+    
+    @staticmethod
+    def _solves_added(cursor, session_id):
+        """Bring session stats and records up to date after a bulk insert"""
+        stats_cache.invalidate(session_id)
+        stats_cache.refresh(cursor, session_id)
+        personal_records.session_changed(cursor, session_id)
+    
+    def add_timer_solves(self, session_id, solves):
+        """
+        Add an ordered batch of timer solves in one transaction
+        
+        solves are (client_id, time_ms, penalty, dnf, scramble, timestamp)
+        tuples. A client id that is already stored (a retried upload) is
+        not inserted again; solves without one are always inserted. Session
+        stats are updated once for the batch.
+        Returns ([(client_id, solve_id, created)], session stats row).
+        """
+        with self.db_manager.get_connection() as conn:
+            result = self.insert_timer_solves(conn.cursor(), session_id, solves)
+            conn.commit()
+        return result
+    
+    def insert_timer_solves(self, cursor, session_id, solves):
+        """add_timer_solves within the caller's transaction"""
+        hashes = [self.TIMER_HASH_PREFIX + str(solve[0]) if solve[0] is not None else None for solve in solves]
+        known = [import_hash for import_hash in hashes if import_hash is not None]
+        stored = {}
+        for start in range(0, len(known), self.HASH_LOOKUP_SIZE):
+            chunk = known[start:start + self.HASH_LOOKUP_SIZE]
+            cursor.execute(f"""
+                SELECT import_hash, id FROM personal_solves
+                WHERE import_hash IN ({', '.join('?' * len(chunk))})
+            """, chunk)
+            stored.update(cursor.fetchall())
+        
+        cursor.execute(self.NEXT_SOLVE_NUMBER, (session_id,))
+        solve_number = cursor.fetchone()[0]
+        
+        results = []
+        added = []
+        for import_hash, (client_id, time_ms, penalty, dnf, scramble, timestamp) in zip(hashes, solves):
+            if import_hash in stored:
+                results.append((client_id, stored[import_hash], False))
+                continue
             
-            cursor.execute(query, (
-                total_solves, best_single, worst_single,
-                session_mean, ao5, ao12, session_id
+            cursor.execute(self.INSERT_TIMER_SOLVE, (
+                session_id, solve_number, time_ms, scramble, penalty, 1 if dnf else 0, timestamp, import_hash
             ))
+            if import_hash is not None:
+                stored[import_hash] = cursor.lastrowid
+            results.append((client_id, cursor.lastrowid, True))
+            added.append((cursor.lastrowid, time_ms, penalty, dnf))
+            solve_number += 1
+        
+        stats = stats_cache.solves_added(cursor, session_id, added)
+        if len(added) == 1:
+            personal_records.solve_added(cursor, session_id, *added[0], stats)
+        elif added:
+            personal_records.session_changed(cursor, session_id)
+        return results, stats
+    
+    def find_imported(self, import_hashes):
+        """Map the given import hashes that are already stored to their session id"""
+        import_hashes = list(import_hashes)
+        found = {}
+        
+        with self.db_manager.read_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(import_hashes), self.HASH_LOOKUP_SIZE):
+                chunk = import_hashes[start:start + self.HASH_LOOKUP_SIZE]
+                cursor.execute(f"""
+                    SELECT import_hash, session_id FROM personal_solves
+                    WHERE import_hash IN ({', '.join('?' * len(chunk))})
+                """, chunk)
+                found.update(cursor.fetchall())
+        
+        return found
+    
+    @staticmethod
+    def _solve_values(time_seconds, penalty):
+        """Stored (time_ms, dnf, plus_two) for a solve"""
+        dnf = 1 if penalty == 'DNF' else 0
+        plus_two = 1 if penalty == '+2' else 0
+        
+        # Store DNF as 0ms
+        time_ms = 0 if dnf else int(time_seconds * 1000)
+        
+        return time_ms, dnf, plus_two
+    
+    def update_session_stats(self, session_id):
+        """Calculate and update session statistics"""
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            stats = stats_cache.refresh(cursor, session_id)
             conn.commit()
+            return stats
     
     def get_all_sessions(self):
-        """Get all training sessions"""
+        """Get all training sessions as a DataFrame (the API uses repository.py)"""
+        import pandas as pd
+        
         query = """
         SELECT 
             id, date, event_id, solve_count,
-            best_single, session_mean, ao5, ao12, notes
+            best_single, session_mean, ao5, ao12, ao50, ao100, notes
         FROM training_sessions
         ORDER BY date DESC
         """
         
-        with self.db_manager.get_connection() as conn:
+        with self.db_manager.read_connection() as conn:
             df = pd.read_sql_query(query, conn)
         
         # Convert to seconds
-        for col in ['best_single', 'session_mean', 'ao5', 'ao12']:
+        for col in ['best_single', 'session_mean', 'ao5', 'ao12', 'ao50', 'ao100']:
             if col in df.columns:
                 df[col] = df[col] / 1000
         
         return df
     
     def delete_solve(self, solve_id):
-        """Delete a specific solve"""
+        """
+        Delete a specific solve
+        
+        The other solves keep their solve_number (display numbers are
+        row positions, see repository.py), so this touches one row.
+        """
         with self.db_manager.get_connection() as conn:
             cursor = conn.cursor()
             
@@ -213,25 +317,49 @@ class TrainingLogger:
             # Delete the solve
             cursor.execute("DELETE FROM personal_solves WHERE id = ?", (solve_id,))
             
-            # Renumber remaining solves
-            cursor.execute("""
-                SELECT id FROM personal_solves 
-                WHERE session_id = ? 
-                ORDER BY solve_number
-            """, (session_id,))
-            
-            solves = cursor.fetchall()
-            for idx, (sid,) in enumerate(solves, 1):
-                cursor.execute("UPDATE personal_solves SET solve_number = ? WHERE id = ?", (idx, sid))
-            
+            stats_cache.solve_removed(cursor, session_id, solve_id)
+            personal_records.solve_removed(cursor, session_id)
             conn.commit()
             
             return True
     
+    def delete_solves(self, solve_ids):
+        """
+        Delete many solves in one transaction, returns the number deleted
+        
+        Ids that do not exist are skipped. Stats and records of each
+        affected session are updated once, after all its solves are gone.
+        """
+        solve_ids = list(dict.fromkeys(solve_ids))
+        removed = {}
+        
+        with self.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            for start in range(0, len(solve_ids), self.DELETE_CHUNK_SIZE):
+                chunk = solve_ids[start:start + self.DELETE_CHUNK_SIZE]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(
+                    f"SELECT id, session_id FROM personal_solves WHERE id IN ({placeholders})", chunk
+                )
+                for solve_id, session_id in cursor.fetchall():
+                    removed.setdefault(session_id, []).append(solve_id)
+                cursor.execute(f"DELETE FROM personal_solves WHERE id IN ({placeholders})", chunk)
+            
+            for session_id, ids in removed.items():
+                stats_cache.solves_removed(cursor, session_id, ids)
+                personal_records.solve_removed(cursor, session_id)
+            conn.commit()
+        
+        return sum(len(ids) for ids in removed.values())
+    
     def delete_session(self, session_id):
         """Delete a training session and all its solves"""
         with self.db_manager.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM personal_solves WHERE session_id = ?", (session_id,))
             cursor.execute("DELETE FROM training_sessions WHERE id = ?", (session_id,))
-            conn.commit()
\ No newline at end of file
+            personal_records.session_deleted(cursor, session_id)
+            conn.commit()
+        
+        stats_cache.invalidate(session_id)
\ No newline at end of file
@@ -3,7 +3,22 @@ WCA REST API Client
 Uses static JSON files from: https://github.com/robiningelbrecht/wca-rest-api
 """
 
+import bisect
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from disk_cache import DiskCache
+
+
+# Seconds each kind of file stays cached, by path prefix (first match wins)
+CACHE_TTLS = [
+    ('rank/', 6 * 3600),
+    ('persons/', 7 * 24 * 3600),
+    ('', 30 * 24 * 3600),  # events, countries, continents
+]
 
 
 class WCAApiClient:
@@ -11,27 +26,89 @@ class WCAApiClient:
     
     BASE_URL = "https://raw.githubusercontent.com/robiningelbrecht/wca-rest-api/master/api"
     
-    def __init__(self):
+    def __init__(self, cache_dir="data/cache", cache_max_bytes=64 * 1024 * 1024, max_workers=8):
+        self.max_workers = max_workers
+        
+        # One pooled connection per worker so batched fetches never wait for a socket
         self.session = requests.Session()
-        self._cache = {}
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Shared with other processes and kept across restarts
+        self._cache = DiskCache(cache_dir, 'wca_api', cache_max_bytes)
+        
+        # Downloads in progress by path, so concurrent callers share one
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._executor = None
     
-    def _get_json(self, path):
-        """Get JSON from path with caching"""
-        if path in self._cache:
-            return self._cache[path]
+    def _get_json(self, path, cache=True):
+        """Get JSON from path with caching (cache=False skips the cache read but stores the result)"""
+        if cache:
+            data = self._cache.get(path)
+            if data is not None:
+                return data
+        
+        with self._lock:
+            future = self._in_flight.get(path)
+            owner = future is None
+            if owner:
+                future = self._in_flight[path] = Future()
+        
+        if not owner:
+            return future.result()
         
+        try:
+            # Another caller may have finished the same download since our cache miss
+            data = self._cache.get(path) if cache else None
+            if data is None:
+                data = self._fetch(path)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[path]
+    
+    def _fetch(self, path):
+        """Download one file and cache it, None on failure"""
         url = f"{self.BASE_URL}/{path}"
         
         try:
             response = self.session.get(url, timeout=30)
             response.raise_for_status()
             data = response.json()
-            self._cache[path] = data
+            self._cache.set(path, data, self._ttl(path))
             return data
         except Exception as e:
             print(f"Error fetching {path}: {e}")
             return None
     
+    def _map(self, function, items):
+        """Run function over items on the client's thread pool, results in order"""
+        items = list(items)
+        if len(items) <= 1:
+            return [function(item) for item in items]
+        
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='wca-api')
+        
+        return list(self._executor.map(function, items))
+    
+    @staticmethod
+    def _ttl(path):
+        for prefix, ttl in CACHE_TTLS:
+            if path.startswith(prefix):
+                return ttl
+    
+    def cached_at(self, path):
+        """When the cached copy of path was fetched (epoch seconds), None if not cached"""
+        return self._cache.stored_at(path)
+    
     # General endpoints
     def get_continents(self):
         """Get list of continents"""
@@ -49,7 +126,7 @@ class WCAApiClient:
         return data.get('items', []) if data else []
     
     # Rankings endpoints
-    def get_rankings(self, region='world', type='single', event='333'):
+    def get_rankings(self, region='world', type='single', event='333', cache=True):
         """
         Get rankings
         
@@ -58,10 +135,26 @@ class WCAApiClient:
             type: 'single' or 'average'
             event: Event ID (333, 222, etc.)
         """
-        path = f"rank/{region}/{type}/{event}.json"
-        data = self._get_json(path)
+        path = self.rankings_path(region, type, event)
+        data = self._get_json(path, cache)
         return data.get('items', []) if data else []
     
+    @staticmethod
+    def rankings_path(region='world', type='single', event='333'):
+        return f"rank/{region}/{type}/{event}.json"
+    
+    def get_ranking_times(self, region='world', type='single', event='333', cache=True):
+        """Sorted ranked times in seconds, None if the rankings could not be fetched"""
+        rankings = self.get_rankings(region, type, event, cache)
+        if not rankings:
+            return None
+        
+        field = 'best' if type == 'single' else 'average'
+        return sorted(
+            rank_data[field] / 100 for rank_data in rankings
+            if (rank_data.get(field) or 0) > 0
+        )
+    
     # Person endpoints
     def get_person(self, wca_id):
         """Get person by WCA ID"""
@@ -69,6 +162,16 @@ class WCAApiClient:
         data = self._get_json(path)
         return data if data else None
     
+    def get_persons(self, wca_ids):
+        """
+        Get several persons at once as {wca_id: person or None}
+        
+        Cache misses are fetched concurrently on a pool of max_workers
+        threads instead of one round trip after another.
+        """
+        wca_ids = list(dict.fromkeys(wca_id for wca_id in wca_ids if wca_id))
+        return dict(zip(wca_ids, self._map(self.get_person, wca_ids)))
+    
     # Helper methods
     def get_world_record(self, event='333', type='single'):
         """Get world record (first in world rankings)"""
@@ -141,26 +244,29 @@ class WCAApiClient:
         """
         print(f"  Fetching {region} {type} rankings for {event}...")
         
-        rankings = self.get_rankings(region, type, event)
+        times = self.get_ranking_times(region, type, event)
         
-        if not rankings:
+        if not times:
             print("  Rankings unavailable, using approximate statistics...")
             return self._approximate_percentile(time_seconds)
         
-        print(f"  Loaded {len(rankings):,} ranked competitors...")
+        print(f"  Loaded {len(times):,} ranked competitors...")
         
-        # Extract times from rankings
-        times = []
-        for rank_data in rankings:
-            result = rank_data.get('best' if type == 'single' else 'average', 0)
-            if result > 0:
-                times.append(result / 100)
+        return self.percentile_from_times(times, time_seconds)
+    
+    @classmethod
+    def percentile_from_times(cls, times, time_seconds):
+        """
+        Percentile of time_seconds against sorted ranked times
         
+        The position within the rankings is a bisect, so this is O(log n)
+        and can run on every request once the times are loaded.
+        """
         if not times:
-            return self._approximate_percentile(time_seconds)
+            return cls._approximate_percentile(time_seconds)
         
         # Calculate within top 1000
-        faster_count = sum(1 for t in times if t < time_seconds)
+        faster_count = bisect.bisect_left(times, time_seconds)
         total_ranked = len(times)
         
         # Extrapolate to broader competitor base
@@ -204,7 +310,8 @@ class WCAApiClient:
                 'note': f'Top {faster_count + 1} out of ~{estimated_total:,} ranked competitors worldwide'
             }
     
-    def _approximate_percentile(self, time_seconds):
+    @staticmethod
+    def _approximate_percentile(time_seconds):
         """Fallback: Approximate percentile"""
         percentile_map = {
             6: (0.01, "Elite (World-class)"),
@@ -268,12 +375,13 @@ def main():
     print("\n3. Top 5 Rankings (3x3x3 Single):")
     rankings = client.get_rankings('world', 'single', '333')
     if rankings:
+        persons = client.get_persons(rank.get('personId') for rank in rankings[:5])
         for rank in rankings[:5]:
             time_s = rank.get('best', 0) / 100
             person_id = rank.get('personId', 'Unknown')
             
             # Get person details
-            person = client.get_person(person_id)
+            person = persons.get(person_id)
             name = person.get('name', person_id) if person else person_id
             country = person.get('country', 'Unknown') if person else 'Unknown'
             world_rank = rank.get('rank', {}).get('world', '?')
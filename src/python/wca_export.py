@@ -0,0 +1,365 @@
+"""
+WCA Results Export
+Load the official WCA results export into SQLite for exact ranks
+
+The export (https://www.worldcubeassociation.org/export/results) is a zip
+of TSV files. Countries, persons and the RanksSingle/RanksAverage tables
+are streamed row by row into staging copies of wca_countries, wca_persons
+and wca_ranks, so memory stays bounded however big the dump is, and the
+copies replace the loaded export once they are complete. Both the old
+(WCA_export_RanksSingle.tsv, personId) and the current (ranks_single.tsv,
+person_id) file and column names are understood.
+
+A rank is then one count over the (event, type[, region], best) index:
+rank = competitors with a strictly better result + 1.
+
+Usage:
+    python src/python/wca_export.py <WCA_export.tsv.zip | directory>
+"""
+
+import csv
+import io
+import json
+import re
+import sys
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from db_manager import DatabaseManager
+
+
+# Rows per transaction; the app's writes wait for at most one batch
+BATCH_SIZE = 5000
+
+RANK_FILES = {'ranks_single': 'single', 'ranks_average': 'average'}
+
+# Results that are not a time in centiseconds
+UNTIMED_EVENTS = ('333fm', '333mbf', '333mbo')
+
+# Tables an export replaces, loaded as <table>_new and renamed into place
+# (keep in step with sql/schema.sql)
+EXPORT_TABLES = {
+    'wca_countries': """(
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        continent_id TEXT,
+        iso2 TEXT
+    )""",
+    'wca_persons': """(
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        country_id TEXT
+    )""",
+    'wca_ranks': """(
+        event_id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        person_id TEXT NOT NULL,
+        best INTEGER NOT NULL,
+        country_id TEXT,
+        continent_id TEXT,
+        PRIMARY KEY (event_id, type, best, person_id),
+        UNIQUE (event_id, type, continent_id, best, person_id),
+        UNIQUE (event_id, type, country_id, best, person_id)
+    ) WITHOUT ROWID""",
+    'wca_rank_totals': """(
+        event_id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        region TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        PRIMARY KEY (event_id, type, region)
+    ) WITHOUT ROWID""",
+}
+
+STAGING = '_new'
+RETIRED = '_old'
+
+# Rank rows as read from the export, before they are sorted into wca_ranks_new
+RAW_RANKS = 'wca_ranks_load'
+
+
+def _snake(name):
+    """'WCA_export_RanksSingle' / 'personId' -> 'ranks_single' / 'person_id'"""
+    name = re.sub(r'^wca_export_', '', name, flags=re.IGNORECASE)
+    name = re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', name).lower()
+    return 'sub_id' if name == 'subid' else name
+
+
+class _ExportFiles:
+    """TSV files of an export given as a zip or an extracted directory"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path) if self.path.suffix == '.zip' else None
+        names = self._zip.namelist() if self._zip else [p.name for p in self.path.iterdir()]
+        self._names = {_snake(Path(name).name.split('.')[0]): name for name in names}
+
+    def has(self, table):
+        return table in self._names
+
+    def rows(self, table):
+        """Yield each row of a table as a dict with snake_case keys"""
+        name = self._names[table]
+        raw = self._zip.open(name) if self._zip else open(self.path / name, 'rb')
+        with io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+            reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+            header = [_snake(column) for column in next(reader)]
+            for values in reader:
+                yield dict(zip(header, values))
+
+    def metadata(self):
+        if not self.has('metadata'):
+            return {}
+        name = self._names['metadata']
+        raw = self._zip.read(name) if self._zip else (self.path / name).read_bytes()
+        return json.loads(raw)
+
+    def close(self):
+        if self._zip:
+            self._zip.close()
+
+
+class WCAExportIngester:
+    """Replace the wca_* tables with the contents of an export"""
+
+    def __init__(self, db_manager=None, batch_size=BATCH_SIZE):
+        self.db_manager = db_manager or DatabaseManager()
+        self.batch_size = batch_size
+
+    def ingest(self, path):
+        """
+        Load an export next to the current one and swap it in
+
+        Rows are streamed into wca_*_new staging tables. The app's writer is
+        only held for one batch_size transaction at a time, so timer saves
+        and imports get in between batches. Ranks are first stored as read
+        and then copied over sorted by the rank keys: each batch then only
+        appends to the end of the rank indexes instead of touching pages
+        all over them. Readers keep seeing the previous export until one
+        short transaction renames the staging tables into place; the old
+        tables are dropped after that. Returns the number of rows loaded
+        per table.
+        """
+        files = _ExportFiles(path)
+        counts = {}
+        try:
+            for table in ('countries', 'persons', 'ranks_single', 'ranks_average'):
+                if not files.has(table):
+                    raise ValueError(f"Export is missing the {table} table: {path}")
+
+            # Leftovers of an interrupted load
+            self._drop_tables(STAGING)
+            self._drop_tables(RETIRED)
+
+            with self.db_manager.get_connection() as conn:
+                for table, columns in EXPORT_TABLES.items():
+                    conn.execute(f"CREATE TABLE {table}{STAGING} {columns}")
+                conn.execute(f"""
+                    CREATE TABLE {RAW_RANKS} (
+                        event_id TEXT, type TEXT, person_id TEXT, best INTEGER,
+                        PRIMARY KEY (event_id, type, person_id)
+                    ) WITHOUT ROWID
+                """)
+                conn.commit()
+
+            counts['countries'] = self._load("""
+                INSERT INTO wca_countries_new (id, name, continent_id, iso2) VALUES (?, ?, ?, ?)
+            """, (
+                (row['id'], row.get('name'), row.get('continent_id'), row.get('iso2'))
+                for row in files.rows('countries')
+            ))
+
+            # Only the current (sub_id 1) entry of a person holds their country
+            counts['persons'] = self._load("""
+                INSERT OR REPLACE INTO wca_persons_new (id, name, country_id) VALUES (?, ?, ?)
+            """, (
+                (row.get('wca_id') or row.get('id'), row.get('name'), row.get('country_id'))
+                for row in files.rows('persons')
+                if row.get('sub_id', '1') in ('', '1')
+            ))
+
+            for table, type in RANK_FILES.items():
+                counts[table] = self._load(f"""
+                    INSERT INTO {RAW_RANKS} (event_id, type, person_id, best) VALUES (?, ?, ?, ?)
+                """, (
+                    (row['event_id'], type, row['person_id'], int(row['best']))
+                    for row in files.rows(table)
+                    if int(row['best']) > 0
+                ))
+
+            # Sorting and counting are reads, which do not hold up the writer;
+            # one event at a time keeps the sort small
+            print("  Sorting ranks and resolving regions...")
+            with self.db_manager.read_connection() as reader:
+                for event_id, type in reader.execute(f"SELECT DISTINCT event_id, type FROM {RAW_RANKS}").fetchall():
+                    self._load("""
+                        INSERT INTO wca_ranks_new (event_id, type, person_id, best, country_id, continent_id)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, reader.execute(f"""
+                        SELECT r.event_id, r.type, r.person_id, r.best, p.country_id, c.continent_id
+                        FROM {RAW_RANKS} r
+                        LEFT JOIN wca_persons_new p ON p.id = r.person_id
+                        LEFT JOIN wca_countries_new c ON c.id = p.country_id
+                        WHERE r.event_id = ? AND r.type = ?
+                        ORDER BY r.best, r.person_id
+                    """, (event_id, type)))
+
+                totals = reader.execute("""
+                    SELECT event_id, type, 'world', COUNT(*) FROM wca_ranks_new GROUP BY event_id, type
+                    UNION ALL
+                    SELECT event_id, type, continent_id, COUNT(*) FROM wca_ranks_new
+                    WHERE continent_id IS NOT NULL GROUP BY event_id, type, continent_id
+                    UNION ALL
+                    SELECT event_id, type, country_id, COUNT(*) FROM wca_ranks_new
+                    WHERE country_id IS NOT NULL GROUP BY event_id, type, country_id
+                """).fetchall()
+
+            self._load("""
+                INSERT INTO wca_rank_totals_new (event_id, type, region, total) VALUES (?, ?, ?, ?)
+            """, totals)
+
+            print("  Swapping in the new export...")
+            with self.db_manager.get_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for table in EXPORT_TABLES:
+                    conn.execute(f"ALTER TABLE {table} RENAME TO {table}{RETIRED}")
+                    conn.execute(f"ALTER TABLE {table}{STAGING} RENAME TO {table}")
+                conn.execute("""
+                    INSERT OR REPLACE INTO wca_export_info (id, export_date, source, imported_at)
+                    VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+                """, (files.metadata().get('export_date'), str(path)))
+                conn.commit()
+
+            self._drop_tables(RETIRED)
+        finally:
+            files.close()
+
+        return counts
+
+    def _load(self, statement, rows):
+        """executemany in batches, each in its own transaction on the app's writer"""
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                total += self._write(statement, batch)
+                batch = []
+        if batch:
+            total += self._write(statement, batch)
+        return total
+
+    def _write(self, statement, batch):
+        with self.db_manager.get_connection() as conn:
+            conn.executemany(statement, batch)
+            conn.commit()
+        return len(batch)
+
+    def _drop_tables(self, suffix):
+        """Drop the export tables with a suffix, and the raw ranks, one transaction each"""
+        for table in [f"{table}{suffix}" for table in EXPORT_TABLES] + [RAW_RANKS]:
+            with self.db_manager.get_connection() as conn:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.commit()
+
+
+class WCAExportRanks:
+    """Exact rank and percentile lookups against a loaded export"""
+
+    def __init__(self, db_manager=None):
+        self.db_manager = db_manager or DatabaseManager()
+
+    def available(self, event='333', type='single'):
+        """Whether the loaded export has rankings for this event and type"""
+        return self._total(event, type, 'world') is not None
+
+    def rank(self, time_seconds, event='333', type='single', region='world'):
+        """
+        Exact rank of a result among WCA competitors
+
+        region is 'world', a continent id ('_Europe') or a country id or
+        ISO2 code. Returns None when no export is loaded for the event, or
+        for events whose results are not times.
+        """
+        if event in UNTIMED_EVENTS:
+            return None
+
+        with self.db_manager.read_connection() as conn:
+            cursor = conn.cursor()
+            column, region_id = self._region(cursor, region)
+            total = self._total(event, type, region_id, cursor)
+            if not total:
+                return None
+
+            # Strictly better results; ties share the rank
+            value = int(round(time_seconds * 100))
+            if column:
+                cursor.execute(f"""
+                    SELECT COUNT(*) FROM wca_ranks
+                    WHERE event_id = ? AND type = ? AND {column} = ? AND best < ?
+                """, (event, type, region_id, value))
+            else:
+                cursor.execute("""
+                    SELECT COUNT(*) FROM wca_ranks
+                    WHERE event_id = ? AND type = ? AND best < ?
+                """, (event, type, value))
+            faster_count = cursor.fetchone()[0]
+
+            cursor.execute("SELECT export_date FROM wca_export_info WHERE id = 1")
+            info = cursor.fetchone()
+
+        percentile = faster_count / total * 100
+        return {
+            'percentile': percentile,
+            'faster_than': f"{percentile:.2f}%",
+            'rank_estimate': faster_count + 1,
+            'rank': faster_count + 1,
+            'total_ranked': total,
+            'region': region_id,
+            'exact': True,
+            'export_date': info[0] if info else None,
+            'note': f'Rank {faster_count + 1:,} of {total:,} ranked competitors ({region_id})'
+        }
+
+    def _region(self, cursor, region):
+        """(column to filter on, region id) for 'world', a continent or a country"""
+        if not region or region == 'world':
+            return None, 'world'
+        if region.startswith('_'):
+            return 'continent_id', region
+
+        cursor.execute("SELECT id FROM wca_countries WHERE id = ? OR iso2 = ?", (region, region.upper()))
+        row = cursor.fetchone()
+        return 'country_id', row[0] if row else region
+
+    def _total(self, event, type, region, cursor=None):
+        query = "SELECT total FROM wca_rank_totals WHERE event_id = ? AND type = ? AND region = ?"
+        if cursor is not None:
+            cursor.execute(query, (event, type, region))
+            row = cursor.fetchone()
+        else:
+            with self.db_manager.read_connection() as conn:
+                row = conn.execute(query, (event, type, region)).fetchone()
+        return row[0] if row else None
+
+
+def main():
+    """Load an export from the command line"""
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+
+    path = Path(sys.argv[1])
+    if not path.exists():
+        print(f"✗ File not found: {path}")
+        return
+
+    print(f"Loading WCA export: {path}")
+    counts = WCAExportIngester().ingest(path)
+    for table, count in counts.items():
+        print(f"  {table:<15} {count:>10,} rows")
+    print("✓ WCA export loaded")
+
+
+if __name__ == "__main__":
+    main()
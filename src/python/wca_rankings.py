@@ -0,0 +1,142 @@
+"""
+WCA Rankings Store
+Ranked times per (event, type, region) kept in memory and refreshed in the background
+
+Requests never wait for the network: a lookup bisects whatever rankings are
+already loaded and, when they are missing or older than the refresh
+interval, queues a load on a single background worker. Loads go through
+the client's disk cache, so after a restart the rankings come back from
+data/cache without a download. Until the first
+download finishes lookups fall back to the approximate table and are marked
+as not fresh so the caller can ask again later.
+
+When a WCA results export has been loaded (see wca_export.py) lookups for
+its events use the exact rank from the database instead.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from wca_api_client import WCAApiClient
+from wca_export import WCAExportRanks
+
+
+# Rankings change slowly; refetch them a few times a day (matches the client's cache TTL)
+REFRESH_INTERVAL = 6 * 3600
+
+# After a failed download, wait this long before trying again
+RETRY_INTERVAL = 5 * 60
+
+
+class _Rankings:
+    """Sorted times for one (event, type, region) and when they were fetched"""
+
+    def __init__(self, times, fetched_at, failed_at=None):
+        self.times = times
+        self.fetched_at = fetched_at
+        self.failed_at = failed_at
+
+
+class RankingStore:
+    """In-memory ranking tables with non-blocking percentile lookups"""
+
+    def __init__(self, client=None, refresh_interval=REFRESH_INTERVAL,
+                 retry_interval=RETRY_INTERVAL, export=None):
+        self.client = client or WCAApiClient()
+        self.export = export or WCAExportRanks()
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._tables = {}
+        self._pending = set()
+        # Bumped on every load, so responses built from the rankings can be revalidated
+        self.version = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='wca-rankings')
+
+    def percentile(self, time_seconds, event='333', type='single', region='world'):
+        """
+        Percentile estimate from the last loaded rankings, never blocks
+
+        Returns the estimate dict with 'fresh' (rankings loaded and within the
+        refresh interval) and 'updated_at' (epoch seconds of the rankings
+        used, None if none are loaded yet) added.
+        """
+        exact = self.export.rank(time_seconds, event, type, region)
+        if exact:
+            exact['fresh'] = True
+            exact['updated_at'] = None
+            return exact
+
+        key = (event, type, region)
+        table = self._tables.get(key)
+        self._schedule_if_stale(key, table)
+
+        times = table.times if table else None
+        result = dict(WCAApiClient.percentile_from_times(times, time_seconds))
+        result['fresh'] = bool(times) and time.time() - table.fetched_at <= self.refresh_interval
+        result['updated_at'] = table.fetched_at if table and times else None
+        return result
+
+    def refresh(self, event='333', type='single', region='world'):
+        """Queue a download of one ranking table"""
+        key = (event, type, region)
+        self._schedule_if_stale(key, None)
+
+    def _schedule_if_stale(self, key, table):
+        if table is not None and not self._expired(table):
+            return
+
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+
+        self._executor.submit(self._load, key)
+
+    def _expired(self, table):
+        now = time.time()
+        if table.failed_at is not None:
+            return now - table.failed_at > self.retry_interval
+        return now - table.fetched_at > self.refresh_interval
+
+    def _load(self, key):
+        event, type, region = key
+        try:
+            times = self.client.get_ranking_times(region, type, event)
+            fetched_at = self.client.cached_at(self.client.rankings_path(region, type, event))
+        except Exception as e:
+            print(f"WCA rankings refresh failed for {key}: {e}")
+            times = None
+
+        previous = self._tables.get(key)
+        if times:
+            self._tables[key] = _Rankings(times, fetched_at or time.time())
+        elif previous and previous.times:
+            # Keep serving the old rankings, try again later
+            self._tables[key] = _Rankings(previous.times, previous.fetched_at, time.time())
+        else:
+            self._tables[key] = _Rankings(None, None, time.time())
+
+        with self._lock:
+            self.version += 1
+            self._pending.discard(key)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_wca_rankings():
+    """
+    RankingStore shared by the API routes
+
+    Created on first use rather than at import, since the store opens the
+    disk cache and the database.
+    """
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = RankingStore()
+    return _shared
@@ -3,7 +3,7 @@ Flask API Application
 Main app initialization and configuration
 """
 
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 from pathlib import Path
 
@@ -11,11 +11,15 @@ from pathlib import Path
 def create_app():
     """Create and configure Flask application"""
     # Get the correct path to static files
-    static_folder = str(Path(__file__).parent.parent.parent.parent / 'src' / 'web')
+    project_root = Path(__file__).parent.parent.parent.parent
+    static_folder = str(project_root / 'src' / 'web')
     
     app = Flask(__name__, static_folder=static_folder, static_url_path='')
     CORS(app)
     
+    from .compression import compress_response
+    app.after_request(compress_response)
+    
     # Register blueprints
     from .routes import stats, sessions, cubes, charts, imports, user_settings, timer
     
@@ -27,9 +31,24 @@ def create_app():
     app.register_blueprint(user_settings.bp)
     app.register_blueprint(timer.bp)
     
+    # Bring an existing database up to the current schema before serving it
+    from db_manager import DatabaseManager
+    DatabaseManager().upgrade_schema(str(project_root / 'sql' / 'schema.sql'))
+    
     # Root route
     @app.route('/')
     def index():
         return send_from_directory(static_folder, 'index.html')
     
+    # Readiness probe: the server answers and the database can be read
+    @app.route('/api/health')
+    def health():
+        from db_manager import DatabaseManager
+        try:
+            with DatabaseManager().read_connection() as conn:
+                conn.execute("SELECT 1 FROM training_sessions LIMIT 1")
+            return jsonify({'status': 'ok'})
+        except Exception as e:
+            return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    
     return app
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Columnar Responses
+Typed-array payloads for ?format=columnar
+
+Long series (every solve time of an event) cost far more as JSON float
+lists than as raw numbers, both to build and to parse. A columnar
+response is laid out as:
+
+    uint32 LE   length of the header in bytes
+    header      UTF-8 JSON, space-padded to a multiple of 4 bytes
+    columns     each column's values back to back
+
+The header describes every column as {name, type, unit, offset, length},
+where offset is in bytes from the end of the header. Number columns are
+little-endian uint32, in milliseconds unless their unit is 'count' (ids,
+solve numbers), with MISSING (0xFFFFFFFF) standing for a DNF or an empty
+value, so a browser can wrap them in a Uint32Array without copying.
+Text columns have type 'string' and their values are listed in the
+header itself. Anything else the route returns goes in the header as
+well.
+"""
+
+import json
+import struct
+
+import numpy as np
+from flask import make_response, request
+
+
+MEDIA_TYPE = 'application/vnd.speedcube.columnar'
+
+# uint32 value for a DNF or an empty value
+MISSING = 0xFFFFFFFF
+
+
+def wants_columnar():
+    """Whether the request asked for the columnar format"""
+    return request.args.get('format') == 'columnar'
+
+
+def ms_column(values):
+    """Milliseconds (floats, +inf/NaN/None for DNF or empty) as a uint32 column"""
+    values = np.asarray(values, dtype=float)
+    column = np.full(len(values), MISSING, dtype='<u4')
+    present = np.isfinite(values)
+    column[present] = np.rint(values[present])
+    return column
+
+
+def columnar_response(columns, counts=(), **meta):
+    """
+    Response holding the given columns (name -> uint32 array or list of strings)
+
+    Number columns named in counts are plain numbers rather than
+    milliseconds. Other keyword arguments are added to the header as they are.
+    """
+    header = dict(meta, missing=MISSING, columns=[])
+    blobs = []
+    offset = 0
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray):
+            blob = values.astype('<u4', copy=False).tobytes()
+            header['columns'].append({
+                'name': name, 'type': 'uint32', 'unit': 'count' if name in counts else 'ms',
+                'offset': offset, 'length': len(values)
+            })
+            blobs.append(blob)
+            offset += len(blob)
+        else:
+            header['columns'].append({'name': name, 'type': 'string', 'length': len(values), 'values': list(values)})
+
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    encoded += b' ' * (-len(encoded) % 4)
+
+    response = make_response(b''.join([struct.pack('<I', len(encoded)), encoded] + blobs))
+    response.mimetype = MEDIA_TYPE
+    return response
@@ -0,0 +1,56 @@
+"""
+Response Compression
+gzip / deflate for API responses, negotiated from Accept-Encoding
+
+Solve histories compress very well (JSON or columnar), so anything over
+MIN_SIZE is compressed with whichever of gzip and deflate the client
+prefers. Static files are streamed by Flask and left alone.
+"""
+
+import gzip
+import zlib
+
+from flask import request
+
+
+# Smaller bodies are not worth the CPU
+MIN_SIZE = 1024
+
+COMPRESS_LEVEL = 6
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/vnd.speedcube.columnar')
+
+
+def _encoding():
+    """gzip, deflate or None, whichever the client accepts with the highest quality"""
+    accepted = request.accept_encodings
+    best = max(('gzip', 'deflate'), key=lambda name: accepted[name])
+    return best if accepted[best] > 0 else None
+
+
+def compress_response(response):
+    """after_request hook: compress the body if the client accepts it"""
+    # A 304 stands in for a compressible body, so it varies the same way
+    if response.mimetype not in COMPRESSIBLE_TYPES and response.status_code != 304:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+
+    encoding = _encoding()
+    if encoding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+    elif encoding == 'deflate':
+        response.set_data(zlib.compress(data, COMPRESS_LEVEL))
+    else:
+        return response
+
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,58 @@
+"""
+Conditional GET
+ETags for data endpoints, keyed by the database's data version
+
+The version changes whenever anything commits to the database, so a
+client that sends the ETag back in If-None-Match gets 304 Not Modified
+while nothing was written, without the view (or any query on the solve
+tables) running at all.
+"""
+
+import functools
+import sys
+import uuid
+from pathlib import Path
+
+from flask import make_response, request
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'python'))
+from db_manager import DatabaseManager
+
+
+# data_version restarts with each connection; tags from an earlier run must not match
+_RUN_ID = uuid.uuid4().hex[:8]
+
+
+def current_etag(*versions):
+    """ETag for the current database version plus any other versions the response depends on"""
+    parts = [_RUN_ID, DatabaseManager().data_version()]
+    parts += [version() for version in versions]
+    return '-'.join(str(part) for part in parts)
+
+
+def etagged(*versions):
+    """
+    Decorator for GET views whose response only depends on the database
+    
+    versions are callables for anything else the response depends on
+    (e.g. rankings loaded in the background). The tag is taken before
+    the view runs, so a write that lands meanwhile only costs the client
+    one more full response, never a stale one.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = current_etag(*versions)
+            
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag, weak=True)
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,69 @@
+"""
+Paging
+Query parameters shared by the listing endpoints
+
+Listings are paged by keyset: a page ends with an opaque cursor holding
+the sort key of its last row, and the next page starts after that key
+with an index range scan, so page N costs the same as page 1 however
+long the history is. fields= picks the columns to return.
+"""
+
+import base64
+import json
+
+from flask import request
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(key):
+    """Opaque cursor for the sort key of a page's last row, None at the end"""
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Sort key from a cursor, None when absent"""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def parse_limit(name='limit', default=DEFAULT_PAGE_SIZE):
+    """Page size from the query string"""
+    value = request.args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"{name} must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+def parse_fields(available):
+    """Columns asked for with fields=a,b,c (all when absent), in the listing's order"""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(available)})")
+    return [name for name in available if name in names]
+
+
+def paging_requested():
+    """Whether the request asked for a page rather than the whole listing"""
+    return 'limit' in request.args or 'cursor' in request.args
@@ -3,51 +3,52 @@ Charts Data API Routes
 """
 
 from flask import Blueprint, jsonify, request
-import pandas as pd
+import numpy as np
 import sys
+from datetime import datetime
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / 'python'))
-from training_logger import TrainingLogger
+from repository import Repository
+from rolling_averages import results_array, rolling_averages, running_stats, parse_windows, to_seconds
+from downsampling import downsample, parse_max_points
+from distribution import histogram, parse_bins, sample_summary
+
+from ..conditional import etagged
+from ..columnar import wants_columnar, ms_column, columnar_response
 
 bp = Blueprint('charts', __name__, url_prefix='/api/charts')
 
+# Sessions per page of the consistency chart
+DEFAULT_SESSION_PAGE = 50
+MAX_SESSION_PAGE = 500
+
 
 @bp.route('/progress', methods=['GET'])
+@etagged()
 def get_progress_chart():
-    """Get progress data by event"""
+    """Get progress data by event (?max_points=N to downsample)"""
     try:
         event_id = request.args.get('event_id', '333')
+        max_points = parse_max_points(request.args.get('max_points'))
         
-        logger = TrainingLogger()
-        
-        query = """
-        SELECT 
-            date,
-            best_single/1000.0 as best,
-            session_mean/1000.0 as mean,
-            ao5/1000.0 as ao5
-        FROM training_sessions
-        WHERE solve_count >= 5 AND event_id = ?
-        ORDER BY date
-        """
+        points = Repository().progress(event_id)
         
-        with logger.db_manager.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(event_id,))
-        
-        if len(df) < 1:
+        if len(points) < 1:
             return jsonify({'error': 'Need at least 1 session for this event'}), 400
         
-        data = []
-        for _, row in df.iterrows():
-            data.append({
-                'date': row['date'],
-                'best': round(row['best'], 2) if pd.notna(row['best']) else None,
-                'mean': round(row['mean'], 2) if pd.notna(row['mean']) else None,
-                'ao5': round(row['ao5'], 2) if pd.notna(row['ao5']) else None
-            })
-        
-        return jsonify({'data': data})
+        keep = downsample(np.arange(len(points)), {
+            name: [getattr(point, name) for point in points] for name in ('best', 'mean', 'ao5')
+        }, max_points)
+        if keep is not None:
+            # Sessions are plotted by position, which the kept rows no longer give
+            return jsonify({'data': [
+                dict(points[i]._asdict(), session_number=int(i) + 1) for i in keep
+            ]})
+        
+        return jsonify({'data': [point._asdict() for point in points]})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -55,91 +56,71 @@ def get_progress_chart():
 
 
 @bp.route('/session-progress', methods=['GET'])
+@etagged()
 def get_session_progress():
-    """Get progress within a single session"""
+    """
+    Get progress within a single session
+    
+    Every solve with the running best, mean and standard deviation and
+    the aoN series for ?windows= (any size from 3 to 1000, ao5 by
+    default), in seconds with None for DNFs and averages not yet defined.
+    ?max_points=N downsamples.
+    """
     try:
         session_id = request.args.get('session_id')
+        max_points = parse_max_points(request.args.get('max_points'))
+        windows = parse_windows(request.args.get('windows'), default=(5,), any_size=True)
         
         if not session_id:
             return jsonify({'error': 'Missing session_id parameter'}), 400
         
-        logger = TrainingLogger()
+        results = Repository().session_series(int(session_id))
         
-        query = """
-        SELECT 
-            solve_number,
-            time_ms/1000.0 as time
-        FROM personal_solves
-        WHERE session_id = ? AND dnf = 0
-        ORDER BY solve_number
-        """
-        
-        with logger.db_manager.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(int(session_id),))
-        
-        if len(df) < 1:
+        if len(results) < 1:
             return jsonify({'error': 'No solves in this session'}), 400
         
-        data = []
-        for i, row in df.iterrows():
-            ao5 = None
-            if i >= 4:
-                ao5_times = df['time'].iloc[i-4:i+1].tolist()
-                ao5_sorted = sorted(ao5_times)
-                ao5 = sum(ao5_sorted[1:-1]) / 3
-            
-            running_mean = df['time'].iloc[:i+1].mean()
-            
-            data.append({
-                'solve_number': int(row['solve_number']),
-                'time': round(row['time'], 2),
-                'mean': round(running_mean, 2),
-                'ao5': round(ao5, 2) if ao5 else None
-            })
-        
-        return jsonify({'data': data})
+        return jsonify({'data': _progress_rows(results, windows, max_points)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+def _progress_rows(results, windows, max_points=None):
+    """Session progress rows from the running_stats series, downsampled before formatting"""
+    results = results_array(results)
+    solve_numbers = np.arange(1, len(results) + 1)
+    series = dict(running_stats(results, windows), time=results)
+    
+    lines = ['time', 'mean'] + [f'ao{size}' for size in windows]
+    keep = downsample(solve_numbers, {name: series[name] for name in lines}, max_points, spiky=('time',))
+    if keep is not None:
+        solve_numbers = solve_numbers[keep]
+        series = {name: values[keep] for name, values in series.items()}
+    
+    columns = {name: to_seconds(values) for name, values in series.items()}
+    columns['solve_number'] = solve_numbers.tolist()
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
 @bp.route('/distribution', methods=['GET'])
+@etagged()
 def get_distribution_chart():
-    """Get distribution data by event"""
+    """Get the histogram of an event's times (?bins=N or ?bin_width=seconds, Freedman-Diaconis by default)"""
     try:
         event_id = request.args.get('event_id', '333')
+        bins, bin_width = parse_bins(request.args.get('bins'), request.args.get('bin_width'))
         
-        logger = TrainingLogger()
+        summary = Repository().event_distribution(event_id)
         
-        query = """
-        SELECT ps.time_ms/1000.0 as time 
-        FROM personal_solves ps
-        JOIN training_sessions ts ON ps.session_id = ts.id
-        WHERE ps.dnf = 0 AND ts.event_id = ?
-        ORDER BY ps.time_ms
-        """
-        
-        with logger.db_manager.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(event_id,))
-        
-        if len(df) < 5:
+        if summary is None or summary.count < 5:
             return jsonify({'error': 'Need at least 5 solves'}), 400
         
-        times = df['time'].tolist()
-        
-        mean = sum(times) / len(times)
-        std_dev = (sum((x - mean) ** 2 for x in times) / len(times)) ** 0.5
-        
-        filtered_times = [t for t in times if abs(t - mean) <= 3 * std_dev]
-        
-        if len(filtered_times) < len(times) * 0.9:
-            sorted_times = sorted(times)
-            p1 = int(len(sorted_times) * 0.01)
-            p99 = int(len(sorted_times) * 0.99)
-            filtered_times = sorted_times[p1:p99]
-        
-        return jsonify({'times': filtered_times})
+        return _histogram_response(histogram(summary, bins, bin_width, sigmas=3))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -147,33 +128,24 @@ def get_distribution_chart():
 
 
 @bp.route('/session-distribution', methods=['GET'])
+@etagged()
 def get_session_distribution():
-    """Get distribution for a single session"""
+    """Get the histogram of a single session's times (?bins=N or ?bin_width=seconds)"""
     try:
-        session_id = request.args.get('session_id')
-        
-        logger = TrainingLogger()
+        session_id = request.args.get('session_id', type=int)
+        bins, bin_width = parse_bins(request.args.get('bins'), request.args.get('bin_width'))
         
-        query = """
-        SELECT time_ms/1000.0 as time 
-        FROM personal_solves
-        WHERE session_id = ? AND dnf = 0
-        ORDER BY time_ms
-        """
+        if session_id is None:
+            return jsonify({'error': 'Missing or invalid session_id parameter'}), 400
         
-        with logger.db_manager.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(int(session_id),))
+        results = Repository().session_results(session_id)
         
-        if len(df) < 5:
+        if len(results) < 5:
             return jsonify({'error': 'Need at least 5 solves'}), 400
         
-        times = df['time'].tolist()
-        
-        mean = sum(times) / len(times)
-        std_dev = (sum((x - mean) ** 2 for x in times) / len(times)) ** 0.5
-        filtered_times = [t for t in times if abs(t - mean) <= 5 * std_dev]
-        
-        return jsonify({'times': filtered_times})
+        return _histogram_response(histogram(sample_summary(results), bins, bin_width, sigmas=5))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -181,29 +153,25 @@ def get_session_distribution():
 
 
 @bp.route('/rolling-average', methods=['GET'])
+@etagged()
 def get_rolling_average():
-    """Get rolling average data by event"""
+    """Get rolling average series by event (?windows=5,12,50,100,1000, ?max_points=N, ?format=columnar)"""
     try:
         event_id = request.args.get('event_id', '333')
+        windows = parse_windows(request.args.get('windows'))
+        max_points = parse_max_points(request.args.get('max_points'))
         
-        logger = TrainingLogger()
+        results = Repository().event_series(event_id)
         
-        query = """
-        SELECT ps.time_ms/1000.0 as time 
-        FROM personal_solves ps
-        JOIN training_sessions ts ON ps.session_id = ts.id
-        WHERE ps.dnf = 0 AND ts.event_id = ?
-        ORDER BY ps.timestamp
-        """
-        
-        with logger.db_manager.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(event_id,))
-        
-        if len(df) < 12:
+        if len(results) < 12:
             return jsonify({'error': 'Need at least 12 solves'}), 400
         
-        times = df['time'].tolist()
-        return jsonify({'times': times})
+        if wants_columnar():
+            return _rolling_columnar(results, windows, max_points)
+        
+        return jsonify(_rolling_payload(results, windows, max_points))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -211,73 +179,153 @@ def get_rolling_average():
 
 
 @bp.route('/session-rolling', methods=['GET'])
+@etagged()
 def get_session_rolling():
-    """Get rolling average for a single session"""
+    """Get rolling average series for a single session (?windows=, ?max_points=N, ?format=columnar)"""
     try:
-        session_id = request.args.get('session_id')
-        
-        logger = TrainingLogger()
+        session_id = request.args.get('session_id', type=int)
+        windows = parse_windows(request.args.get('windows'))
+        max_points = parse_max_points(request.args.get('max_points'))
         
-        query = """
-        SELECT time_ms/1000.0 as time 
-        FROM personal_solves
-        WHERE session_id = ? AND dnf = 0
-        ORDER BY solve_number
-        """
+        if session_id is None:
+            return jsonify({'error': 'Missing or invalid session_id parameter'}), 400
         
-        with logger.db_manager.get_connection() as conn:
-            df = pd.read_sql_query(query, conn, params=(session_id,))
+        results = Repository().session_series(session_id)
         
-        if len(df) < 12:
+        if len(results) < 12:
             return jsonify({'error': 'Need at least 12 solves'}), 400
         
-        times = df['time'].tolist()
-        return jsonify({'times': times})
+        if wants_columnar():
+            return _rolling_columnar(results, windows, max_points)
+        
+        return jsonify(_rolling_payload(results, windows, max_points))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+def _histogram_response(result):
+    """Histogram in seconds as JSON, or as ms columns with ?format=columnar"""
+    quantiles = {f'p{round(q * 100)}': value for q, value in result['quantiles'].items()}
+    times = {name: result[name] for name in ('mean', 'std_dev', 'min', 'max', 'bin_width')}
+    times['median'] = quantiles['p50']
+    
+    if wants_columnar():
+        return columnar_response(
+            {'edges': ms_column(result['edges']), 'counts': result['counts'].astype('<u4')},
+            counts=('counts',), count=result['count'], outside=result['outside'],
+            quantiles=quantiles, **times
+        )
+    
+    payload = {name: round(value / 1000, 3) for name, value in times.items()}
+    payload.update(
+        count=result['count'],
+        outside=result['outside'],
+        edges=np.round(result['edges'] / 1000, 3).tolist(),
+        counts=result['counts'].tolist(),
+        quantiles={name: round(value / 1000, 3) for name, value in quantiles.items()}
+    )
+    return jsonify(payload)
+
+
+def _rolling_series(results, windows, max_points):
+    """
+    (solve numbers, times, aoN series) in ms, downsampled to about max_points
+    
+    Times keep each bucket's fastest and slowest solve, the averages
+    follow their line shape; solve numbers are 1-based positions.
+    """
+    results = results_array(results)
+    averages = rolling_averages(results, windows)
+    
+    positions = np.arange(len(results))
+    keep = downsample(positions, dict(averages, times=results), max_points, spiky=('times',))
+    if keep is not None:
+        positions, results = keep, results[keep]
+        averages = {name: series[keep] for name, series in averages.items()}
+    
+    return positions + 1, results, averages
+
+
+def _rolling_payload(results, windows, max_points=None):
+    """Solve times plus finished aoN series, in seconds (None = DNF)"""
+    solve_numbers, results, averages = _rolling_series(results, windows, max_points)
+    
+    payload = {
+        'times': to_seconds(results),
+        'windows': list(windows),
+        'averages': {name: to_seconds(series) for name, series in averages.items()}
+    }
+    if max_points is not None:
+        payload['solve_numbers'] = solve_numbers.tolist()
+    return payload
+
+
+def _rolling_columnar(results, windows, max_points=None):
+    """Same series as _rolling_payload, as ms columns (averages rounded to the ms)"""
+    solve_numbers, results, averages = _rolling_series(results, windows, max_points)
+    
+    columns = {'solve_numbers': solve_numbers.astype('<u4'), 'times': ms_column(results)}
+    columns.update((name, ms_column(series)) for name, series in averages.items())
+    return columnar_response(columns, counts=('solve_numbers',), windows=list(windows))
+
+
 @bp.route('/consistency', methods=['GET'])
+@etagged()
 def get_consistency_chart():
-    """Get consistency data across sessions"""
+    """
+    Get the spread of each session's times (?from=&to=YYYY-MM-DD, ?limit=50&offset=0)
+    
+    Count, quartiles, standard deviation and coefficient of variation
+    per session come from one query, oldest session first.
+    """
     try:
         event_id = request.args.get('event_id', '333')
+        date_from = _parse_date(request.args.get('from'))
+        date_to = _parse_date(request.args.get('to'))
+        limit = request.args.get('limit', DEFAULT_SESSION_PAGE, type=int)
+        offset = request.args.get('offset', 0, type=int)
         
-        logger = TrainingLogger()
+        if not 1 <= limit <= MAX_SESSION_PAGE or offset < 0:
+            return jsonify({'error': f'limit must be between 1 and {MAX_SESSION_PAGE}, offset at least 0'}), 400
         
-        with logger.db_manager.get_connection() as conn:
-            session_query = """
-            SELECT id, date 
-            FROM training_sessions
-            WHERE event_id = ? AND solve_count >= 5
-            ORDER BY date
-            LIMIT 10
-            """
-            
-            sessions = pd.read_sql_query(session_query, conn, params=(event_id,))
-            
-            result = []
-            for _, session in sessions.iterrows():
-                solve_query = """
-                SELECT time_ms/1000.0 as time
-                FROM personal_solves
-                WHERE session_id = ? AND dnf = 0
-                """
-                solves = pd.read_sql_query(solve_query, conn, params=(int(session['id']),))
-                
-                if len(solves) >= 5:
-                    result.append({
-                        'date': session['date'],
-                        'times': solves['time'].tolist()
-                    })
+        spreads, total = Repository().session_spreads(event_id, date_from, date_to, limit, offset)
         
-        if len(result) < 2:
+        if total < 2:
             return jsonify({'error': 'Need at least 2 sessions'}), 400
         
-        return jsonify({'sessions': result})
+        next_offset = offset + len(spreads)
+        return jsonify({
+            'sessions': [_spread_seconds(spread) for spread in spreads],
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'next_offset': next_offset if next_offset < total else None
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+def _parse_date(value):
+    """YYYY-MM-DD query parameter, None when absent"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+def _spread_seconds(spread):
+    """SessionSpread as JSON, times in seconds"""
+    data = spread._asdict()
+    for name in ('min', 'q1', 'median', 'q3', 'max', 'mean', 'std_dev'):
+        if data[name] is not None:
+            data[name] = round(data[name] / 1000, 3)
+    if data['cv'] is not None:
+        data['cv'] = round(data['cv'], 4)
+    return data
@@ -3,31 +3,25 @@ Cubes Inventory API Routes
 """
 
 from flask import Blueprint, jsonify, request
-import pandas as pd
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / 'python'))
 from cube_manager import CubeManager
+from repository import Repository
+
+from ..conditional import etagged
 
 bp = Blueprint('cubes', __name__, url_prefix='/api')
 
 
 @bp.route('/cubes', methods=['GET'])
+@etagged()
 def get_cubes():
     """Get all cubes"""
     try:
-        cube_manager = CubeManager()
-        with cube_manager.db_manager.get_connection() as conn:
-            cubes = cube_manager.list_cubes(active_only=False)
-        
-        cubes_dict = cubes.to_dict('records')
-        for cube in cubes_dict:
-            for key, value in cube.items():
-                if pd.isna(value):
-                    cube[key] = None
-        
-        return jsonify(cubes_dict)
+        cubes = Repository().cubes(active_only=False)
+        return jsonify([cube._asdict() for cube in cubes])
     except Exception as e:
         import traceback
         traceback.print_exc()
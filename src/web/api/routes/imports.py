@@ -4,13 +4,13 @@ Import Data API Routes
 
 from flask import Blueprint, jsonify, request
 from pathlib import Path
-import json
 import sys
 
 # Correct path to find python modules
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / 'python'))
 from training_logger import TrainingLogger
 from import_cstimer import CSTimerImporter
+from import_jobs import import_jobs
 
 bp = Blueprint('imports', __name__, url_prefix='/api/import')
 
@@ -25,38 +25,12 @@ def preview_cstimer():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        content = file.read().decode('utf-8')
-        data = json.loads(content)
-        
-        # Save file to data/raw for later import
-        filepath = Path('data/raw') / file.filename
+        # Save file to data/raw for later import (copied in chunks, not decoded)
+        filepath = Path('data/raw') / Path(file.filename).name
         filepath.parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f)
+        file.save(filepath)
         
-        sessions_preview = []
-        for session_key, session_data in data.items():
-            if not isinstance(session_data, list):
-                continue
-            
-            solve_count = len(session_data)
-            times = []
-            for solve in session_data:
-                try:
-                    time_cs = solve[0][1]
-                    penalty = solve[0][0]
-                    if penalty != -1:
-                        times.append(time_cs / 1000)
-                except:
-                    continue
-            
-            sessions_preview.append({
-                'key': session_key,
-                'solve_count': solve_count,
-                'best': min(times) if times else None,
-                'worst': max(times) if times else None,
-                'mean': sum(times) / len(times) if times else None
-            })
+        sessions_preview = CSTimerImporter.preview(filepath)
         
         return jsonify({'sessions': sessions_preview, 'filename': file.filename})
     except Exception as e:
@@ -66,7 +40,7 @@ def preview_cstimer():
 
 @bp.route('/selected', methods=['POST'])
 def import_selected_sessions():
-    """Import only selected CSTimer sessions"""
+    """Start a background import of the selected CSTimer sessions"""
     try:
         data = request.json
         filename = data.get('filename')
@@ -76,23 +50,43 @@ def import_selected_sessions():
         if not filename or not selected_sessions:
             return jsonify({'error': 'Missing filename or sessions'}), 400
         
-        file_path = Path('data/raw') / filename
+        file_path = Path('data/raw') / Path(filename).name
         if not file_path.exists():
             return jsonify({'error': 'File not found'}), 400
         
-        # Initialize the importer
-        importer = CSTimerImporter()
-        
-        # Perform the import for specific sessions
-        results = importer.import_file(str(file_path), event_id=event_id, session_keys=selected_sessions)
+        # Parsing and inserts run on the import worker; poll the job for progress
+        job = import_jobs.submit(file_path, event_id=event_id, session_keys=selected_sessions)
         
         return jsonify({
-            'success': True, 
-            'message': f"Imported {results.get('total_solves', 0)} solves",
-            'details': results
-        })
+            'success': True,
+            'job_id': job.id,
+            'job': job.to_dict()
+        }), 202
         
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/jobs', methods=['GET'])
+def list_import_jobs():
+    """Recent import jobs, newest first"""
+    return jsonify({'jobs': [job.to_dict() for job in import_jobs.all()]})
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """Progress of an import job"""
+    job = import_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict())
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_import_job(job_id):
+    """Cancel a queued or running import job"""
+    job = import_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'success': True, 'job': job.to_dict()})
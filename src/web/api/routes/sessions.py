@@ -3,39 +3,66 @@ Sessions and Solves API Routes
 """
 
 from flask import Blueprint, jsonify, request
-import pandas as pd
+import numpy as np
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / 'python'))
 from training_logger import TrainingLogger
+from repository import Repository, Session, SESSION_LISTING, SOLVE_LISTING
+
+from ..conditional import etagged
+from ..columnar import wants_columnar, ms_column, columnar_response
+from ..paging import encode_cursor, decode_cursor, parse_limit, parse_fields, paging_requested
 
 bp = Blueprint('sessions', __name__, url_prefix='/api')
 
 
 @bp.route('/sessions', methods=['GET'])
+@etagged()
 def get_sessions():
-    """Get all training sessions"""
+    """
+    Get training sessions, newest first (?format=columnar for typed arrays)
+    
+    ?limit=N returns one page as {sessions, next_cursor}; pass next_cursor
+    back as ?cursor= for the next one. ?fields=id,date,... returns only
+    those fields.
+    """
     try:
-        logger = TrainingLogger()
-        with logger.db_manager.get_connection() as conn:
-            sessions = logger.get_all_sessions()
+        if wants_columnar():
+            return _sessions_columnar(Repository().sessions_ms())
         
-        sessions_dict = sessions.to_dict('records')
-        for session in sessions_dict:
-            for key, value in session.items():
-                if pd.isna(value):
-                    session[key] = None
-                elif isinstance(value, float):
-                    session[key] = round(value, 2)
+        fields = parse_fields(list(SESSION_LISTING.columns))
+        if paging_requested():
+            sessions, next_key = Repository().page(
+                SESSION_LISTING, fields, decode_cursor(request.args.get('cursor')), parse_limit()
+            )
+            return jsonify({'sessions': sessions, 'next_cursor': encode_cursor(next_key)})
         
-        return jsonify(sessions_dict)
+        if fields:
+            sessions, _ = Repository().page(SESSION_LISTING, fields)
+            return jsonify(sessions)
+        
+        sessions = Repository().sessions()
+        return jsonify([session._asdict() for session in sessions])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
 
+def _sessions_columnar(sessions):
+    """One column per field: ids and counts as uint32, times in ms, text as strings"""
+    columns = dict(zip(Session._fields, zip(*sessions))) if sessions else {name: () for name in Session._fields}
+    for name in ('id', 'solve_count'):
+        columns[name] = np.array(columns[name], dtype='<u4')
+    for name in ('best_single', 'session_mean', 'ao5', 'ao12', 'ao50', 'ao100'):
+        columns[name] = ms_column(columns[name])
+    return columnar_response(columns, counts=('id', 'solve_count'))
+
+
 @bp.route('/sessions/<int:session_id>', methods=['DELETE'])
 def delete_session(session_id):
     """Delete a session"""
@@ -74,32 +101,26 @@ def add_session():
 
 
 @bp.route('/sessions/<int:session_id>/solves', methods=['GET'])
+@etagged()
 def get_session_solves(session_id):
-    """Get all solves for a session"""
+    """Get the solves of a session in order (?limit, ?cursor and ?fields as for sessions)"""
     try:
-        logger = TrainingLogger()
-        
-        query = """
-        SELECT id, solve_number, 
-               CASE WHEN dnf = 1 THEN NULL ELSE time_ms/1000.0 END as time_seconds,
-               scramble, penalty, notes, timestamp
-        FROM personal_solves
-        WHERE session_id = ?
-        ORDER BY solve_number
-        """
-        
-        with logger.db_manager.get_connection() as conn:
-            solves = pd.read_sql_query(query, conn, params=(session_id,))
+        fields = parse_fields(list(SOLVE_LISTING.columns))
+        if paging_requested():
+            solves, next_key = Repository().page(
+                SOLVE_LISTING, fields, decode_cursor(request.args.get('cursor')), parse_limit(),
+                session_id=session_id
+            )
+            return jsonify({'solves': solves, 'next_cursor': encode_cursor(next_key)})
         
-        solves_dict = solves.to_dict('records')
-        for solve in solves_dict:
-            for key, value in solve.items():
-                if pd.isna(value):
-                    solve[key] = None
-                elif isinstance(value, float) and key == 'time_seconds':
-                    solve[key] = round(value, 2)
+        if fields:
+            solves, _ = Repository().page(SOLVE_LISTING, fields, session_id=session_id)
+            return jsonify(solves)
         
-        return jsonify(solves_dict)
+        solves = Repository().session_solves(session_id)
+        return jsonify([solve._asdict() for solve in solves])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -150,4 +171,23 @@ def delete_solve(solve_id):
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/solves/delete', methods=['POST'])
+def delete_solves():
+    """Delete many solves at once ({"solve_ids": [...]}), stats updated once per session"""
+    try:
+        data = request.get_json(silent=True) or {}
+        solve_ids = data.get('solve_ids')
+        
+        if (not isinstance(solve_ids, list) or not solve_ids
+                or not all(isinstance(solve_id, int) and not isinstance(solve_id, bool) for solve_id in solve_ids)):
+            return jsonify({'error': 'solve_ids must be a non-empty list of solve ids'}), 400
+        
+        deleted = TrainingLogger().delete_solves(solve_ids)
+        
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
@@ -3,115 +3,92 @@ Stats and Dashboard API Routes
 """
 
 from flask import Blueprint, jsonify, request
-import pandas as pd
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / 'python'))
 from training_logger import TrainingLogger
-from wca_api_client import WCAApiClient
+from repository import Repository, dashboard_summary
+from wca_rankings import get_wca_rankings
+from personal_records import personal_records, RECORD_TYPES
+from session_stats import AVERAGE_WINDOWS
+from solve_buffer import solve_buffer
+
+from ..conditional import etagged
 
 bp = Blueprint('stats', __name__, url_prefix='/api')
-wca_api = WCAApiClient()
 
 
 @bp.route('/stats', methods=['GET'])
+@bp.route('/dashboard', methods=['GET'])
+@etagged(lambda: get_wca_rankings().version)
 def get_stats():
-    """Get overall statistics"""
+    """Get all dashboard numbers for an event (or 'all') in one read"""
     try:
         event_id = request.args.get('event_id', '333')
         
-        logger = TrainingLogger()
-        logger.connect()
-        
-        if event_id == 'all':
-            pb_query = "SELECT MIN(ps.time_ms)/1000.0 as pb FROM personal_solves ps WHERE ps.dnf = 0"
-            pb_result = pd.read_sql_query(pb_query, logger.conn)
-        else:
-            pb_query = """
-            SELECT MIN(ps.time_ms)/1000.0 as pb 
-            FROM personal_solves ps
-            JOIN training_sessions ts ON ps.session_id = ts.id
-            WHERE ps.dnf = 0 AND ts.event_id = ?
-            """
-            pb_result = pd.read_sql_query(pb_query, logger.conn, params=(event_id,))
-        
-        pb = pb_result['pb'].values[0] if len(pb_result) > 0 and not pd.isna(pb_result['pb'].values[0]) else None
-        
-        if event_id == 'all':
-            avg_query = "SELECT AVG(ps.time_ms)/1000.0 as avg FROM personal_solves ps WHERE ps.dnf = 0"
-            avg_result = pd.read_sql_query(avg_query, logger.conn)
-        else:
-            avg_query = """
-            SELECT AVG(ps.time_ms)/1000.0 as avg 
-            FROM personal_solves ps
-            JOIN training_sessions ts ON ps.session_id = ts.id
-            WHERE ps.dnf = 0 AND ts.event_id = ?
-            """
-            avg_result = pd.read_sql_query(avg_query, logger.conn, params=(event_id,))
-        
-        avg = avg_result['avg'].values[0] if len(avg_result) > 0 and not pd.isna(avg_result['avg'].values[0]) else None
-        
-        if event_id == 'all':
-            count_query = "SELECT COUNT(ps.id) as total_solves FROM personal_solves ps"
-            count_result = pd.read_sql_query(count_query, logger.conn)
-        else:
-            count_query = """
-            SELECT COUNT(ps.id) as total_solves 
-            FROM personal_solves ps
-            JOIN training_sessions ts ON ps.session_id = ts.id
-            WHERE ts.event_id = ?
-            """
-            count_result = pd.read_sql_query(count_query, logger.conn, params=(event_id,))
-        
-        total_solves = int(count_result['total_solves'].values[0])
-        
-        if event_id == 'all':
-            session_query = "SELECT COUNT(*) as total_sessions FROM training_sessions"
-            session_result = pd.read_sql_query(session_query, logger.conn)
-        else:
-            session_query = "SELECT COUNT(*) as total_sessions FROM training_sessions WHERE event_id = ?"
-            session_result = pd.read_sql_query(session_query, logger.conn, params=(event_id,))
-        
-        total_sessions = int(session_result['total_sessions'].values[0])
-        
-        # Get total cubes count (all cubes)
-        cube_query_all = "SELECT COUNT(*) as total_cubes FROM cubes"
-        cube_result_all = pd.read_sql_query(cube_query_all, logger.conn)
-        total_cubes = int(cube_result_all['total_cubes'].values[0])
+        repository = Repository()
+        summary = repository.dashboard_summary(event_id)
         
-        # Get active cubes count
-        cube_query_active = "SELECT COUNT(*) as active_cubes FROM cubes WHERE is_active = 1"
-        cube_result_active = pd.read_sql_query(cube_query_active, logger.conn)
-        active_cubes = int(cube_result_active['active_cubes'].values[0])
+        # Databases from before personal_records: build the records once
+        if summary.solve_count and summary.record_count == 0:
+            with repository.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                _best_single_record(cursor, event_id)
+                conn.commit()
+                summary = dashboard_summary(cursor, event_id)
         
-        logger.disconnect()
+        pb = summary.single / 1000.0 if summary.single is not None else None
+        valid_count = summary.solve_count - summary.dnf_count
+        avg = summary.valid_sum_ms / valid_count / 1000.0 if valid_count else None
+        total_solves = summary.solve_count
+        total_sessions = summary.session_count
+        total_cubes = summary.total_cubes
+        active_cubes = summary.active_cubes
         
         wca_rank = None
         wca_percentile = None
+        wca_fresh = None
+        wca_updated_at = None
+        wca_exact = False
         
         supported_events = ['222', '333', '444', '555', '666', '777', 'pyram', 'skewb', 'minx', 'sq1', 'clock']
         
         if pb and event_id in supported_events:
-            try:
-                wca_result = wca_api.estimate_percentile(pb, event_id, 'single')
-                if wca_result:
-                    wca_rank = wca_result.get('rank_estimate')
-                    wca_percentile = wca_result.get('percentile')
-            except Exception as e:
-                print(f"WCA API error: {e}")
+            # Last loaded rankings; a refresh runs in the background if they are missing or old
+            wca_result = get_wca_rankings().percentile(pb, event_id, 'single')
+            wca_rank = wca_result.get('rank_estimate')
+            wca_percentile = wca_result.get('percentile')
+            wca_fresh = wca_result['fresh']
+            wca_updated_at = wca_result['updated_at']
+            wca_exact = wca_result.get('exact', False)
         
-        return jsonify({
+        result = {
             'pb': round(pb, 2) if pb else None,
             'average': round(avg, 2) if avg else None,
             'total_solves': total_solves,
             'total_sessions': total_sessions,
             'total_cubes': total_cubes,
             'active_cubes': active_cubes,  # NEW: Active cubes count
+            'dnf_count': summary.dnf_count,
             'wca_rank': wca_rank if wca_rank else None,
             'wca_percentile': round(wca_percentile, 2) if isinstance(wca_percentile, float) else None,
+            'wca_fresh': wca_fresh,
+            'wca_updated_at': wca_updated_at,
+            'wca_exact': wca_exact,
             'event_id': event_id
-        })
+        }
+        
+        # An average is a record of one event: 'all' gets each event's records
+        if event_id == 'all':
+            result['records_by_event'] = {
+                eid: _average_seconds(averages)
+                for eid, averages in repository.average_records().items()
+            }
+        else:
+            result['records'] = _average_seconds(summary._asdict())
+        
+        return jsonify(result)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -119,49 +96,35 @@ def get_stats():
 
 
 @bp.route('/pb-details', methods=['GET'])
+@etagged()
 def get_pb_details():
     """Get details about the personal best solve"""
     try:
         event_id = request.args.get('event_id', '333')
-        pb_time = float(request.args.get('pb_time'))
         
-        logger = TrainingLogger()
-        logger.connect()
+        repository = Repository()
         
-        # Find the solve that matches the PB (with rounding to match display)
-        if event_id == 'all':
-            query = """
-            SELECT ps.id, ps.session_id, ps.scramble, ts.date, ts.event_id, ps.time_ms
-            FROM personal_solves ps
-            JOIN training_sessions ts ON ps.session_id = ts.id
-            WHERE ps.dnf = 0
-            ORDER BY ps.time_ms ASC
-            LIMIT 1
-            """
-            result = pd.read_sql_query(query, logger.conn)
-        else:
-            query = """
-            SELECT ps.id, ps.session_id, ps.scramble, ts.date, ts.event_id, ps.time_ms
-            FROM personal_solves ps
-            JOIN training_sessions ts ON ps.session_id = ts.id
-            WHERE ps.dnf = 0 AND ts.event_id = ?
-            ORDER BY ps.time_ms ASC
-            LIMIT 1
-            """
-            result = pd.read_sql_query(query, logger.conn, params=(event_id,))
-        
-        logger.disconnect()
-        
-        if len(result) == 0:
-            return jsonify({'error': 'PB solve not found'}), 404
+        # The PB solve is stored with the record
+        with repository.db_manager.read_connection() as conn:
+            cursor = conn.cursor()
+            built = _records_built(cursor, event_id)
+            record = _best_single_record(cursor, event_id, build=False) if built else None
         
-        solve_data = result.iloc[0]
+        # Databases from before personal_records: build the records once
+        if not built:
+            with repository.db_manager.get_connection() as conn:
+                record = _best_single_record(conn.cursor(), event_id)
+                conn.commit()
+        
+        solve = repository.solve_details(record['solve_id']) if record else None
+        if solve is None:
+            return jsonify({'error': 'PB solve not found'}), 404
         
         return jsonify({
-            'session_id': int(solve_data['session_id']),
-            'date': solve_data['date'],
-            'scramble': solve_data['scramble'] if pd.notna(solve_data['scramble']) else None,
-            'event_id': solve_data['event_id']
+            'session_id': solve.session_id,
+            'date': solve.date,
+            'scramble': solve.scramble,
+            'event_id': solve.event_id
         })
         
     except Exception as e:
@@ -171,17 +134,137 @@ def get_pb_details():
 
 
 @bp.route('/events', methods=['GET'])
+@etagged()
 def get_events():
     """Get list of available events"""
     try:
-        logger = TrainingLogger()
-        logger.connect()
+        return jsonify(Repository().events())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/records', methods=['GET'])
+@etagged()
+def get_records():
+    """Get best single/aoN records for an event, optionally with PB progression"""
+    try:
+        event_id = request.args.get('event_id', '333')
+        history_type = request.args.get('history')
+        
+        if history_type and history_type not in RECORD_TYPES:
+            return jsonify({'error': f'Unknown record type: {history_type}'}), 400
+        
+        repository = Repository()
+        with repository.db_manager.read_connection() as conn:
+            cursor = conn.cursor()
+            records = personal_records.get(cursor, event_id, build=False)
+            history = personal_records.history(cursor, event_id, history_type) if history_type else None
+        
+        # Databases from before personal_records: build the event's records once
+        if not records:
+            with repository.db_manager.get_connection() as conn:
+                cursor = conn.cursor()
+                records = personal_records.get(cursor, event_id)
+                history = personal_records.history(cursor, event_id, history_type) if history_type else None
+                conn.commit()
+        
+        result = {'event_id': event_id, 'records': {}}
+        for record_type in RECORD_TYPES:
+            record = records.get(record_type, {})
+            result['records'][record_type] = {
+                'time': record['time_ms'] / 1000 if record.get('time_ms') is not None else None,
+                'session_id': record.get('session_id'),
+                'solve_id': record.get('solve_id'),
+                'achieved_at': record.get('achieved_at')
+            }
+        
+        if history is not None:
+            result['history'] = [
+                {
+                    'time': entry['time_ms'] / 1000,
+                    'session_id': entry['session_id'],
+                    'solve_id': entry['solve_id'],
+                    'achieved_at': entry['achieved_at']
+                }
+                for entry in history
+            ]
+        
+        return jsonify(result)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/wca-rank', methods=['GET'])
+def get_wca_rank():
+    """Rank and percentile of a time among WCA competitors (exact with a loaded export)"""
+    try:
+        time_seconds = request.args.get('time', type=float)
+        event_id = request.args.get('event_id', '333')
+        rank_type = request.args.get('type', 'single')
+        region = request.args.get('region', 'world')
         
-        query = "SELECT DISTINCT event_id FROM training_sessions ORDER BY event_id"
-        events = pd.read_sql_query(query, logger.conn)
-        logger.disconnect()
+        if time_seconds is None or time_seconds <= 0:
+            return jsonify({'error': 'Missing or invalid time'}), 400
+        if rank_type not in ('single', 'average'):
+            return jsonify({'error': f'Unknown type: {rank_type}'}), 400
         
-        event_list = events['event_id'].tolist()
-        return jsonify(event_list)
+        result = get_wca_rankings().percentile(time_seconds, event_id, rank_type, region)
+        result.update({'time': time_seconds, 'event_id': event_id, 'type': rank_type})
+        return jsonify(result)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/db/pool', methods=['GET'])
+def get_pool_stats():
+    """Connection checkouts and wait times for the writer and the read pool"""
+    try:
+        return jsonify(TrainingLogger().db_manager.pool_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/db/solve-buffer', methods=['GET'])
+def get_solve_buffer_stats():
+    """Durability mode, queue depth and flush / acknowledgement latencies of timer saves"""
+    try:
+        return jsonify(solve_buffer.stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _average_seconds(averages):
+    """aoN records in seconds (2 decimals) from a mapping of ms values"""
+    return {
+        f'ao{size}': round(averages[f'ao{size}'] / 1000.0, 2) if averages[f'ao{size}'] is not None else None
+        for size in AVERAGE_WINDOWS
+    }
+
+
+def _record_events(cursor, event_id):
+    """Events behind an event filter ('all' = every event with sessions)"""
+    if event_id != 'all':
+        return [event_id]
+    cursor.execute("SELECT DISTINCT event_id FROM training_sessions")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _records_built(cursor, event_id):
+    """Whether personal_records holds the records of the event (or of every event)"""
+    return all(personal_records.get(cursor, eid, build=False) for eid in _record_events(cursor, event_id))
+
+
+def _best_single_record(cursor, event_id, build=True):
+    """Best single record for an event (or across all events), None if there is none"""
+    best = None
+    for eid in _record_events(cursor, event_id):
+        record = personal_records.get(cursor, eid, build).get('single')
+        if record and record['time_ms'] is not None:
+            if best is None or record['time_ms'] < best['time_ms']:
+                best = record
+    
+    return best
@@ -10,10 +10,33 @@ import traceback
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / 'python'))
 from training_logger import TrainingLogger
+from repository import Repository, TIMER_LISTING, SESSION_STATS_FIELDS
+from session_stats import stats_cache
+from personal_records import personal_records
+from solve_buffer import solve_buffer
+
+from ..conditional import etagged
+from ..paging import encode_cursor, decode_cursor, parse_limit, parse_fields
+
+# Solves the timer page shows; older ones are fetched with the cursor
+TIMER_TAIL = 100
+
+# Most solves one batch upload may carry
+MAX_BATCH_SOLVES = 1000
+MAX_CLIENT_ID_LENGTH = 64
 
 bp = Blueprint('timer', __name__, url_prefix='/api/timer')
 
 
+def _stats_seconds(snapshot):
+    """Session stats written by stats_cache (ms) in the shape of Repository.session_stats"""
+    return {
+        name: snapshot[name] if name == 'solve_count' or snapshot[name] is None
+        else round(snapshot[name] / 1000.0, 2)
+        for name in SESSION_STATS_FIELDS
+    }
+
+
 @bp.route('/session', methods=['POST'])
 def create_timer_session():
     """Create a new timer session"""
@@ -45,7 +68,7 @@ def create_timer_session():
 
 @bp.route('/solve', methods=['POST'])
 def save_timer_solve():
-    """Save a solve from the timer"""
+    """Save a solve from the timer (group-committed with other saves, see solve_buffer.py)"""
     try:
         data = request.get_json()
         session_id = data.get('session_id')
@@ -57,38 +80,16 @@ def save_timer_solve():
         if not session_id or time is None:
             return jsonify({'error': 'Missing required fields'}), 400
         
-        logger = TrainingLogger()
-        with logger.db_manager.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Get current solve count
-            cursor.execute("""
-                SELECT COUNT(*) FROM personal_solves WHERE session_id = ?
-            """, (session_id,))
-            
-            solve_number = cursor.fetchone()[0] + 1
-            
-            # Convert time to milliseconds
-            time_ms = int(time * 1000)
-            
-            # Insert solve
-            cursor.execute("""
-                INSERT INTO personal_solves 
-                (session_id, solve_number, time_ms, scramble, penalty, dnf, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (session_id, solve_number, time_ms, scramble, penalty, 1 if dnf else 0, 
-                  datetime.now().isoformat()))
-            
-            solve_id = cursor.lastrowid
-            
-            # Update session statistics
-            _update_session_stats(cursor, session_id)
-            
-            conn.commit()
+        # An optional client_id makes a retried save idempotent, as for batches
+        results, stats = solve_buffer.submit(session_id, [(
+            data.get('client_id'), int(time * 1000), penalty, dnf, scramble, datetime.now().isoformat()
+        )])
+        solve_id = results[0][1]
         
         return jsonify({
             'success': True,
-            'solve_id': solve_id
+            'solve_id': solve_id,
+            'stats': _stats_seconds(stats)
         })
         
     except Exception as e:
@@ -96,6 +97,85 @@ def save_timer_solve():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/solves/batch', methods=['POST'])
+def save_timer_solves():
+    """
+    Save an ordered batch of solves from the timer in one transaction
+    
+    {"session_id": 1, "solves": [{"client_id", "time", "penalty", "dnf",
+    "scramble", "timestamp"}, ...]}. The client ids make uploads
+    idempotent: a solve that is already stored comes back with
+    created false instead of being added again, so a timer that was
+    offline can simply resend its backlog.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        session_id = data.get('session_id')
+        solves = data.get('solves')
+        
+        if not session_id or not isinstance(solves, list) or not solves:
+            return jsonify({'error': 'Missing required fields'}), 400
+        if len(solves) > MAX_BATCH_SOLVES:
+            return jsonify({'error': f'At most {MAX_BATCH_SOLVES} solves per batch'}), 400
+        
+        batch = [_batch_solve(solve) for solve in solves]
+        
+        if Repository().session_stats(session_id) is None:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        results, stats = solve_buffer.submit(session_id, batch)
+        
+        return jsonify({
+            'success': True,
+            'solves': [
+                {'client_id': client_id, 'solve_id': solve_id, 'created': created}
+                for client_id, solve_id, created in results
+            ],
+            'stats': _stats_seconds(stats)
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+def _batch_solve(solve):
+    """(client_id, time_ms, penalty, dnf, scramble, timestamp) for one solve of a batch"""
+    if not isinstance(solve, dict):
+        raise ValueError("Each solve must be an object")
+    
+    client_id = solve.get('client_id')
+    if (not isinstance(client_id, (str, int)) or isinstance(client_id, bool)
+            or not 0 < len(str(client_id)) <= MAX_CLIENT_ID_LENGTH):
+        raise ValueError(f"Each solve needs a client_id of up to {MAX_CLIENT_ID_LENGTH} characters")
+    
+    time = solve.get('time')
+    if not isinstance(time, (int, float)) or isinstance(time, bool) or time < 0:
+        raise ValueError(f"Solve {client_id}: time must be a number of seconds")
+    
+    penalty = solve.get('penalty', '')
+    if penalty not in ('', 'OK', '+2', 'DNF'):
+        raise ValueError(f"Solve {client_id}: unknown penalty {penalty!r}")
+    
+    return (client_id, int(time * 1000), penalty, bool(solve.get('dnf', False)),
+            solve.get('scramble', ''), _local_timestamp(solve.get('timestamp')))
+
+
+def _local_timestamp(value):
+    """ISO timestamp from the client as server-local time like the other solves, now when absent"""
+    if not value:
+        return datetime.now().isoformat()
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
 @bp.route('/solve/<int:solve_id>', methods=['DELETE'])
 def delete_timer_solve(solve_id):
     """Delete a solve"""
@@ -117,11 +197,12 @@ def delete_timer_solve(solve_id):
             cursor.execute("DELETE FROM personal_solves WHERE id = ?", (solve_id,))
             
             # Update session statistics
-            _update_session_stats(cursor, session_id)
+            stats = stats_cache.solve_removed(cursor, session_id, solve_id)
+            personal_records.solve_removed(cursor, session_id)
             
             conn.commit()
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'stats': _stats_seconds(stats)})
         
     except Exception as e:
         traceback.print_exc()
@@ -161,11 +242,12 @@ def update_solve_penalty(solve_id):
             """, (new_penalty, new_dnf, solve_id))
             
             # Update session stats
-            _update_session_stats(cursor, session_id)
+            stats = stats_cache.solve_changed(cursor, session_id, solve_id, base_time, new_penalty, new_dnf)
+            personal_records.solve_changed(cursor, session_id)
             
             conn.commit()
         
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'stats': _stats_seconds(stats)})
         
     except Exception as e:
         traceback.print_exc()
@@ -173,108 +255,36 @@ def update_solve_penalty(solve_id):
 
 
 @bp.route('/session/<int:session_id>/solves', methods=['GET'])
+@etagged()
 def get_session_solves(session_id):
-    """Get all solves for a session"""
+    """
+    Get the solves of a session, newest first, with the session stats
+    
+    ?last=N returns only the newest N solves plus a next_cursor for the
+    ones before them (?cursor=), so the timer does not load the whole
+    session. ?fields=id,time,... returns only those fields.
+    """
     try:
-        logger = TrainingLogger()
-        with logger.db_manager.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, time_ms, penalty, dnf, scramble
-                FROM personal_solves
-                WHERE session_id = ?
-                ORDER BY solve_number DESC
-            """, (session_id,))
-            
-            solves = []
-            for row in cursor.fetchall():
-                base_time = row[1] / 1000.0
-                penalty = row[2] or 'OK'
-                dnf = bool(row[3])
-                scramble = row[4] or ''
-                
-                # Apply penalty to time
-                final_time = base_time
-                if penalty == '+2' and not dnf:
-                    final_time += 2
-                
-                solves.append({
-                    'id': row[0],
-                    'time': final_time,
-                    'penalty': penalty,
-                    'dnf': dnf,
-                    'scramble': scramble
-                })
+        repository = Repository()
+        fields = parse_fields(list(TIMER_LISTING.columns))
+        paged = 'last' in request.args or 'cursor' in request.args
+        limit = parse_limit('last', TIMER_TAIL) if paged else None
         
-        return jsonify({'solves': solves})
+        solves, next_key = repository.page(
+            TIMER_LISTING, fields, decode_cursor(request.args.get('cursor')), limit,
+            session_id=session_id
+        )
+        for solve in solves:
+            if 'dnf' in solve:
+                solve['dnf'] = bool(solve['dnf'])
         
+        response = {'solves': solves, 'stats': repository.session_stats(session_id)}
+        if paged:
+            response['next_cursor'] = encode_cursor(next_key)
+        return jsonify(response)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
-
-
-def _update_session_stats(cursor, session_id):
-    """Update session statistics after adding/removing solves"""
-    
-    # Get all non-DNF solves with penalties
-    cursor.execute("""
-        SELECT time_ms, penalty
-        FROM personal_solves
-        WHERE session_id = ? AND dnf = 0
-        ORDER BY solve_number
-    """, (session_id,))
-    
-    rows = cursor.fetchall()
-    times = []
-    for row in rows:
-        base_time = row[0]
-        penalty = row[1] or 'OK'
-        if penalty == '+2':
-            times.append(base_time + 2000)
-        else:
-            times.append(base_time)
-    
-    # Get total solve count including DNFs
-    cursor.execute("""
-        SELECT COUNT(*) FROM personal_solves WHERE session_id = ?
-    """, (session_id,))
-    solve_count = cursor.fetchone()[0]
-    
-    if not times:
-        cursor.execute("""
-            UPDATE training_sessions
-            SET solve_count = ?,
-                best_single = NULL,
-                session_mean = NULL,
-                ao5 = NULL,
-                ao12 = NULL
-            WHERE id = ?
-        """, (solve_count, session_id))
-        return
-    
-    best_single = min(times)
-    session_mean = sum(times) / len(times)
-    
-    # Calculate Ao5
-    ao5 = None
-    if len(times) >= 5:
-        last_5 = sorted(times[-5:])
-        ao5 = sum(last_5[1:4]) / 3
-    
-    # Calculate Ao12
-    ao12 = None
-    if len(times) >= 12:
-        last_12 = sorted(times[-12:])
-        ao12 = sum(last_12[1:11]) / 10
-    
-    # Update session
-    cursor.execute("""
-        UPDATE training_sessions
-        SET solve_count = ?,
-            best_single = ?,
-            session_mean = ?,
-            ao5 = ?,
-            ao12 = ?
-        WHERE id = ?
-    """, (solve_count, best_single, int(session_mean), 
-          int(ao5) if ao5 else None, int(ao12) if ao12 else None, session_id))
\ No newline at end of file
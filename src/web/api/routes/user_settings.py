@@ -1,6 +1,9 @@
 """
 User Settings API Routes
 Handles WCA ID and user preferences
+
+user_settings is part of sql/schema.sql; create_app adds it to older
+databases before any request is served.
 """
 
 from flask import Blueprint, jsonify, request
@@ -19,25 +22,10 @@ def get_user_settings():
     """Get user settings including WCA ID and name"""
     try:
         logger = TrainingLogger()
-        logger.connect()
-        
-        # Check if user_settings table exists, if not create it
-        cursor = logger.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_settings (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                wca_id TEXT,
-                wca_name TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        logger.conn.commit()
-        
-        # Get current settings
-        cursor.execute("SELECT wca_id, wca_name FROM user_settings WHERE id = 1")
-        result = cursor.fetchone()
-        
-        logger.disconnect()
+        with logger.db_manager.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT wca_id, wca_name FROM user_settings WHERE id = 1")
+            result = cursor.fetchone()
         
         if result:
             return jsonify({
@@ -94,32 +82,20 @@ def update_user_settings():
         
         # Save to database
         logger = TrainingLogger()
-        logger.connect()
-        
-        cursor = logger.conn.cursor()
-        
-        # Create table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_settings (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                wca_id TEXT,
-                wca_name TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Insert or update
-        cursor.execute("""
-            INSERT INTO user_settings (id, wca_id, wca_name, updated_at)
-            VALUES (1, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(id) DO UPDATE SET
-                wca_id = excluded.wca_id,
-                wca_name = excluded.wca_name,
-                updated_at = CURRENT_TIMESTAMP
-        """, (wca_id, wca_name))
-        
-        logger.conn.commit()
-        logger.disconnect()
+        with logger.db_manager.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Insert or update
+            cursor.execute("""
+                INSERT INTO user_settings (id, wca_id, wca_name, updated_at)
+                VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(id) DO UPDATE SET
+                    wca_id = excluded.wca_id,
+                    wca_name = excluded.wca_name,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (wca_id, wca_name))
+            
+            conn.commit()
         
         return jsonify({
             'success': True,
@@ -138,12 +114,9 @@ def delete_user_settings():
     """Remove WCA ID from settings"""
     try:
         logger = TrainingLogger()
-        logger.connect()
-        
-        cursor = logger.conn.cursor()
-        cursor.execute("DELETE FROM user_settings WHERE id = 1")
-        logger.conn.commit()
-        logger.disconnect()
+        with logger.db_manager.get_connection() as conn:
+            conn.execute("DELETE FROM user_settings WHERE id = 1")
+            conn.commit()
         
         return jsonify({'success': True})
         
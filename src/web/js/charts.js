@@ -139,8 +139,8 @@ async function loadProgressChart() {
     
     try {
         const url = sessionId === 'all' 
-            ? `${API_BASE}/charts/progress?event_id=${eventId}`
-            : `${API_BASE}/charts/session-progress?session_id=${sessionId}`;
+            ? `${API_BASE}/charts/progress?event_id=${eventId}&max_points=${CHART_MAX_POINTS}`
+            : `${API_BASE}/charts/session-progress?session_id=${sessionId}&max_points=${CHART_MAX_POINTS}`;
             
         const response = await fetch(url);
         const data = await response.json();
@@ -176,6 +176,17 @@ async function loadProgressChart() {
                 });
             }
             
+            if (data.data.some(d => d.best)) {
+                traces.push({
+                    x: data.data.map(d => d.solve_number),
+                    y: data.data.map(d => d.best),
+                    name: 'Running Best',
+                    type: 'scatter',
+                    mode: 'lines',
+                    line: { color: COLORS.quaternary, width: 2, dash: 'dot', shape: 'hv' }
+                });
+            }
+            
             if (data.data.some(d => d.ao5)) {
                 traces.push({
                     x: data.data.map(d => d.solve_number),
@@ -188,7 +199,7 @@ async function loadProgressChart() {
             }
         } else {
             traces.push({
-                x: data.data.map((_, i) => i + 1),
+                x: data.data.map((d, i) => d.session_number ?? i + 1),
                 y: data.data.map(d => d.best),
                 name: 'Best Single',
                 type: 'scatter',
@@ -198,7 +209,7 @@ async function loadProgressChart() {
             });
             
             traces.push({
-                x: data.data.map((_, i) => i + 1),
+                x: data.data.map((d, i) => d.session_number ?? i + 1),
                 y: data.data.map(d => d.mean),
                 name: 'Session Mean',
                 type: 'scatter',
@@ -209,7 +220,7 @@ async function loadProgressChart() {
             
             if (data.data.some(d => d.ao5)) {
                 traces.push({
-                    x: data.data.map((_, i) => i + 1),
+                    x: data.data.map((d, i) => d.session_number ?? i + 1),
                     y: data.data.map(d => d.ao5),
                     name: 'Ao5',
                     type: 'scatter',
@@ -258,22 +269,20 @@ async function loadDistributionChart() {
         const response = await fetch(url);
         const data = await response.json();
         
-        if (data.error || !data.times || data.times.length === 0) {
+        if (data.error || !data.counts || data.counts.length === 0) {
             container.innerHTML = `<div class="loading">${data.error || 'Need at least 5 solves'}</div>`;
             return;
         }
         
-        const times = data.times;
-        const mean = times.reduce((a, b) => a + b) / times.length;
-        const sorted = [...times].sort((a, b) => a - b);
-        const median = sorted[Math.floor(times.length / 2)];
-        const stdDev = Math.sqrt(times.reduce((sq, n) => sq + Math.pow(n - mean, 2), 0) / times.length);
+        // Bins come from the server; plot each count at its bin's centre
+        const { mean, median, std_dev: stdDev } = data;
         const isDark = document.documentElement.getAttribute('data-theme') === 'dark';
         
         const trace = {
-            x: times,
-            type: 'histogram',
-            nbinsx: Math.min(30, Math.max(10, Math.floor(times.length / 5))),
+            x: data.counts.map((_, i) => (data.edges[i] + data.edges[i + 1]) / 2),
+            y: data.counts,
+            width: data.bin_width,
+            type: 'bar',
             marker: {
                 color: COLORS.primary,
                 line: { color: isDark ? '#2a2a2a' : '#ffffff', width: 1 }
@@ -336,64 +345,38 @@ async function loadRollingChart() {
     
     try {
         const url = sessionId === 'all'
-            ? `${API_BASE}/charts/rolling-average?event_id=${eventId}`
-            : `${API_BASE}/charts/session-rolling?session_id=${sessionId}`;
+            ? `${API_BASE}/charts/rolling-average?event_id=${eventId}&max_points=${CHART_MAX_POINTS}`
+            : `${API_BASE}/charts/session-rolling?session_id=${sessionId}&max_points=${CHART_MAX_POINTS}`;
             
-        const response = await fetch(url);
-        const data = await response.json();
+        const data = await fetchColumnar(url);
         
-        if (data.error || !data.times || data.times.length === 0) {
+        if (data.error || !data.columns.times.length) {
             container.innerHTML = `<div class="loading">${data.error || 'Need at least 12 solves'}</div>`;
             return;
         }
         
-        const times = data.times;
-        const rolling5 = [];
-        const rolling12 = [];
-        
-        for (let i = 0; i < times.length; i++) {
-            if (i >= 4) {
-                const slice5 = times.slice(i - 4, i + 1);
-                rolling5.push(slice5.reduce((a, b) => a + b) / 5);
-            } else {
-                rolling5.push(null);
-            }
-            
-            if (i >= 11) {
-                const slice12 = times.slice(i - 11, i + 1);
-                rolling12.push(slice12.reduce((a, b) => a + b) / 12);
-            } else {
-                rolling12.push(null);
-            }
-        }
-        
+        const times = data.columns.times;
+        const x = data.columns.solve_numbers;
         const isDark = document.documentElement.getAttribute('data-theme') === 'dark';
+        const lineColors = [COLORS.secondary, COLORS.quaternary, COLORS.tertiary, COLORS.info, COLORS.danger];
         
         const traces = [
             {
-                x: times.map((_, i) => i + 1),
+                x: x,
                 y: times,
                 name: 'Individual Times',
                 type: 'scatter',
                 mode: 'markers',
                 marker: { color: COLORS.gray, size: 4, opacity: 0.3 }
             },
-            {
-                x: times.map((_, i) => i + 1),
-                y: rolling5,
-                name: 'Rolling Ao5',
-                type: 'scatter',
-                mode: 'lines',
-                line: { color: COLORS.secondary, width: 3 }
-            },
-            {
-                x: times.map((_, i) => i + 1),
-                y: rolling12,
-                name: 'Rolling Ao12',
+            ...data.windows.map((size, idx) => ({
+                x: x,
+                y: data.columns[`ao${size}`],
+                name: `Rolling Ao${size}`,
                 type: 'scatter',
                 mode: 'lines',
-                line: { color: COLORS.quaternary, width: 3 }
-            }
+                line: { color: lineColors[idx % lineColors.length], width: 3 }
+            }))
         ];
         
         const layout = {
@@ -442,10 +425,17 @@ async function loadConsistencyChart() {
         
         const isDark = document.documentElement.getAttribute('data-theme') === 'dark';
         
-        const traces = data.sessions.map((session, idx) => ({
-            y: session.times,
+        // Quartiles come precomputed; whiskers reach the fastest and slowest solve
+        const traces = data.sessions.filter(session => session.count > 0).map((session, idx) => ({
             type: 'box',
             name: session.date,
+            q1: [session.q1],
+            median: [session.median],
+            q3: [session.q3],
+            lowerfence: [session.min],
+            upperfence: [session.max],
+            mean: [session.mean],
+            sd: [session.std_dev],
             marker: { color: [COLORS.primary, COLORS.secondary, COLORS.tertiary, COLORS.quaternary, COLORS.info][idx % 5] },
             boxmean: 'sd'
         }));
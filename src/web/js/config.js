@@ -6,6 +6,7 @@ const API_BASE = 'http://localhost:5000/api';
 // Global state variables
 const AppState = {
     selectedFile: null,
+    importJobId: null,
     currentSessionId: null,
     currentEvent: '333',
     plotlyLoaded: false,
@@ -14,6 +15,9 @@ const AppState = {
     allCubes: []
 };
 
+// Points per series the server downsamples long charts to (max_points)
+const CHART_MAX_POINTS = 2000;
+
 // Color palette for charts
 const COLORS = {
     primary: '#2563eb',      // Blue
@@ -84,6 +88,41 @@ function formatTime(seconds) {
     return seconds ? `${seconds}s` : 'N/A';
 }
 
+// Fetch a ?format=columnar response (see src/web/api/columnar.py).
+// Millisecond columns come back as seconds in Float64Arrays with NaN for DNF/empty,
+// count columns as Uint32Arrays, text columns as arrays; errors come back as
+// { error } like the JSON routes.
+async function fetchColumnar(url) {
+    const response = await fetch(url + (url.includes('?') ? '&' : '?') + 'format=columnar');
+    if (!response.ok) {
+        return response.json();
+    }
+    
+    const buffer = await response.arrayBuffer();
+    const headerLength = new DataView(buffer).getUint32(0, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+    const start = 4 + headerLength;
+    
+    const columns = {};
+    for (const column of header.columns) {
+        if (column.type === 'string') {
+            columns[column.name] = column.values;
+            continue;
+        }
+        const raw = new Uint32Array(buffer, start + column.offset, column.length);
+        if (column.unit === 'count') {
+            columns[column.name] = raw;
+            continue;
+        }
+        const seconds = new Float64Array(column.length);
+        for (let i = 0; i < raw.length; i++) {
+            seconds[i] = raw[i] === header.missing ? NaN : raw[i] / 1000;
+        }
+        columns[column.name] = seconds;
+    }
+    return { ...header, columns };
+}
+
 function showError(message) {
     alert(`Error: ${message}`);
 }
@@ -35,9 +35,9 @@ function changeEvent() {
     loadStats();
 }
 
-async function loadStats() {
+async function loadStats(wcaRetries = 3) {
     try {
-        const response = await fetch(`${API_BASE}/stats?event_id=${AppState.currentEvent}`);
+        const response = await fetch(`${API_BASE}/dashboard?event_id=${AppState.currentEvent}`);
         const data = await response.json();
         
         if (data.error) {
@@ -103,6 +103,14 @@ async function loadStats() {
         const percentileNote = document.querySelector('#stat-percentile').nextElementSibling.nextElementSibling;
         percentileNote.textContent = 'based on single best';
         
+        // WCA rankings load in the background; ask again once they are in
+        if (data.wca_fresh === false && data.wca_updated_at === null && wcaRetries > 0) {
+            const eventId = AppState.currentEvent;
+            setTimeout(() => {
+                if (AppState.currentEvent === eventId) loadStats(wcaRetries - 1);
+            }, 3000);
+        }
+        
     } catch (error) {
         console.error('Failed to load stats:', error);
     }
@@ -115,8 +115,45 @@ async function importSelectedSessions() {
         if (result.error) {
             statusDiv.textContent = `Error: ${result.error}`;
             statusDiv.className = 'error';
-        } else {
-            statusDiv.textContent = `✓ ${result.message}`;
+            return;
+        }
+        
+        AppState.importJobId = result.job_id;
+        pollImportJob(result.job_id);
+    } catch (error) {
+        console.error('Import error:', error);
+        statusDiv.textContent = `Error: ${error.message}`;
+        statusDiv.className = 'error';
+    }
+}
+
+async function pollImportJob(jobId) {
+    const statusDiv = document.getElementById('import-status');
+    
+    try {
+        const response = await fetch(`${API_BASE}/import/jobs/${jobId}`);
+        const job = await response.json();
+        
+        if (job.error) {
+            statusDiv.textContent = `Error: ${job.error}`;
+            statusDiv.className = 'error';
+            AppState.importJobId = null;
+            return;
+        }
+        
+        if (job.status === 'queued' || job.status === 'running') {
+            statusDiv.textContent = formatImportProgress(job);
+            statusDiv.className = '';
+            setTimeout(() => pollImportJob(jobId), 500);
+            return;
+        }
+        
+        AppState.importJobId = null;
+        
+        if (job.status === 'completed') {
+            statusDiv.textContent = `✓ Imported ${job.solves_processed} solves from ${job.sessions_imported} session(s)` +
+                (job.solves_already_imported ? `, ${job.solves_already_imported} already imported` : '') +
+                (job.solves_skipped ? ` (${job.solves_skipped} skipped)` : '');
             statusDiv.className = 'success';
             
             setTimeout(() => {
@@ -130,15 +167,38 @@ async function importSelectedSessions() {
             document.getElementById('preview-btn').style.display = 'none';
             document.getElementById('session-selection').style.display = 'none';
             AppState.selectedFile = null;
+        } else if (job.status === 'cancelled') {
+            statusDiv.textContent = 'Import cancelled';
+            statusDiv.className = '';
+        } else {
+            statusDiv.textContent = `Error: ${job.errors[job.errors.length - 1] || 'Import failed'}`;
+            statusDiv.className = 'error';
         }
     } catch (error) {
-        console.error('Import error:', error);
+        console.error('Import progress error:', error);
         statusDiv.textContent = `Error: ${error.message}`;
         statusDiv.className = 'error';
+        AppState.importJobId = null;
+    }
+}
+
+function formatImportProgress(job) {
+    if (job.status === 'queued') return 'Waiting for import worker...';
+    if (job.total_solves === null) return 'Reading file...';
+    
+    const percent = job.total_solves ? Math.floor(100 * job.solves_processed / job.total_solves) : 100;
+    let text = `Importing... ${job.solves_processed.toLocaleString()} / ${job.total_solves.toLocaleString()} solves (${percent}%)`;
+    if (job.eta_seconds !== null) {
+        text += ` - about ${Math.ceil(job.eta_seconds)}s left`;
     }
+    return text;
 }
 
 function cancelImport() {
+    if (AppState.importJobId) {
+        fetch(`${API_BASE}/import/jobs/${AppState.importJobId}/cancel`, { method: 'POST' });
+        return;
+    }
     document.getElementById('session-selection').style.display = 'none';
     document.getElementById('import-status').textContent = '';
 }
\ No newline at end of file
@@ -1,5 +1,18 @@
 // timer.js - Speed Timer Functionality
 
+// Solves kept on the page; the server sends the session stats with them
+const TIMER_TAIL = 100;
+
+// Solves are queued in localStorage and uploaded in batches, so a slow or
+// offline server never loses a solve; the client id makes resending safe
+const PENDING_SOLVES_KEY = 'timer-pending-solves';
+const FLUSH_BATCH_SIZE = 500;
+const FLUSH_RETRY_MS = 5000;
+
+// Solves the server turned down (e.g. their session was deleted) stay in
+// localStorage with the reason until the user retries or discards them
+const FAILED_SOLVES_KEY = 'timer-failed-solves';
+
 // Timer state
 const TimerState = {
     event: '333',
@@ -13,7 +26,11 @@ const TimerState = {
     spacePressed: false,
     readyToStart: false,
     holdTimer: null,
-    currentSolves: [],
+    currentSolves: [],     // newest TIMER_TAIL solves of the session
+    sessionStats: null,    // count, best, mean and averages of the whole session (server)
+    pendingSolves: loadStoredSolves(PENDING_SOLVES_KEY),  // saved here, not yet on the server, oldest first
+    failedSolves: loadStoredSolves(FAILED_SOLVES_KEY),    // rejected by the server, with the error
+    flushing: false,
     currentSessionId: null,
     isFullscreen: false,
     showingResult: false, // NEW: Track if showing result
@@ -68,6 +85,8 @@ async function loadTimerTab() {
     }
     
     await loadSessionSelector();
+    updateSaveError();
+    flushPendingSolves();
     initializeTimer();
     setupTimerKeyboard();
     generateNewScramble();
@@ -136,7 +155,7 @@ function newScramble() {
 // Session selector
 async function loadSessionSelector() {
     try {
-        const response = await fetch(`${API_BASE}/sessions`);
+        const response = await fetch(`${API_BASE}/sessions?fields=id,date,event_id,solve_count`);
         const sessions = await response.json();
         
         const selector = document.getElementById('timer-session-select');
@@ -175,10 +194,18 @@ async function loadSessionSelector() {
 
 async function loadSessionSolves(sessionId) {
     try {
-        const response = await fetch(`${API_BASE}/timer/session/${sessionId}/solves`);
+        const response = await fetch(`${API_BASE}/timer/session/${sessionId}/solves?last=${TIMER_TAIL}`);
         const data = await response.json();
         
-        TimerState.currentSolves = data.solves || [];
+        // Solves still waiting to be uploaded (or turned down) are newer than anything stored
+        const pending = TimerState.failedSolves.concat(TimerState.pendingSolves)
+            .filter(solve => solve.session_id === sessionId)
+            .sort((a, b) => a.timestamp.localeCompare(b.timestamp))
+            .map(pendingToSolve)
+            .reverse();
+        
+        TimerState.currentSolves = pending.concat(data.solves || []).slice(0, TIMER_TAIL);
+        TimerState.sessionStats = data.stats;
         updateTimerStats();
         updateSolvesList();
     } catch (error) {
@@ -458,81 +485,228 @@ function stopTimer() {
 }
 
 async function saveSolve(penalty) {
-    let finalTime = TimerState.time;
-    let isDNF = false;
-    
-    if (penalty === '+2') {
-        finalTime += 2;
-    } else if (penalty === 'DNF') {
-        isDNF = true;
-    }
-    
     if (!TimerState.currentSessionId) {
         await createTimerSession();
     }
+    if (!TimerState.currentSessionId) {
+        alert('Failed to save solve');
+        return;
+    }
+    
+    const pending = {
+        client_id: newClientId(),
+        session_id: TimerState.currentSessionId,
+        time: TimerState.time, // raw time, the server applies +2
+        scramble: TimerState.scramble,
+        penalty: penalty,
+        dnf: penalty === 'DNF',
+        timestamp: new Date().toISOString()
+    };
+    
+    TimerState.pendingSolves.push(pending);
+    storePendingSolves();
+    
+    TimerState.currentSolves.unshift(pendingToSolve(pending));
+    if (TimerState.currentSolves.length > TIMER_TAIL) {
+        TimerState.currentSolves.pop();
+    }
+    updateSolvesList();
+    
+    await flushPendingSolves();
+}
+
+// Upload queued solves, a batch per session, until the queue is empty or a request fails
+async function flushPendingSolves() {
+    if (TimerState.flushing) return;
+    TimerState.flushing = true;
     
     try {
-        const response = await fetch(`${API_BASE}/timer/solve`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                session_id: TimerState.currentSessionId,
-                time: finalTime,
-                scramble: TimerState.scramble,
-                penalty: penalty,
-                dnf: isDNF
-            })
-        });
-        
-        const result = await response.json();
-        
-        if (result.success) {
-            TimerState.currentSolves.unshift({
-                id: result.solve_id,
-                time: finalTime,
-                penalty: penalty,
-                dnf: isDNF,
-                scramble: TimerState.scramble
-            });
+        while (TimerState.pendingSolves.length > 0) {
+            const sessionId = TimerState.pendingSolves[0].session_id;
+            const batch = TimerState.pendingSolves
+                .filter(solve => solve.session_id === sessionId)
+                .slice(0, FLUSH_BATCH_SIZE);
             
-            updateTimerStats();
-            updateSolvesList();
+            const rejected = await uploadSolves(sessionId, batch);
+            if (rejected && rejected.status === 400 && batch.length > 1) {
+                // One invalid solve fails the whole batch: send them one by one to save the rest
+                for (const solve of batch) {
+                    const single = await uploadSolves(sessionId, [solve]);
+                    if (single) {
+                        failPendingSolves([solve], single.error);
+                    }
+                }
+            } else if (rejected) {
+                failPendingSolves(batch, rejected.error);
+            }
         }
     } catch (error) {
-        console.error('Error saving solve:', error);
-        alert('Failed to save solve');
+        console.error('Error saving solves, retrying:', error);
+        setTimeout(flushPendingSolves, FLUSH_RETRY_MS);
+    } finally {
+        TimerState.flushing = false;
     }
 }
 
-// Update stats
-function updateTimerStats() {
-    const validSolves = TimerState.currentSolves.filter(s => !s.dnf);
+// POST solves of one session. Returns null once they are stored and
+// {status, error} if the server rejected them; network and server errors
+// throw, since resending may help there
+async function uploadSolves(sessionId, solves) {
+    const response = await fetch(`${API_BASE}/timer/solves/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: sessionId, solves: solves })
+    });
+    const result = await response.json();
     
-    if (validSolves.length === 0) {
-        document.getElementById('stat-count').textContent = '0';
-        document.getElementById('stat-best').textContent = '-';
-        document.getElementById('stat-mean').textContent = '-';
-        document.getElementById('stat-ao5').textContent = '-';
-        return;
+    if (!response.ok) {
+        if (response.status >= 400 && response.status < 500) {
+            return { status: response.status, error: result.error || response.statusText };
+        }
+        throw new Error(result.error || response.statusText);
     }
     
-    const times = validSolves.map(s => s.time);
-    const best = Math.min(...times);
-    const mean = times.reduce((a, b) => a + b, 0) / times.length;
+    const ids = new Map(result.solves.map(solve => [solve.client_id, solve.solve_id]));
+    dropPendingSolves(ids.keys());
     
-    document.getElementById('stat-count').textContent = TimerState.currentSolves.length;
-    document.getElementById('stat-best').textContent = best.toFixed(2);
-    document.getElementById('stat-mean').textContent = mean.toFixed(2);
+    TimerState.currentSolves.forEach(solve => {
+        if (solve.id === null && ids.has(solve.client_id)) {
+            solve.id = ids.get(solve.client_id);
+        }
+    });
+    if (sessionId === TimerState.currentSessionId) {
+        TimerState.sessionStats = result.stats;
+        updateTimerStats();
+    }
+    updateSolvesList();
+    return null;
+}
+
+// Move solves the server rejected out of the upload queue, keeping them with the reason
+function failPendingSolves(solves, error) {
+    console.error('Solves rejected:', error);
+    const failed = new Set(solves.map(solve => solve.client_id));
+    
+    dropPendingSolves(failed);
+    TimerState.failedSolves = TimerState.failedSolves.concat(
+        solves.map(solve => Object.assign({}, solve, { error: error }))
+    );
+    storeSolves(FAILED_SOLVES_KEY, TimerState.failedSolves);
+    
+    TimerState.currentSolves.forEach(solve => {
+        if (failed.has(solve.client_id)) {
+            solve.error = error;
+        }
+    });
+    updateSolvesList();
+    updateSaveError();
+}
+
+// Queue rejected solves again (e.g. after a fix on the server)
+function retryFailedSolves() {
+    const retry = TimerState.failedSolves.map(solve => {
+        const copy = Object.assign({}, solve);
+        delete copy.error;
+        return copy;
+    });
     
-    if (validSolves.length >= 5) {
-        const last5 = times.slice(0, 5).sort((a, b) => a - b);
-        const ao5 = last5.slice(1, 4).reduce((a, b) => a + b, 0) / 3;
-        document.getElementById('stat-ao5').textContent = ao5.toFixed(2);
-    } else {
-        document.getElementById('stat-ao5').textContent = '-';
+    TimerState.failedSolves = [];
+    storeSolves(FAILED_SOLVES_KEY, TimerState.failedSolves);
+    TimerState.pendingSolves = retry.concat(TimerState.pendingSolves)
+        .sort((a, b) => a.timestamp.localeCompare(b.timestamp));
+    storePendingSolves();
+    
+    TimerState.currentSolves.forEach(solve => {
+        delete solve.error;
+    });
+    updateSolvesList();
+    updateSaveError();
+    flushPendingSolves();
+}
+
+function discardFailedSolves() {
+    const count = TimerState.failedSolves.length;
+    if (!confirm(`Discard ${count} unsaved solve${count === 1 ? '' : 's'}? They cannot be recovered.`)) return;
+    
+    const discarded = new Set(TimerState.failedSolves.map(solve => solve.client_id));
+    TimerState.failedSolves = [];
+    storeSolves(FAILED_SOLVES_KEY, TimerState.failedSolves);
+    
+    TimerState.currentSolves = TimerState.currentSolves.filter(solve => !discarded.has(solve.client_id));
+    updateSolvesList();
+    updateSaveError();
+}
+
+// Show how many solves were turned down and why
+function updateSaveError() {
+    const banner = document.getElementById('timer-save-error');
+    if (!banner) return;
+    
+    const failed = TimerState.failedSolves;
+    banner.hidden = failed.length === 0;
+    if (failed.length > 0) {
+        document.getElementById('timer-save-error-text').textContent =
+            `${failed.length} solve${failed.length === 1 ? '' : 's'} could not be saved: ${failed[failed.length - 1].error}`;
     }
 }
 
+function pendingToSolve(pending) {
+    const plusTwo = pending.penalty === '+2' && !pending.dnf;
+    return {
+        id: null,
+        client_id: pending.client_id,
+        time: pending.time + (plusTwo ? 2 : 0),
+        penalty: pending.penalty || 'OK',
+        dnf: pending.dnf,
+        scramble: pending.scramble,
+        error: pending.error
+    };
+}
+
+function newClientId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+function loadStoredSolves(key) {
+    try {
+        return JSON.parse(localStorage.getItem(key)) || [];
+    } catch (error) {
+        return [];
+    }
+}
+
+function storeSolves(key, solves) {
+    try {
+        localStorage.setItem(key, JSON.stringify(solves));
+    } catch (error) {
+        console.error('Could not store solves:', error);
+    }
+}
+
+function storePendingSolves() {
+    storeSolves(PENDING_SOLVES_KEY, TimerState.pendingSolves);
+}
+
+function dropPendingSolves(clientIds) {
+    const done = new Set(clientIds);
+    TimerState.pendingSolves = TimerState.pendingSolves.filter(solve => !done.has(solve.client_id));
+    storePendingSolves();
+}
+
+// Update stats
+function updateTimerStats() {
+    const stats = TimerState.sessionStats;
+    const format = value => value == null ? '-' : value.toFixed(2);
+    
+    document.getElementById('stat-count').textContent = stats ? stats.solve_count || 0 : 0;
+    document.getElementById('stat-best').textContent = format(stats && stats.best_single);
+    document.getElementById('stat-mean').textContent = format(stats && stats.session_mean);
+    document.getElementById('stat-ao5').textContent = format(stats && stats.ao5);
+}
+
 // Update solves list
 function updateSolvesList() {
     const container = document.querySelector('.solves-list-container');
@@ -546,6 +720,13 @@ function updateSolvesList() {
     const best = validTimes.length > 0 ? Math.min(...validTimes) : null;
     const worst = validTimes.length > 0 ? Math.max(...validTimes) : null;
     
+    // The server only counts stored solves; the list starts with the unsaved ones
+    const unsaved = TimerState.pendingSolves.concat(TimerState.failedSolves)
+        .filter(solve => solve.session_id === TimerState.currentSessionId)
+        .length;
+    const stored = TimerState.sessionStats ? TimerState.sessionStats.solve_count : 0;
+    const total = Math.max(stored + unsaved, TimerState.currentSolves.length);
+    
     container.innerHTML = TimerState.currentSolves.map((solve, index) => {
         const isBest = !solve.dnf && solve.time === best;
         const isWorst = !solve.dnf && solve.time === worst && validTimes.length > 2;
@@ -557,22 +738,29 @@ function updateSolvesList() {
         
         return `
             <div class="solve-item">
-                <span class="solve-number">#${TimerState.currentSolves.length - index}</span>
+                <span class="solve-number">#${total - index}</span>
                 <span class="solve-time ${isBest ? 'best' : ''} ${isWorst ? 'worst' : ''}">${timeDisplay}</span>
                 <span class="solve-scramble" title="${solve.scramble || ''}">${solve.scramble || ''}</span>
                 <div class="solve-actions">
+                    ${solve.id === null ? (solve.error
+                        ? `<span class="solve-failed" title="${escapeAttribute(solve.error)}">Not saved</span>`
+                        : '<span class="solve-pending">Saving…</span>') : `
                     <select class="solve-action-select" onchange="changeSolvePenalty(${solve.id}, this.value)">
                         <option value="OK" ${solve.penalty === 'OK' ? 'selected' : ''}>OK</option>
                         <option value="+2" ${solve.penalty === '+2' ? 'selected' : ''}>+2</option>
                         <option value="DNF" ${solve.penalty === 'DNF' ? 'selected' : ''}>DNF</option>
                     </select>
-                    <button class="solve-action-btn delete" onclick="deleteSolve(${solve.id})">Delete</button>
+                    <button class="solve-action-btn delete" onclick="deleteSolve(${solve.id})">Delete</button>`}
                 </div>
             </div>
         `;
     }).join('');
 }
 
+function escapeAttribute(text) {
+    return String(text).replace(/&/g, '&amp;').replace(/"/g, '&quot;').replace(/</g, '&lt;');
+}
+
 async function changeSolvePenalty(solveId, newPenalty) {
     try {
         const response = await fetch(`${API_BASE}/timer/solve/${solveId}/penalty`, {
@@ -598,7 +786,9 @@ async function deleteSolve(solveId) {
         });
         
         if (response.ok) {
+            const result = await response.json();
             TimerState.currentSolves = TimerState.currentSolves.filter(s => s.id !== solveId);
+            TimerState.sessionStats = result.stats;
             updateTimerStats();
             updateSolvesList();
         }
@@ -623,6 +813,7 @@ async function createTimerSession() {
         if (result.success) {
             TimerState.currentSessionId = result.session_id;
             TimerState.currentSolves = [];
+            TimerState.sessionStats = null;
         }
     } catch (error) {
         console.error('Error creating session:', error);
@@ -1,26 +1,178 @@
 """
 Speedcube Training Explorer - Web Server
 Entry point for Flask application
+
+By default the app is served by waitress, a production WSGI server: one
+I/O loop accepts connections and keeps them alive (HTTP/1.1), and a fixed
+pool of --threads workers runs the requests. Ctrl+C / SIGTERM stops
+accepting connections, lets requests in flight finish (for up to --grace
+seconds) and then exits. The database schema is upgraded in create_app,
+before the server starts listening.
+
+The server runs as one process on purpose: session stats, import jobs and
+WCA rankings are cached in memory and would go stale across processes.
+SQLite has a single writer anyway; reads scale with --threads.
+
+Timer saves are group-committed (see src/python/solve_buffer.py):
+--solve-durability commit gives every save its own transaction instead,
+--group-commit-ms and --group-commit-rows bound how long and how large a
+group gets.
+
+Usage:
+    python website_server.py [--host 0.0.0.0] [--port 5000] [--threads 8]
+                             [--connection-limit 100] [--keep-alive 30]
+                             [--backlog 1024] [--grace 10]
+                             [--solve-durability group|commit]
+                             [--group-commit-ms 5] [--group-commit-rows 256] [--dev]
+
+--dev runs Flask's debug server with the reloader instead.
 """
 
+import argparse
+import signal
 import sys
+import threading
+import time
 from pathlib import Path
 
 project_root = str(Path(__file__).parent)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
+sys.path.insert(0, str(Path(__file__).parent / 'src' / 'python'))
 
 from src.web.api import create_app
+from solve_buffer import solve_buffer, DURABILITY_MODES, DEFAULT_DURABILITY, DEFAULT_INTERVAL, DEFAULT_MAX_ROWS
+
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 5000
+
+# Worker threads running requests (waitress' default is 4)
+DEFAULT_THREADS = 8
+
+# Open connections at most, idle keep-alive ones included
+DEFAULT_CONNECTION_LIMIT = 100
+
+# Seconds an idle keep-alive connection stays open
+DEFAULT_KEEP_ALIVE = 30
+
+# Connections waiting to be accepted
+DEFAULT_BACKLOG = 1024
+
+# Seconds requests in flight get to finish on shutdown
+DEFAULT_GRACE = 10
+
+
+def serve(app, host=DEFAULT_HOST, port=DEFAULT_PORT, threads=DEFAULT_THREADS,
+          connection_limit=DEFAULT_CONNECTION_LIMIT, keep_alive=DEFAULT_KEEP_ALIVE,
+          backlog=DEFAULT_BACKLOG, grace=DEFAULT_GRACE):
+    """Serve app with waitress until SIGINT/SIGTERM, then shut down gracefully"""
+    from waitress import create_server
+
+    socket_map = {}
+    server = create_server(
+        app, map=socket_map, host=host, port=port, threads=threads,
+        connection_limit=connection_limit, channel_timeout=keep_alive,
+        backlog=backlog, ident='speedcube'
+    )
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    while not stop.is_set():
+        server.asyncore.loop(timeout=1, map=socket_map, count=1,
+                             use_poll=server.adj.asyncore_use_poll)
+
+    print("\nShutting down, finishing requests in flight...")
+    _drain(server, socket_map, grace)
+    print("Server stopped")
+
+
+def _drain(server, socket_map, grace):
+    """
+    Close the listening sockets, then each connection once it has no request left
+
+    waitress has no public graceful shutdown (server.close() drops requests
+    in flight), so this uses internals of waitress 3.0: server.asyncore
+    (its vendored loop and dispatcher.close), HTTPChannel.requests and
+    will_close, server.task_dispatcher.shutdown() and the listener's
+    trigger. setup.py pins waitress to 3.0.x for that reason; check this
+    function before raising the pin.
+    """
+    from waitress.channel import HTTPChannel
+    from waitress.server import BaseWSGIServer
+
+    # Only the listening sockets; workers still wake the loop through the trigger
+    listeners = [d for d in socket_map.values() if isinstance(d, BaseWSGIServer)]
+    for listener in listeners:
+        server.asyncore.dispatcher.close(listener)
+
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        channels = [c for c in socket_map.values() if isinstance(c, HTTPChannel)]
+        if not channels:
+            break
+        for channel in channels:
+            if not channel.requests:
+                channel.will_close = True
+        server.asyncore.loop(timeout=0.1, map=socket_map, count=1,
+                             use_poll=server.adj.asyncore_use_poll)
+
+    server.task_dispatcher.shutdown(cancel_pending=True, timeout=1)
+    for listener in listeners:
+        listener.trigger.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Speedcube Training Explorer web server")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                        help="worker threads running requests")
+    parser.add_argument('--connection-limit', type=int, default=DEFAULT_CONNECTION_LIMIT,
+                        help="open connections at most")
+    parser.add_argument('--keep-alive', type=int, default=DEFAULT_KEEP_ALIVE,
+                        help="seconds an idle connection stays open")
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG,
+                        help="connections waiting to be accepted")
+    parser.add_argument('--grace', type=float, default=DEFAULT_GRACE,
+                        help="seconds requests in flight get to finish on shutdown")
+    parser.add_argument('--solve-durability', choices=DURABILITY_MODES, default=DEFAULT_DURABILITY,
+                        help="group-commit timer saves or commit each one on its own")
+    parser.add_argument('--group-commit-ms', type=float, default=DEFAULT_INTERVAL * 1000,
+                        help="milliseconds a group of timer saves collects before it is committed")
+    parser.add_argument('--group-commit-rows', type=int, default=DEFAULT_MAX_ROWS,
+                        help="solves that make a group commit right away")
+    parser.add_argument('--dev', action='store_true',
+                        help="run Flask's debug server with the reloader")
+    return parser.parse_args(argv)
+
 
 if __name__ == '__main__':
+    args = parse_args()
     app = create_app()
-    
+    solve_buffer.configure(args.solve_durability, args.group_commit_ms / 1000, args.group_commit_rows)
+
     print("="*60)
     print("SPEEDCUBE TRAINING EXPLORER - WEB SERVER")
     print("="*60)
     print("\nStarting server...")
-    print("Open your browser to: http://localhost:5000")
+    print(f"Open your browser to: http://localhost:{args.port}")
+    if not args.dev:
+        print(f"Serving with {args.threads} threads, keep-alive {args.keep_alive}s")
+    print(f"Timer saves: {args.solve_durability} commit"
+          + (f" (every {args.group_commit_ms:g}ms or {args.group_commit_rows} solves)"
+             if args.solve_durability == 'group' else " per solve"))
     print("\nPress Ctrl+C to stop the server")
     print("="*60)
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+
+    if args.dev:
+        app.run(debug=True, host=args.host, port=args.port)
+    else:
+        serve(app, args.host, args.port, args.threads, args.connection_limit,
+              args.keep_alive, args.backlog, args.grace)